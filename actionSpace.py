@@ -0,0 +1,143 @@
+from board import Board, LAYOUTS
+from gameConstants import *
+
+SECOND_ROAD = "SECOND_ROAD"  # Tags the ids of the second road of a two-road Road Building
+
+
+class ActionSpace:
+    """
+    A fixed integer encoding of every action for one board layout. Ids are stable for
+    a layout, so they can be stored in game records and used as policy outputs.
+
+    Besides the actions an agent picks from getLegalActions, the space holds the
+    events the engine resolves on its own during a turn: robber moves, discards
+    (one id per card, per player) and steals (one id per stolen resource).
+
+    A Road Building that builds two roads takes two ids: the single-road Road Building
+    of its first road, then a SECOND_ROAD id for the other. encodeAll and decodeAll
+    handle both kinds of action; encode and decode only single-id ones.
+    """
+
+    _cache = {}
+
+    def __init__(self, board):
+        self.vertices = [(vertex.X, vertex.Y) for vertex in board.getAllVertices()]
+        self.edges = [(edge.X, edge.Y) for row in board.edges for edge in row if edge is not None]
+        self.hexes = [(hexagon.X, hexagon.Y) for row in board.hexagons for hexagon in row if hexagon is not None]
+
+        self.actions = []  # action id -> (kind, payload)
+        self.ids = {}  # (kind, payload) -> action id
+
+        self.add(ACTIONS.PASS, None)
+        self.add(ACTIONS.BUY_DEV_CARD, None)
+        for give in RESOURCES:
+            for get in RESOURCES:
+                if give != get:
+                    self.add(ACTIONS.TRADE, (give, get))
+        for location in self.edges:
+            self.add(ACTIONS.ROAD, location)
+        for location in self.vertices:
+            self.add(ACTIONS.SETTLE, location)
+        for location in self.vertices:
+            self.add(ACTIONS.CITY, location)
+        for location in self.hexes:
+            self.add(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.KNIGHT, location))
+        for location in self.edges:
+            self.add(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING, location))
+        for i, first in enumerate(RESOURCES):
+            for second in RESOURCES[i:]:
+                self.add(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.YEAR_OF_PLENTY, (first, second)))
+        for resource in RESOURCES:
+            self.add(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.MONOPOLY, resource))
+
+        # Engine-resolved events
+        for location in self.hexes:
+            self.add(ACTIONS.MOVE_ROBBER, location)
+        for playerIndex in range(NUM_PLAYERS):
+            for resource in RESOURCES:
+                self.add(ACTIONS.DISCARD, (playerIndex, resource))
+        for resource in RESOURCES:
+            self.add(ACTIONS.STEAL, resource)
+        # After every other id, so ids from before two-road plays were encoded still hold
+        for location in self.edges:
+            self.add(ACTIONS.PLAY_DEV_CARD, (SECOND_ROAD, location))
+
+    @classmethod
+    def forLayout(cls, layoutId):
+        if layoutId not in cls._cache:
+            cls._cache[layoutId] = cls(Board(LAYOUTS[layoutId]))
+        return cls._cache[layoutId]
+
+    def add(self, kind, payload):
+        self.ids[(kind, payload)] = len(self.actions)
+        self.actions.append((kind, payload))
+
+    def __len__(self):
+        return len(self.actions)
+
+    def encode(self, action):
+        kind, arg = action
+        if kind in (ACTIONS.SETTLE, ACTIONS.CITY, ACTIONS.ROAD, ACTIONS.MOVE_ROBBER):
+            payload = (arg.X, arg.Y)
+        elif kind == ACTIONS.PLAY_DEV_CARD:
+            cardType, cardAction = arg
+            if cardType == DevCardTypes.KNIGHT:
+                payload = (cardType, (cardAction.X, cardAction.Y))
+            elif cardType == DevCardTypes.ROAD_BUILDING:
+                if len(cardAction) != 1:
+                    raise ValueError(f"Only single-road Road Building can be encoded, got {cardAction}")
+                payload = (cardType, (cardAction[0].X, cardAction[0].Y))
+            elif cardType == DevCardTypes.YEAR_OF_PLENTY:
+                payload = (cardType, tuple(sorted(cardAction, key=lambda resource: resource.value)))
+            else:
+                payload = (cardType, cardAction)
+        else:
+            payload = arg
+
+        actionId = self.ids.get((kind, payload))
+        if actionId is None:
+            raise ValueError(f"Action {action} is not in the action space")
+        return actionId
+
+    def encodeAll(self, action):
+        # The ids of action, in order: two for a two-road Road Building, otherwise one
+        if action[0] == ACTIONS.PLAY_DEV_CARD and action[1][0] == DevCardTypes.ROAD_BUILDING and len(action[1][1]) == 2:
+            first, second = action[1][1]
+            return [self.encode((ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING, [first]))),
+                    self.ids[(ACTIONS.PLAY_DEV_CARD, (SECOND_ROAD, (second.X, second.Y)))]]
+        return [self.encode(action)]
+
+    def decodeAll(self, actionIds, board):
+        # The actions a sequence of ids encodes, a SECOND_ROAD id joining the Road Building before it
+        actions = []
+        for actionId in actionIds:
+            kind, payload = self.actions[actionId]
+            if kind == ACTIONS.PLAY_DEV_CARD and payload[0] == SECOND_ROAD:
+                if not actions or actions[-1][0] != ACTIONS.PLAY_DEV_CARD or actions[-1][1][0] != DevCardTypes.ROAD_BUILDING:
+                    raise ValueError(f"Action id {actionId} is a second road without a Road Building before it")
+                actions[-1][1][1].append(board.getEdge(*payload[1]))
+            else:
+                actions.append(self.decode(actionId, board))
+        return actions
+
+    def decode(self, actionId, board):
+        # Returns the action in the form getLegalActions produces, bound to board's objects
+        kind, payload = self.actions[actionId]
+        if kind in (ACTIONS.SETTLE, ACTIONS.CITY):
+            return (kind, board.getVertex(*payload))
+        elif kind == ACTIONS.ROAD:
+            return (kind, board.getEdge(*payload))
+        elif kind == ACTIONS.MOVE_ROBBER:
+            return (kind, board.getHex(*payload))
+        elif kind == ACTIONS.PLAY_DEV_CARD:
+            cardType, cardAction = payload
+            if cardType == SECOND_ROAD:
+                raise ValueError(f"Action id {actionId} is the second road of a Road Building; decode it with decodeAll")
+            if cardType == DevCardTypes.KNIGHT:
+                return (kind, (cardType, board.getHex(*cardAction)))
+            elif cardType == DevCardTypes.ROAD_BUILDING:
+                return (kind, (cardType, [board.getEdge(*cardAction)]))
+            elif cardType == DevCardTypes.YEAR_OF_PLENTY:
+                return (kind, (cardType, list(cardAction)))
+            return (kind, payload)
+        return (kind, payload)
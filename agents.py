@@ -6,6 +6,9 @@ import time
 from draw import choose_edge, choose_hex, choose_vertex
 import math
 from board import Edge, Hexagon, Vertex  # Add Hexagon and Vertex here
+from profiling import SearchStats
+from valueFeatures import REACHABILITY_DEPTH, FeatureCache, LeafBatch, extractFeatures, featureDelta, featurePlan, proxyScore, rankLexicographic, supportsBatching, weightVector
+from valueNet import mlp_fn
 import pygame
 import numpy as np
 import pickle
@@ -13,7 +16,9 @@ import os
 import re
 import numpy as np
 
-Experience = namedtuple('Experience', ['state', 'action', 'next_state', 'reward', 'gameState', 'priority'])
+# outcome is gameState.gameOver() when the experience was recorded; keeping the whole
+# gameState here pinned every game the buffer had seen in memory
+Experience = namedtuple('Experience', ['state', 'action', 'next_state', 'reward', 'outcome', 'priority'])
 
 def builderEvalFn(currentGameState, currentPlayerIndex):
     currentPlayer = currentGameState.playerAgents[currentPlayerIndex]
@@ -42,19 +47,20 @@ def getResourceTouches(settlements, board):
 
 def resourceEvalFn(currentGameState, currentPlayerIndex):
     currentPlayer = currentGameState.playerAgents[currentPlayerIndex]
-    return sum(currentPlayer.resources.values())
+    return sum(currentPlayer.resources)
 
 def valueFunctionEvalFn(currentGameState, currentPlayerIndex):
     pass 
 
 
 class DiceAgent:
-    def __init__(self, numDiceSides = 6):
+    def __init__(self, numDiceSides = 6, rng=random):
         self.agentType = AGENT.DICE_AGENT
         self.NUM_DICE_SIDES = numDiceSides
+        self.rng = rng
 
     def rollDice(self):
-        return random.randint(1, self.NUM_DICE_SIDES) + random.randint(1, self.NUM_DICE_SIDES)
+        return self.rng.randint(1, self.NUM_DICE_SIDES) + self.rng.randint(1, self.NUM_DICE_SIDES)
 
     def getRollDistribution(self):
         totalRolls = 0
@@ -66,46 +72,22 @@ class DiceAgent:
         return [(roll, rollCounter[roll] / float(totalRolls)) for roll in rollCounter]
 
     def deepCopy(self):
-        return DiceAgent()
-
-class DevCard:
-    def __init__(self, card_type):
-        self.type = card_type
-        self.can_be_used = False
-        self.has_been_used = False
-        if card_type == DevCardTypes.VICTORY_POINT:
-            self.has_been_used = True  # Victory points are always "used"
-
-    def make_usable(self):
-        self.can_be_used = True
-
-    def use(self):
-        if self.can_be_used and not self.has_been_used:
-            self.has_been_used = True
-            self.can_be_used = False
-            return True
-        return False
-
-    def deepCopy(self):
-        newCard = DevCard(self.type)
-        newCard.can_be_used = self.can_be_used
-        newCard.has_been_used = self.has_been_used
-        return newCard
-    
-    def __repr__(self):
-        status = "Used" if self.has_been_used else "Usable" if self.can_be_used else "Not Usable"
-        return f"{self.type.name}: {status}"
-
-class PlayerAgent(object):
-    def __init__(self, name, agentIndex, color, depth=3, evalFn=defaultEvalFn):
-        self.agentType = AGENT.PLAYER_AGENT
-        self.evaluationFunction = evalFn
+        return DiceAgent(self.NUM_DICE_SIDES, self.rng)
+
+class PlayerState(object):
+    # Everything the rules track for one seat. GameState owns these and copies them for search;
+    # the PlayerAgent in a seat keeps only its policy and reads and writes its state through the
+    # forwarding properties below, so search copies never carry agents or their tables along
+    __slots__ = ("name", "agentIndex", "color", "victoryPoints", "roads", "settlements", "cities",
+                 "numRoads", "numSettlements", "numCities", "hasLongestRoad", "longestRoadLength",
+                 "resources", "unplayable_dev_cards", "playable_dev_cards", "played_dev_cards", "played_knights",
+                 "has_largest_army", "dev_card_played_this_turn")
+
+    def __init__(self, name, agentIndex, color):
         self.name = name
         self.agentIndex = agentIndex
         self.color = color
         self.victoryPoints = 2  # Each player starts with initial settlements giving 2 VP
-        self.depth = depth
-        self.draw = None
 
         self.roads = []
         self.settlements = []
@@ -118,15 +100,13 @@ class PlayerAgent(object):
         self.hasLongestRoad = False
         self.longestRoadLength = 0
 
-        self.resources = Counter({
-            ResourceTypes.WOOL: 0,
-            ResourceTypes.BRICK: 0,
-            ResourceTypes.ORE: 0,
-            ResourceTypes.GRAIN: 0,
-            ResourceTypes.LUMBER: 0,
-        })
+        self.resources = resourceArray()
 
-        self.dev_cards = []
+        # Per-type counts, indexed by DevCardTypes: bought this turn, playable, and played. Victory
+        # point cards count as played as soon as they are bought
+        self.unplayable_dev_cards = [0] * NUM_DEV_CARD_TYPES
+        self.playable_dev_cards = [0] * NUM_DEV_CARD_TYPES
+        self.played_dev_cards = [0] * NUM_DEV_CARD_TYPES
         self.played_knights = 0
         self.has_largest_army = False
         self.dev_card_played_this_turn = False
@@ -142,8 +122,10 @@ class PlayerAgent(object):
         
         # Add Development Cards information
         s += "Development Cards:\n"
-        for card in self.dev_cards:
-            s += f"  - {card}\n"
+        for cards, status in ((self.unplayable_dev_cards, "Not Usable"), (self.playable_dev_cards, "Usable"), (self.played_dev_cards, "Used")):
+            for card_type, count in zip(DEV_CARD_TYPES, cards):
+                if count:
+                    s += f"  - {card_type.name}: {status} x{count}\n"
         
         # Add Largest Army and Longest Road information
         if self.has_largest_army:
@@ -156,43 +138,55 @@ class PlayerAgent(object):
 
     def get_resources_as_string(self):
         s = f"Resources: "
-        for resource in self.resources:
+        for resource in RESOURCES:
             s += f"{resource.name.capitalize()} ({self.resources[resource]}) "
         return s
 
+    def num_dev_cards(self):
+        # Every card bought so far, played or not
+        return sum(self.unplayable_dev_cards) + sum(self.playable_dev_cards) + sum(self.played_dev_cards)
+
     def canBuildRoad(self):
-        return (
-            self.resources[ResourceTypes.BRICK] >= 1
-            and self.resources[ResourceTypes.LUMBER] >= 1
-            and self.numRoads < MAX_ROADS
-        )
+        return self.numRoads < MAX_ROADS and canAfford(self.resources, ROAD_COST)
 
     def canSettle(self):
-        return (
-            self.resources[ResourceTypes.BRICK] >= 1
-            and self.resources[ResourceTypes.LUMBER] >= 1
-            and self.resources[ResourceTypes.WOOL] >= 1
-            and self.resources[ResourceTypes.GRAIN] >= 1
-            and self.numSettlements < MAX_SETTLEMENTS
-        )
+        return self.numSettlements < MAX_SETTLEMENTS and canAfford(self.resources, SETTLEMENT_COST)
 
     def canBuildCity(self):
-        return self.resources[ResourceTypes.ORE] >= 3 and \
-               self.resources[ResourceTypes.GRAIN] >= 2 and \
-               self.numCities < MAX_CITIES and \
-               self.numSettlements > 0
+        return self.numCities < MAX_CITIES and self.numSettlements > 0 and canAfford(self.resources, CITY_COST)
 
     def deepCopy(self, board):
-        newCopy = PlayerAgent(self.name, self.agentIndex, self.color, depth=self.depth, evalFn=self.evaluationFunction)
+        newCopy = PlayerState.__new__(PlayerState)
+        newCopy.name = self.name
+        newCopy.agentIndex = self.agentIndex
+        newCopy.color = self.color
         newCopy.victoryPoints = self.victoryPoints
-        newCopy.depth = self.depth
         newCopy.roads = [board.getEdge(road.X, road.Y) for road in self.roads]
         newCopy.settlements = [board.getVertex(settlement.X, settlement.Y) for settlement in self.settlements]
-        newCopy.resources = copy.deepcopy(self.resources)
         newCopy.cities = [board.getVertex(city.X, city.Y) for city in self.cities]
+        newCopy.numRoads = self.numRoads
+        newCopy.numSettlements = self.numSettlements
+        newCopy.numCities = self.numCities
         newCopy.hasLongestRoad = self.hasLongestRoad
         newCopy.longestRoadLength = self.longestRoadLength
-        newCopy.dev_cards = [copy.deepcopy(card) for card in self.dev_cards]
+        newCopy.resources = self.resources[:]
+        newCopy.unplayable_dev_cards = self.unplayable_dev_cards[:]
+        newCopy.playable_dev_cards = self.playable_dev_cards[:]
+        newCopy.played_dev_cards = self.played_dev_cards[:]
+        newCopy.played_knights = self.played_knights
+        newCopy.has_largest_army = self.has_largest_army
+        newCopy.dev_card_played_this_turn = self.dev_card_played_this_turn
+        return newCopy
+
+    def viewCopy(self):
+        # For StateView: copies only what a build or trade writes (hand and piece lists) and shares the dev arrays
+        newCopy = PlayerState.__new__(PlayerState)
+        for slot in PlayerState.__slots__:
+            setattr(newCopy, slot, getattr(self, slot))
+        newCopy.resources = self.resources[:]
+        newCopy.roads = self.roads[:]
+        newCopy.settlements = self.settlements[:]
+        newCopy.cities = self.cities[:]
         return newCopy
 
     def applyAction(self, action, board, gameState):
@@ -206,8 +200,7 @@ class PlayerAgent(object):
             actionVertex = action[1]
             vertex = board.getVertex(actionVertex.X, actionVertex.Y)
             self.settlements.append(vertex)
-            self.resources.subtract(SETTLEMENT_COST)
-            gameState.bank.update(SETTLEMENT_COST)  # Add resources back to the bank
+            payResources(self.resources, gameState.bank, SETTLEMENT_COST)
             self.victoryPoints += SETTLEMENT_VICTORY_POINTS
             self.numSettlements += 1
 
@@ -218,8 +211,7 @@ class PlayerAgent(object):
             actionEdge = action[1]
             road = board.getEdge(actionEdge.X, actionEdge.Y)
             self.roads.append(road)
-            self.resources.subtract(ROAD_COST)
-            gameState.bank.update(ROAD_COST)  # Add resources back to the bank
+            payResources(self.resources, gameState.bank, ROAD_COST)
             self.numRoads += 1
           
         elif action[0] is ACTIONS.CITY:
@@ -234,8 +226,7 @@ class PlayerAgent(object):
                     self.settlements.remove(settlement)
                     break
 
-            self.resources.subtract(CITY_COST)
-            gameState.bank.update(CITY_COST)  # Add resources back to the bank
+            payResources(self.resources, gameState.bank, CITY_COST)
             self.victoryPoints += 1
             self.numCities += 1
             self.numSettlements -= 1
@@ -256,14 +247,14 @@ class PlayerAgent(object):
         elif action[0] is ACTIONS.BUY_DEV_CARD:
             if not self.canBuyDevCard(gameState):
                 raise Exception(f"Player {self.agentIndex} doesn't have enough resources to buy a dev card!")
-            self.resources.subtract(DEV_CARD_COST)
-            gameState.bank.update(DEV_CARD_COST)
+            payResources(self.resources, gameState.bank, DEV_CARD_COST)
             card = gameState.drawDevCard()
             if card is not None:
-                new_card = DevCard(card)
-                self.dev_cards.append(new_card)
                 if card == DevCardTypes.VICTORY_POINT:
+                    self.played_dev_cards[card] += 1
                     self.victoryPoints += 1
+                else:
+                    self.unplayable_dev_cards[card] += 1
                 if VERBOSE: 
                     print(f"Player {self.agentIndex}  bought a development card: {card}")
             else:
@@ -272,11 +263,11 @@ class PlayerAgent(object):
 
         elif action[0] is ACTIONS.PLAY_DEV_CARD:
             card_type, card_action = action[1]
-            card = next((card for card in self.dev_cards if card.type == card_type and card.can_be_used and not card.has_been_used), None)
-            if card is None:
+            if not self.playable_dev_cards[card_type]:
                 raise Exception(f"Player {self.agentIndex} can't play this development card!")
-            
-            card.use()
+
+            self.playable_dev_cards[card_type] -= 1
+            self.played_dev_cards[card_type] += 1
 
             if card_type == DevCardTypes.KNIGHT:
                 self.played_knights += 1
@@ -303,10 +294,8 @@ class PlayerAgent(object):
             elif card_type == DevCardTypes.MONOPOLY:
                 resource = card_action
                 total_stolen = 0
-                for player in gameState.playerAgents:
-                    if player != self:
-                        if resource not in player.resources:
-                            continue
+                for player in gameState.players:
+                    if player.agentIndex != self.agentIndex:
                         amount = player.resources[resource]
                         player.resources[resource] = 0
                         self.resources[resource] += amount
@@ -352,12 +341,9 @@ class PlayerAgent(object):
     def hasWon(self):
         return self.victoryPoints >= VICTORY_POINTS_TO_WIN
 
-    def getAction(self, state):
-        raise Exception("Cannot get action for superclass - must implement getAction in PlayerAgent subclass!")
-
     def updateLongestRoad(self, board, gameState):
         longestRoadLength = board.calculateLongestRoad(self.agentIndex)
-        otherPlayer = gameState.playerAgents[1 - self.agentIndex]
+        otherPlayer = gameState.players[1 - self.agentIndex]
 
         if longestRoadLength >= LONGEST_ROAD_LENGTH and longestRoadLength > otherPlayer.longestRoadLength:
             if not self.hasLongestRoad:
@@ -372,89 +358,53 @@ class PlayerAgent(object):
 
         self.longestRoadLength = longestRoadLength
 
-    def discard_half_on_seven(self, gameState):
-        total_resources = sum(self.resources.values())
-        if total_resources <= 7:
-            return None
-
-        discard_count = total_resources // 2
-        discarded = Counter()
-
-        resources_list = list(self.resources.elements())
-        
-        if not resources_list:  # If the player has no resources
+    def steal_resource(self, victim, rng=random):
+        if sum(victim.resources) == 0:
             return None
-
-        for _ in range(discard_count):
-            if resources_list:  # Check if there are still resources to discard
-                resource = random.choice(resources_list)
-                discarded[resource] += 1
-                resources_list.remove(resource)
-            else:
-                break
-
-        for resource, amount in discarded.items():
-            self.resources[resource] = max(0, self.resources[resource] - amount)
-        gameState.bank += discarded  # Add discarded resources back to the bank
-        return discarded
-
-    def choose_robber_placement(self, board):
-        valid_hexes = board.get_valid_robber_hexes()
-        return random.choice(valid_hexes)
-
-    def steal_resource(self, victim):
-        if not victim.resources or sum(victim.resources.values()) == 0:
-            return None
-        resources_list = [r for r in victim.resources.elements()]
-        if not resources_list:
-            return None
-        resource = random.choice(resources_list)
+        resources_list = resourceList(victim.resources)
+        resource = rng.choice(resources_list)
         victim.resources[resource] = max(0, victim.resources[resource] - 1)
         self.resources[resource] += 1
         return resource
 
     def canTrade(self, gameState):
-        for give_resource, count in self.resources.items():
-            if give_resource == ResourceTypes.NOTHING:
-                continue
+        if max(self.resources) < 4:
+            return False
+        for give_resource, count in zip(RESOURCES, self.resources):
             if count >= 4:
-                for get_resource in ResourceTypes:
-                    if get_resource == ResourceTypes.NOTHING or get_resource == give_resource:
-                        continue
-                    if gameState.bank[get_resource] > 0:
+                for get_resource, available in zip(RESOURCES, gameState.bank):
+                    if get_resource is not give_resource and available > 0:
                         return True
         return False
 
     def getPossibleTrades(self, gameState):
         trades = []
-        for give_resource, count in self.resources.items():
-            if give_resource != ResourceTypes.NOTHING and count >= 4:
-                for get_resource in ResourceTypes:
-                    if get_resource != ResourceTypes.NOTHING and get_resource != give_resource:
-                        if gameState.bank[get_resource] > 0:
-                            trades.append((give_resource, get_resource))
+        if max(self.resources) < 4:
+            return trades
+        for give_resource, count in zip(RESOURCES, self.resources):
+            if count >= 4:
+                for get_resource, available in zip(RESOURCES, gameState.bank):
+                    if get_resource is not give_resource and available > 0:
+                        trades.append((give_resource, get_resource))
         return trades
     def canPass(self):
         return True  # Passing is always an option
 
     def canBuyDevCard(self, gameState):
-        return (self.resources[ResourceTypes.GRAIN] >= 1 and
-                self.resources[ResourceTypes.WOOL] >= 1 and
-                self.resources[ResourceTypes.ORE] >= 1 and
-                len(gameState.dev_card_deck) > 0)
+        return len(gameState.dev_card_deck) > 0 and canAfford(self.resources, DEV_CARD_COST)
 
     def canPlayKnight(self):
-        return any(card.type == DevCardTypes.KNIGHT and card.can_be_used and not card.has_been_used for card in self.dev_cards)
+        return self.playable_dev_cards[DevCardTypes.KNIGHT] > 0
     
     def canPlayDevCard(self, card_type):
-        return any(card.type == card_type and card.can_be_used and not card.has_been_used for card in self.dev_cards)
+        return self.playable_dev_cards[card_type] > 0
 
     def updateLargestArmy(self, gameState):
         if self.played_knights >= LARGEST_ARMY_REQUIREMENT:
             if not self.has_largest_army:
-                current_largest = max((player.played_knights for player in gameState.playerAgents if player != self), default=0)
+                current_largest = max((player.played_knights for player in gameState.players if player.agentIndex != self.agentIndex), default=0)
                 if self.played_knights > current_largest:
-                    for player in gameState.playerAgents:
+                    for player in gameState.players:
                         if player.has_largest_army:
                             player.has_largest_army = False
                             player.victoryPoints -= LARGEST_ARMY_POINTS
@@ -462,9 +412,9 @@ class PlayerAgent(object):
                     self.victoryPoints += LARGEST_ARMY_POINTS
 
     def endTurn(self):
-        for card in self.dev_cards:
-            if not card.has_been_used:
-                card.make_usable()
+        if any(self.unplayable_dev_cards):
+            self.playable_dev_cards[:] = map(int.__add__, self.playable_dev_cards, self.unplayable_dev_cards)
+            self.unplayable_dev_cards[:] = [0] * NUM_DEV_CARD_TYPES
         self.dev_card_played_this_turn = False
 
     def get_legal_road_spots(self, board):
@@ -489,23 +439,88 @@ class PlayerAgent(object):
                     # Remove the increment from here, as it's now done in applyAction
                     return True
         return False
-    
+
+class PlayerAgent(object):
+    def __init__(self, name, agentIndex, color, depth=3, evalFn=defaultEvalFn):
+        self.state = PlayerState(name, agentIndex, color)
+        self.agentType = AGENT.PLAYER_AGENT
+        self.evaluationFunction = evalFn
+        self.depth = depth
+        self.draw = None
+        # Replaced by the game's per-agent stream (see GameRNG) once the agent is seated
+        self.rng = random
+        self.search_stats = None  # SearchStats, for agents that search
+        self.tracer = None  # profiling.Tracer, set by Game when tracing a game
+
+    def memory_structures(self):
+        # The agent's long-lived structures that can grow, by name, for profiling.agent_memory
+        return {}
+
+    def __repr__(self):
+        return repr(self.state)
+
+    def getAction(self, state):
+        raise Exception("Cannot get action for superclass - must implement getAction in PlayerAgent subclass!")
+
+    def discard_half_on_seven(self, gameState):
+        total_resources = sum(self.resources)
+        if total_resources <= 7:
+            return None
+
+        discard_count = total_resources // 2
+        discarded = resourceArray()
+
+        resources_list = resourceList(self.resources)
+
+        for _ in range(discard_count):
+            if resources_list:  # Check if there are still resources to discard
+                resource = self.rng.choice(resources_list)
+                discarded[resource] += 1
+                resources_list.remove(resource)
+            else:
+                break
+
+        payResources(self.resources, gameState.bank, discarded)  # Add discarded resources back to the bank
+        return discarded
+
+    def choose_robber_placement(self, board):
+        valid_hexes = board.get_valid_robber_hexes()
+        return self.rng.choice(valid_hexes)
+
+
+def _forwardToState(name):
+    return property(lambda self: getattr(self.state, name), lambda self, value: setattr(self.state, name, value))
+
+def _stateMethod(name):
+    def method(self, *args, **kwargs):
+        return getattr(self.state, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+for _name in PlayerState.__slots__:
+    setattr(PlayerAgent, _name, _forwardToState(_name))
+for _name in ("get_resources_as_string", "canBuildRoad", "canSettle", "canBuildCity", "applyAction", "updateResources",
+              "collectInitialResources", "hasWon", "updateLongestRoad", "steal_resource", "canTrade", "getPossibleTrades",
+              "canPass", "num_dev_cards", "canBuyDevCard", "canPlayKnight", "canPlayDevCard", "updateLargestArmy", "endTurn",
+              "get_legal_road_spots", "buildRoad"):
+    setattr(PlayerAgent, _name, _stateMethod(_name))
+
 class PlayerAgentRandom(PlayerAgent):
     def getAction(self, gameState):
         possibleActions = gameState.getLegalActions(self.agentIndex)
         if possibleActions:
-            chosenAction = random.choice(possibleActions)
+            chosenAction = self.rng.choice(possibleActions)
             if chosenAction[0] == ACTIONS.PLAY_DEV_CARD:
                 card_type = chosenAction[1]
                 if card_type == DevCardTypes.ROAD_BUILDING:
                     legal_spots = self.get_legal_road_spots(gameState.board)
-                    roads = random.sample(legal_spots, min(2, len(legal_spots)))
+                    roads = self.rng.sample(legal_spots, min(2, len(legal_spots)))
                     return (0, (ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING, roads)))
                 elif card_type == DevCardTypes.YEAR_OF_PLENTY:
                     resources = self.choose_random_resources(2)
                     return (0, (ACTIONS.PLAY_DEV_CARD, (card_type, resources)))
                 elif card_type == DevCardTypes.MONOPOLY:
-                    resource = random.choice(list(ResourceTypes))
+                    resource = self.rng.choice(list(ResourceTypes))
                     return (0, (ACTIONS.PLAY_DEV_CARD, (card_type, resource)))
                 else:
                     return (0, chosenAction)
@@ -528,7 +543,7 @@ class PlayerAgentRandom(PlayerAgent):
 
     def choose_robber_placement(self, board):
         valid_hexes = board.get_valid_robber_hexes()
-        return random.choice(valid_hexes)
+        return self.rng.choice(valid_hexes)
     
     def discard_half_on_seven(self, gameState):
         return super().discard_half_on_seven(gameState)
@@ -545,10 +560,10 @@ class PlayerAgentRandom(PlayerAgent):
                             possible_roads.append((edge.X, edge.Y))
         if len(possible_roads) < count:
             return possible_roads  # Return all possible roads if there are fewer than requested
-        return random.sample(possible_roads, count)
+        return self.rng.sample(possible_roads, count)
 
     def choose_random_resources(self, count):
-        return random.choices(list(ResourceTypes), k=count)
+        return self.rng.choices(list(ResourceTypes), k=count)
 
 class PlayerAgentHuman(PlayerAgent):
     def set_draw(self, draw):
@@ -650,8 +665,8 @@ class PlayerAgentHuman(PlayerAgent):
                     print("Choose two resources to collect:")
 
                     # Print out the numbers associated with each resource type
-                    for resource, amount in gameState.bank.items():
-                        if amount > 0:
+                    for resource in RESOURCES:
+                        if gameState.bank[resource] > 0:
                             print(f"{resource.value}: {resource.name.capitalize()}")
 
                     resources = []
@@ -663,8 +678,8 @@ class PlayerAgentHuman(PlayerAgent):
                     
                     return (0, (ACTIONS.PLAY_DEV_CARD, (card_type, resources)))
                 elif card_type == DevCardTypes.MONOPOLY:
-                    for resource, amount in gameState.bank.items():
-                        if amount > 0:
+                    for resource in RESOURCES:
+                        if gameState.bank[resource] > 0:
                             print(f"{resource.value}: {resource.name.capitalize()}")
                     resource = -1
                     while resource not in [1,2,3,4,5]:
@@ -695,36 +710,35 @@ class PlayerAgentHuman(PlayerAgent):
         return choose_hex(valid_hexes, self.draw)
     
     def discard_half_on_seven(self, gameState):
-        total_count = sum(self.resources.values())
+        total_count = sum(self.resources)
         if total_count <= 7:
             return None
 
         print("Choose half of your resources to discard:")
-        for resource, count in self.resources.items():
-            print(f"{resource.name.capitalize()}: {count}")
+        for resource in RESOURCES:
+            print(f"{resource.name.capitalize()}: {self.resources[resource]}")
 
         # Print the number associated with each resource
         resource_index = 1
         resource_indices = {}
-        for resource, count in self.resources.items():
-            if count > 0:
+        for resource in RESOURCES:
+            if self.resources[resource] > 0:
                 print(f"{resource_index}: {resource.name.capitalize()}")
                 resource_indices[resource_index] = resource
                 resource_index += 1
 
         discard_count = total_count // 2
-        discarded = Counter()
+        discarded = resourceArray()
         for i in range(discard_count):
             resource = int(input("Enter the number of the resource you want to discard: "))
             resource_type = resource_indices.get(resource)
-            if resource_type and self.resources[resource_type] > 0:
+            if resource_type and self.resources[resource_type] > discarded[resource_type]:
                 discarded[resource_type] += 1
-                self.resources[resource_type] -= 1
             else:
                 print("Invalid resource index. Please try again.")
                 i -= 1
 
-        gameState.bank += discarded
+        payResources(self.resources, gameState.bank, discarded)
         return discarded
     
     def choose_road_spot(self, legal_edges, gameState):
@@ -821,28 +835,144 @@ def point_to_point_distance(x1, y1, x2, y2):
     return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
 
 
+def batched_expectimax(agent, state, start_time, opponent_node):
+    """
+    The expectimax agents' search with every leaf valued in one batch. The tree is expanded as
+    getAction does, but leaves are added to a LeafBatch instead of being evaluated; then the whole
+    batch is valued with one matrix product and the values are backed up the recorded tree.
+    Nodes are ("value", v), ("leaf", slot), ("chance", [(p, child)]) and
+    ("choose", playerIndex, [(action, child)]); opponent_node is how an opponent's choices
+    combine, "mean" or "min". Returns (value, action), or (None, None) on a timeout.
+    """
+    stats = agent.search_stats
+    tracer = agent.tracer
+    batch = LeafBatch(agent.evaluationFunction, agent.agentIndex)
+
+    def leaf(currState):
+        stats.evaluations += 1
+        return ("leaf", batch.add(currState))
+
+    def recurse(currState, currDepth, playerIndex):
+        if tracer is None or not tracer.detail:
+            return expand(currState, currDepth, playerIndex)
+        tracer.begin(f"depth {currDepth}", "search")
+        try:
+            return expand(currState, currDepth, playerIndex)
+        finally:
+            tracer.end()
+
+    def expand(currState, currDepth, playerIndex):
+        if time.time() - start_time > agent.TIME_LIMIT:
+            return None  # Timeout
+
+        stats.reached(currDepth)
+        if currState.gameOver() == playerIndex:
+            return ("value", float('inf'))
+        elif currState.gameOver() > -1:
+            return ("value", float('-inf'))
+        elif currDepth >= agent.depth:
+            return leaf(currState)
+
+        possibleActions = agent.filterActions(currState.getLegalActions(playerIndex))
+        stats.nodes_expanded += 1
+
+        if len(possibleActions) == 0:
+            return leaf(currState)
+
+        rollProbabilities = currState.diceAgent.getRollDistribution()
+        newDepth = currDepth + 1
+        children = []
+        for currAction in possibleActions:
+            if currAction[0] == ACTIONS.PASS:
+                children.append((currAction, leaf(currState)))
+                break  # Nothing after the first PASS is looked at
+            outcomes = []
+            for roll, probability in rollProbabilities:
+                successor = currState.generateSuccessor(playerIndex, currAction)
+                stats.successors_generated += 1
+                successor.updatePlayerResourcesForDiceRoll(roll)
+                child = recurse(successor, newDepth, playerIndex)  # Continue with same player
+                if child is None:  # Timeout
+                    return None
+                outcomes.append((probability, child))
+            children.append((currAction, ("chance", outcomes)))
+        return ("choose", playerIndex, children)
+
+    def backup(node, values):
+        kind = node[0]
+        if kind == "value":
+            return node[1], None
+        if kind == "leaf":
+            return float(values[node[1]]), None
+        if kind == "chance":
+            return sum(probability * backup(child, values)[0] for probability, child in node[1]), None
+        _, playerIndex, children = node
+        childValues = [(backup(child, values)[0], action) for action, child in children]
+        if playerIndex != agent.agentIndex and opponent_node == "mean":
+            return sum(value for value, _ in childValues) / len(childValues), None
+        minimize = playerIndex != agent.agentIndex
+        bestValue, bestAction = float('inf') if minimize else float('-inf'), None
+        for value, action in childValues:
+            if (value < bestValue) if minimize else (value > bestValue):
+                bestValue, bestAction = value, action
+        return bestValue, bestAction
+
+    root = recurse(state, 0, agent.agentIndex)
+    if root is None:
+        return None, None
+    return backup(root, batch.evaluate())
+
+
 class PlayerAgentExpectimax(PlayerAgent):
-    def __init__(self, name, agentIndex, color, depth=DEPTH, evalFn=defaultEvalFn):
+    def __init__(self, name, agentIndex, color, depth=DEPTH, evalFn=defaultEvalFn, batch_leaves=True):
         super(PlayerAgentExpectimax, self).__init__(name, agentIndex, color, depth, evalFn=evalFn)
         self.TIME_LIMIT = 5  # 5 seconds
+        self.batch_leaves = batch_leaves  # Value leaves in one batch when evalFn supports it (see batched_expectimax)
+        self.search_stats = SearchStats()
 
     def getAction(self, state):
         start_time = time.time()
+        stats = self.search_stats
+        stats.begin_decision()
+        tracer = self.tracer
+
+        if self.batch_leaves and supportsBatching(self.evaluationFunction):
+            value, action = batched_expectimax(self, state, start_time, "mean")
+            if value is None:
+                stats.timeouts += 1
+            stats.end_decision()
+            if value is None or action is None:
+                return 0, (ACTIONS.PASS, None)
+            return value, action
+
 
         def recurse(currState, currDepth, playerIndex):
+            if tracer is None or not tracer.detail:
+                return expand(currState, currDepth, playerIndex)
+            tracer.begin(f"depth {currDepth}", "search")
+            try:
+                return expand(currState, currDepth, playerIndex)
+            finally:
+                tracer.end()
+
+        def expand(currState, currDepth, playerIndex):
             if time.time() - start_time > self.TIME_LIMIT:
                 return None, None  # Timeout
 
+            stats.reached(currDepth)
             if currState.gameOver() == playerIndex:
                 return float('inf'), None
             elif currState.gameOver() > -1:
                 return float('-inf'), None
             elif currDepth >= self.depth:
+                stats.evaluations += 1
                 return self.evaluationFunction(currState, self.agentIndex), None
 
             possibleActions = self.filterActions(currState.getLegalActions(playerIndex))
+            stats.nodes_expanded += 1
 
             if len(possibleActions) == 0:
+                stats.evaluations += 1
                 return self.evaluationFunction(currState, self.agentIndex), None
 
             rollProbabilities = currState.diceAgent.getRollDistribution()
@@ -854,11 +984,13 @@ class PlayerAgentExpectimax(PlayerAgent):
                 bestAction = None
                 for currAction in possibleActions:
                     if currAction[0] == ACTIONS.PASS:
+                        stats.evaluations += 1
                         currVal = self.evaluationFunction(currState, self.agentIndex)
                     else:
                         currVal = 0
                         for roll, probability in rollProbabilities:
                             successor = currState.generateSuccessor(playerIndex, currAction)
+                            stats.successors_generated += 1
                             successor.updatePlayerResourcesForDiceRoll(roll)
                             value, _ = recurse(successor, newDepth, playerIndex)
                             if value is None:  # Timeout
@@ -875,11 +1007,13 @@ class PlayerAgentExpectimax(PlayerAgent):
                 count = 0
                 for currAction in possibleActions:
                     if currAction[0] == ACTIONS.PASS:
+                        stats.evaluations += 1
                         currVal = self.evaluationFunction(currState, self.agentIndex)
                     else:
                         currVal = 0
                         for roll, probability in rollProbabilities:
                             successor = currState.generateSuccessor(playerIndex, currAction)
+                            stats.successors_generated += 1
                             successor.updatePlayerResourcesForDiceRoll(roll)
                             value, _ = recurse(successor, newDepth, playerIndex)
                             if value is None:  # Timeout
@@ -892,6 +1026,9 @@ class PlayerAgentExpectimax(PlayerAgent):
                 return totalValue / count if count > 0 else 0, None
 
         value, action = recurse(state, 0, self.agentIndex)
+        if value is None:
+            stats.timeouts += 1
+        stats.end_decision()
         if value is None or action is None:
             # If we've timed out, just return PASS
             return 0, (ACTIONS.PASS, None)
@@ -943,27 +1080,55 @@ class PlayerAgentExpectimax(PlayerAgent):
 
 
 class PlayerAgentExpectiminimax(PlayerAgent):
-    def __init__(self, name, agentIndex, color, depth=DEPTH, evalFn=defaultEvalFn):
+    def __init__(self, name, agentIndex, color, depth=DEPTH, evalFn=defaultEvalFn, batch_leaves=True):
         super(PlayerAgentExpectiminimax, self).__init__(name, agentIndex, color, depth=depth, evalFn=evalFn)
         self.TIME_LIMIT = 5  # 5 seconds
+        self.batch_leaves = batch_leaves  # Value leaves in one batch when evalFn supports it (see batched_expectimax)
+        self.search_stats = SearchStats()
 
     def getAction(self, state):
         start_time = time.time()
+        stats = self.search_stats
+        stats.begin_decision()
+        tracer = self.tracer
+
+        if self.batch_leaves and supportsBatching(self.evaluationFunction):
+            value, action = batched_expectimax(self, state, start_time, "min")
+            if value is None:
+                stats.timeouts += 1
+            stats.end_decision()
+            if value is None or action is None:
+                return 0, (ACTIONS.PASS, None)
+            return value, action
+
 
         def recurse(currState, currDepth, playerIndex):
+            if tracer is None or not tracer.detail:
+                return expand(currState, currDepth, playerIndex)
+            tracer.begin(f"depth {currDepth}", "search")
+            try:
+                return expand(currState, currDepth, playerIndex)
+            finally:
+                tracer.end()
+
+        def expand(currState, currDepth, playerIndex):
             if time.time() - start_time > self.TIME_LIMIT:
                 return None, None  # Timeout
 
+            stats.reached(currDepth)
             if currState.gameOver() == playerIndex:
                 return float('inf'), None
             elif currState.gameOver() > -1:
                 return float('-inf'), None
             elif currDepth >= self.depth:
+                stats.evaluations += 1
                 return self.evaluationFunction(currState, self.agentIndex), None
 
             possibleActions = self.filterActions(currState.getLegalActions(playerIndex))
+            stats.nodes_expanded += 1
 
             if len(possibleActions) == 0:
+                stats.evaluations += 1
                 return self.evaluationFunction(currState, self.agentIndex), None
 
             rollProbabilities = currState.diceAgent.getRollDistribution()
@@ -975,11 +1140,13 @@ class PlayerAgentExpectiminimax(PlayerAgent):
                 bestAction = None
                 for currAction in possibleActions:
                     if currAction[0] == ACTIONS.PASS:
+                        stats.evaluations += 1
                         currVal = self.evaluationFunction(currState, self.agentIndex)
                     else:
                         currVal = 0
                         for roll, probability in rollProbabilities:
                             successor = currState.generateSuccessor(playerIndex, currAction)
+                            stats.successors_generated += 1
                             successor.updatePlayerResourcesForDiceRoll(roll)
                             value, _ = recurse(successor, newDepth, playerIndex)  # Continue with same player
                             if value is None:  # Timeout
@@ -996,11 +1163,13 @@ class PlayerAgentExpectiminimax(PlayerAgent):
                 worstAction = None
                 for currAction in possibleActions:
                     if currAction[0] == ACTIONS.PASS:
+                        stats.evaluations += 1
                         currVal = self.evaluationFunction(currState, self.agentIndex)
                     else:
                         currVal = 0
                         for roll, probability in rollProbabilities:
                             successor = currState.generateSuccessor(playerIndex, currAction)
+                            stats.successors_generated += 1
                             successor.updatePlayerResourcesForDiceRoll(roll)
                             value, _ = recurse(successor, newDepth, playerIndex)  # Continue with same player
                             if value is None:  # Timeout
@@ -1014,6 +1183,9 @@ class PlayerAgentExpectiminimax(PlayerAgent):
                 return worstValue, worstAction
 
         value, action = recurse(state, 0, self.agentIndex)
+        if value is None:
+            stats.timeouts += 1
+        stats.end_decision()
         if value is None or action is None:
             # If we've timed out, just return PASS
             return 0, (ACTIONS.PASS, None)
@@ -1024,26 +1196,25 @@ class PlayerAgentExpectiminimax(PlayerAgent):
         return filtered_actions
     
     def discard_half_on_seven(self, gameState):
-        total_resources = sum(self.resources.values())
+        total_resources = sum(self.resources)
         if total_resources <= 7:
             return None
 
         discard_count = total_resources // 2
         discarded = self.choose_cards_to_discard(discard_count)
-        self.resources -= discarded
-        gameState.bank += discarded  # Add discarded resources back to the bank
+        payResources(self.resources, gameState.bank, discarded)  # Add discarded resources back to the bank
         return discarded
 
     def choose_cards_to_discard(self, discard_count):
-        discarded = Counter()
-        resources_list = sorted(self.resources.items(), key=lambda x: x[1], reverse=True)
+        discarded = resourceArray()
+        resources_list = sorted(zip(RESOURCES, self.resources), key=lambda x: x[1], reverse=True)
         
         for resource, count in resources_list:
-            while count > 0 and sum(discarded.values()) < discard_count:
+            while count > 0 and sum(discarded) < discard_count:
                 discarded[resource] += 1
                 count -= 1
             
-            if sum(discarded.values()) == discard_count:
+            if sum(discarded) == discard_count:
                 break
         
 
@@ -1135,9 +1306,7 @@ CONTENDER_WEIGHTS = {
     "army_size": 12.93844622,
 }
 
-REACHABILITY_DEPTH = 2
-
-DEVELOPMENT_CARDS = list(DevCardTypes)
+DEVELOPMENT_CARDS = DEV_CARD_TYPES
 
 def value_production(sample, player_name="P0", include_variety=True):
     proba_point = 2.778 / 100
@@ -1165,90 +1334,37 @@ def resource_hand_features(gameState, playerIndex):
         key = player_key(currentPlayerIndex)
         hand = gameState.playerAgents[currentPlayerIndex].resources
         if currentPlayerIndex == playerIndex:
-            for resource in RESOURCES:
-                features[f"{key}_{resource}_IN_HAND"] = hand[resource]
-            cardDict = Counter(gameState.playerAgents[currentPlayerIndex].dev_cards)
+            for resource, count in zip(RESOURCES, hand):
+                features[f"{key}_{resource}_IN_HAND"] = count
+            player = gameState.playerAgents[currentPlayerIndex]
             for card in DEVELOPMENT_CARDS: 
-                features[f"{key}_{card}_IN_HAND"] = cardDict[card]
+                features[f"{key}_{card}_IN_HAND"] = player.unplayable_dev_cards[card] + player.playable_dev_cards[card]
             features[f"{key}_HAS_PLAYED_DEVELOPMENT_CARD_IN_TURN"] = gameState.playerAgents[currentPlayerIndex].dev_card_played_this_turn
 
         for cardtype in DEVELOPMENT_CARDS:
             if cardtype == DevCardTypes.VICTORY_POINT:
                 continue
-            playedCardsOfType = len([card for card in gameState.playerAgents[currentPlayerIndex].dev_cards if card.type == cardtype and card.has_been_used])
-            features[f"{key}_{cardtype}_PLAYED"] = playedCardsOfType
+            features[f"{key}_{cardtype}_PLAYED"] = gameState.playerAgents[currentPlayerIndex].played_dev_cards[cardtype]
         
-        features[f"{key}_NUM_RESOURCES_IN_HAND"] = sum(gameState.playerAgents[currentPlayerIndex].resources.values())
-        features[f"{key}_NUM_DEVELOPMENT_CARDS_IN_HAND"] = len(gameState.playerAgents[currentPlayerIndex].dev_cards)
+        features[f"{key}_NUM_RESOURCES_IN_HAND"] = sum(gameState.playerAgents[currentPlayerIndex].resources)
+        features[f"{key}_NUM_DEVELOPMENT_CARDS_IN_HAND"] = gameState.playerAgents[currentPlayerIndex].num_dev_cards()
     return features
 
 
 def base_fn(params=DEFAULT_WEIGHTS):
-    
-    def fn(currentGameState, currentPlayerIndex):
-        enemyIndex = 1 - currentPlayerIndex
-        our_production_sample = currentGameState.board.getProductionSample(currentPlayerIndex)
-        enemy_production_sample = currentGameState.board.getProductionSample(enemyIndex)
-        
-
-        
-        production = value_production(our_production_sample, player_key(currentPlayerIndex), False)
-        enemy_production = value_production(enemy_production_sample, player_key(enemyIndex), False)
-
-        key = player_key(currentPlayerIndex)
-        longest_road_length = currentGameState.board.calculateLongestRoad(currentPlayerIndex)
-
-        reachability_sample = currentGameState.board.reachability_features(REACHABILITY_DEPTH)
-        features = [f"{key}_0_ROAD_REACHABLE_{resource}" for resource in RESOURCES]
-        reachable_production_at_zero = sum([reachability_sample[f] for f in features])
-        features = [f"{key}_1_ROAD_REACHABLE_{resource}" for resource in RESOURCES]
-        reachable_production_at_one = sum([reachability_sample[f] for f in features])
-
-        hand_sample = resource_hand_features(currentGameState, currentPlayerIndex)
-      
-        features = [f"{key}_{resource}_IN_HAND" for resource in RESOURCES]
-        distance_to_city = (
-            max(2 - hand_sample[f"{key}_GRAIN_IN_HAND"], 0)
-            + max(3 - hand_sample[f"{key}_ORE_IN_HAND"], 0)
-        ) / 5.0  # 0 means good. 1 means bad.
-        distance_to_settlement = (
-            max(1 - hand_sample[f"{key}_GRAIN_IN_HAND"], 0)
-            + max(1 - hand_sample[f"{key}_WOOL_IN_HAND"], 0)
-            + max(1 - hand_sample[f"{key}_BRICK_IN_HAND"], 0)
-            + max(1 - hand_sample[f"{key}_LUMBER_IN_HAND"], 0)
-        ) / 4.0  # 0 means good. 1 means bad.
-        hand_synergy = (2 - distance_to_city - distance_to_settlement) / 2
-
-        num_in_hand = hand_sample[f"{key}_NUM_RESOURCES_IN_HAND"]
-        discard_penalty = params["discard_penalty"] if num_in_hand > 7 else 0
-
-        # blockability
-        num_tiles = currentGameState.board.getNumTiles(currentPlayerIndex) 
-     
-        num_buildable_nodes = currentGameState.board.getNumBuildableTiles(currentPlayerIndex) 
-        longest_road_factor = (
-            params["longest_road"] if num_buildable_nodes == 0 else 0.1
-        )
-
-        player_num_dev_cards = len(currentGameState.playerAgents[currentPlayerIndex].dev_cards)
-        played_knights = len([card for card in currentGameState.playerAgents[currentPlayerIndex].dev_cards if card.type == DevCardTypes.KNIGHT and card.has_been_used])
-
-        return float(
-            currentGameState.playerAgents[currentPlayerIndex].victoryPoints * params["public_vps"]
-            + production * params["production"]
-            + enemy_production * params["enemy_production"]
-            + reachable_production_at_zero * params["reachable_production_0"]
-            + reachable_production_at_one * params["reachable_production_1"]
-            + hand_synergy * params["hand_synergy"]
-            + num_buildable_nodes * params["buildable_nodes"]
-            + num_tiles * params["num_tiles"]
-            + num_in_hand * params["hand_resources"]
-            + discard_penalty
-            + longest_road_length * longest_road_factor
-            + player_num_dev_cards * params["hand_devs"]
-            + played_knights * params["army_size"]
-        )
+    weights = weightVector(params)
+    plan = featurePlan(weights)
 
+    def fn(currentGameState, currentPlayerIndex):
+        return float(extractFeatures(currentGameState, currentPlayerIndex, plan=plan) @ weights)
+
+    # Lets one-ply search evaluate the root once and each successor by its feature delta,
+    # stacking the successors' vectors into one matrix product
+    fn.weights = weights
+    fn.plan = plan
+    fn.features = lambda gameState, playerIndex, out=None: extractFeatures(gameState, playerIndex, out, plan)
+    fn.delta = lambda root, successor, playerIndex, action, out=None: featureDelta(root, successor, playerIndex, action, out, plan)
+    fn.evaluate_batch = lambda rows: rows @ weights
     return fn
 
 def contender_fn(params):
@@ -1261,63 +1377,109 @@ def get_value_fn(name, params, value_function=None):
         return base_fn(DEFAULT_WEIGHTS)
     elif name == "contender_fn":
         return contender_fn(params)
+    elif name == "mlp_fn":
+        # params is a trained MLPValueNet or the .npz path it was saved to
+        return mlp_fn(params)
     else:
         raise ValueError
 
 class ValueFunctionPlayer(PlayerAgent):
-    def __init__(self, name, agentIndex, color, params= None, epsilon=None, value_fn_builder_name=None):
+    def __init__(self, name, agentIndex, color, params= None, epsilon=None, value_fn_builder_name=None, lexicographic=False,
+                 top_k=None, measure_recall=False):
         super(ValueFunctionPlayer, self).__init__(name, agentIndex, color)
         self.params = params
         self.epsilon = epsilon
-        self.value_fn_builder_name = (
-            "base_fn"
-        )
+        self.lexicographic = lexicographic  # Rank with rankLexicographic, skipping terms that can't change the winner
+        # With top_k set, only the top_k actions by proxyScore get a full evaluation; measure_recall also ranks
+        # every action to count how often that shortlist held the real winner (SearchStats.proxy_recall)
+        self.top_k = top_k
+        self.measure_recall = measure_recall
+        self.value_fn_builder_name = value_fn_builder_name or "base_fn"
         self.value_fn = get_value_fn(self.value_fn_builder_name, self.params)
+        self.feature_cache = FeatureCache()  # Carries successor features over between this agent's decisions
+        self.search_stats = SearchStats()
 
     def getAction(self, state):
         # In our code rn, self.epsilon is always None
-        if self.epsilon is not None and random.random() < self.epsilon:
-            return random.choice(state.getLegalActions(self.agentIndex))
-
-        best_value = float("-inf")
-        best_action = None
-        for action in state.getLegalActions(self.agentIndex):
-            if action[0] == ACTIONS.PASS:  # remove pass action from possible actions
-                continue 
-            
-            successor = state.generateSuccessor(self.agentIndex, action)
-            value = self.value_fn(successor, self.agentIndex)
-           
-            if value > best_value:
-                best_value = value
-                best_action = action
+        if self.epsilon is not None and self.rng.random() < self.epsilon:
+            return self.rng.choice(state.getLegalActions(self.agentIndex))
+
+        stats = self.search_stats
+        stats.begin_decision()
+        stats.nodes_expanded += 1
+        value_fn = self.value_fn
+        actions = [action for action in state.getLegalActions(self.agentIndex) if action[0] != ACTIONS.PASS]
+        if hasattr(value_fn, "delta") and actions:
+            root_features = value_fn.features(state, self.agentIndex)
+            candidates = actions
+            if self.top_k and len(actions) > self.top_k and hasattr(value_fn, "weights"):
+                scores = [proxyScore(state, self.agentIndex, action, value_fn.weights) for action in actions]
+                shortlist = sorted(sorted(range(len(actions)), key=lambda i: -scores[i])[:self.top_k])
+                candidates = [actions[i] for i in shortlist]
+            best, best_value = self.rankActions(state, candidates, root_features)
+            best_action = candidates[best]
+            if self.measure_recall and candidates is not actions:
+                stats.proxy_checks += 1
+                stats.proxy_hits += self.rankActions(state, actions, root_features, count=False)[0] in shortlist
+        else:
+            best_value = float("-inf")
+            best_action = None
+            for action in actions:
+                successor = state.successorView(self.agentIndex, action)
+                value = value_fn(successor, self.agentIndex)
+                stats.successors_generated += 1
+                stats.evaluations += 1
+                if value > best_value:
+                    best_value = value
+                    best_action = action
+        if actions:
+            stats.reached(1)
+        stats.end_decision()
         return 0 if not best_action else best_value, best_action if best_action else (ACTIONS.PASS, None)
 
+    def memory_structures(self):
+        return {"feature_cache": self.feature_cache.entries}
+
+    def rankActions(self, state, actions, root_features, count=True):
+        # Index and value of the best of actions, scored by the value function's feature deltas from root_features.
+        # count=False leaves the search stats alone, for rankings that only check the agent's own
+        value_fn = self.value_fn
+        if count:
+            self.search_stats.successors_generated += len(actions)
+            self.search_stats.evaluations += len(actions)
+        if self.lexicographic and hasattr(value_fn, "weights"):
+            successors = [state.successorView(self.agentIndex, action) for action in actions]
+            return rankLexicographic(root_features, successors, self.agentIndex, actions, value_fn.weights, value_fn.plan)
+        rows = np.empty((len(actions), len(root_features)))
+        self.feature_cache.fill(state, self.agentIndex, actions, root_features, value_fn.plan, rows)
+        values = value_fn.evaluate_batch(rows)
+        best = int(np.argmax(values))
+        return best, float(values[best])
+
     def filterActions(self, actions):
         filtered_actions = actions + [(ACTIONS.PASS, None)]
         return filtered_actions
     
     def discard_half_on_seven(self, gameState):
-        total_resources = sum(self.resources.values())
+        total_resources = sum(self.resources)
         if total_resources <= 7:
             return None
 
         discard_count = total_resources // 2
         discarded = self.choose_cards_to_discard(discard_count)
-        self.resources -= discarded
-        gameState.bank += discarded  # Add discarded resources back to the bank
+        payResources(self.resources, gameState.bank, discarded)  # Add discarded resources back to the bank
         return discarded
 
     def choose_cards_to_discard(self, discard_count):
-        discarded = Counter()
-        resources_list = sorted(self.resources.items(), key=lambda x: x[1], reverse=True)
+        discarded = resourceArray()
+        resources_list = sorted(zip(RESOURCES, self.resources), key=lambda x: x[1], reverse=True)
         
         for resource, count in resources_list:
-            while count > 0 and sum(discarded.values()) < discard_count:
+            while count > 0 and sum(discarded) < discard_count:
                 discarded[resource] += 1
                 count -= 1
             
-            if sum(discarded.values()) == discard_count:
+            if sum(discarded) == discard_count:
                 break
         return discarded
     
@@ -1359,10 +1521,21 @@ class ValueFunctionPlayer(PlayerAgent):
                 value += self.evaluate_settlement_spot(vertex, board)
         return value
 
+Q_TABLE_MAX_STATES = 500000
+OPPONENT_MODEL_MAX_STATES = 100000
+EVICTION_TARGET = 0.9  # Evicting to below the cap means a full table isn't re-sorted on every update
+# Resource order of the Counter hands the saved Q-tables were keyed on
+Q_TABLE_HAND_ORDER = (ResourceTypes.WOOL, ResourceTypes.BRICK, ResourceTypes.ORE, ResourceTypes.GRAIN, ResourceTypes.LUMBER)
+
+def handKey(hand):
+    return tuple(hand[resource] for resource in Q_TABLE_HAND_ORDER)
+
 class QLearningAgent(PlayerAgent):
     def __init__(self, name, agentIndex, color, alpha=0.2, alpha_decay=0.9999, min_alpha=0.05, gamma=0.99, 
-                 epsilon_start=0.3, epsilon_end=0.05, epsilon_decay=0.9995, buffer_size=100000, batch_size=64):
+                 epsilon_start=0.3, epsilon_end=0.05, epsilon_decay=0.9995, buffer_size=100000, batch_size=64, persist=True,
+                 max_q_states=Q_TABLE_MAX_STATES, max_opponent_states=OPPONENT_MODEL_MAX_STATES):
         super().__init__(name, agentIndex, color)
+        self.persist = persist  # Tournament workers share the pickle file, so they must not write it
         self.alpha = alpha
         self.alpha_decay = alpha_decay
         self.min_alpha = min_alpha
@@ -1381,6 +1554,11 @@ class QLearningAgent(PlayerAgent):
         self.prune_threshold = 5
         self.prune_frequency = 100
         self.opponent_model = {}
+        self.np_rng = None
+        # Caps on the tables that grow with every new state; None means unbounded
+        self.max_q_states = max_q_states
+        self.max_opponent_states = max_opponent_states
+        self.evicted_states = 0
 
         self.game_stage = "early"  # Can be "early", "mid", or "late"
         self.initial_settlements = 2  # Start with 2 initial settlements
@@ -1395,14 +1573,14 @@ class QLearningAgent(PlayerAgent):
             len(self.settlements),
             len(self.cities),
             len(self.roads),
-            tuple(self.resources.values()),
+            handKey(self.resources),
             gameState.playerAgents[1 - self.agentIndex].victoryPoints,
             gameState.board.robber.hex.X,
             gameState.board.robber.hex.Y,
             self.hasLongestRoad,
             self.has_largest_army,
-            len(self.dev_cards),
-            sum(gameState.bank.values()),  # Total resources in the bank
+            self.num_dev_cards(),
+            sum(gameState.bank),  # Total resources in the bank
             self.longestRoadLength,
             gameState.playerAgents[1 - self.agentIndex].longestRoadLength,
             self.game_stage,
@@ -1452,7 +1630,7 @@ class QLearningAgent(PlayerAgent):
         return self.choose_other_action(legal_actions, gameState)
     
     def has_settlement_resources(self):
-        return all(self.resources[r] >= SETTLEMENT_COST[r] for r in SETTLEMENT_COST)
+        return canAfford(self.resources, SETTLEMENT_COST)
     
     def choose_best_road(self, road_actions, board):
         best_road = None
@@ -1536,18 +1714,16 @@ class QLearningAgent(PlayerAgent):
             return 0, max(road_actions, key=lambda a: self.get_q_value(self.get_state(gameState), self.make_action_hashable(a)))
 
         # Default to random legal action if no prioritization possible
-        return 0, random.choice(legal_actions)
+        return 0, self.rng.choice(legal_actions)
         
     def is_close_to_settlement(self):
-        return sum(max(0, SETTLEMENT_COST[r] - self.resources[r]) for r in SETTLEMENT_COST) <= 1
+        return sum(max(0, cost - count) for cost, count in zip(SETTLEMENT_COST, self.resources)) <= 1
 
     def is_close_to_city(self):
-        missing_resources = Counter(CITY_COST)
-        missing_resources.subtract(self.resources)
-        return sum(max(0, count) for count in missing_resources.values()) <= 2
+        return sum(max(0, cost - count) for cost, count in zip(CITY_COST, self.resources)) <= 2
     
     def get_best_trade_for_settlement(self, legal_actions, gameState):
-        needed_resources = [r for r in SETTLEMENT_COST if self.resources[r] < SETTLEMENT_COST[r]]
+        needed_resources = [r for r in RESOURCES if self.resources[r] < SETTLEMENT_COST[r]]
         if len(needed_resources) != 1:
             return None
         
@@ -1588,8 +1764,8 @@ class QLearningAgent(PlayerAgent):
                 return 0, best_road
 
         # If no priority actions, use epsilon-greedy
-        if random.random() < self.epsilon:
-            return 0, random.choice(legal_actions)
+        if self.rng.random() < self.epsilon:
+            return 0, self.rng.choice(legal_actions)
         else:
             return 0, max(legal_actions, key=lambda a: self.get_q_value(self.get_state(gameState), self.make_action_hashable(a)))
     
@@ -1615,8 +1791,8 @@ class QLearningAgent(PlayerAgent):
             return 0, dev_card_actions[0]
 
         # If no priority actions, use epsilon-greedy
-        if random.random() < self.epsilon:
-            return 0, random.choice(legal_actions)
+        if self.rng.random() < self.epsilon:
+            return 0, self.rng.choice(legal_actions)
         else:
             return 0, max(legal_actions, key=lambda a: self.get_q_value(self.get_state(gameState), self.make_action_hashable(a)))
     
@@ -1645,13 +1821,11 @@ class QLearningAgent(PlayerAgent):
         best_trade = None
         best_value = float('-inf')
         
-        target_resources = set(SETTLEMENT_COST.keys()).union(set(CITY_COST.keys()))
-        
         for action in trade_actions:
             _, (give, get) = action
-            if get in target_resources:
+            if SETTLEMENT_COST[get] or CITY_COST[get]:
                 value = 50 - self.resources[give]  # Prioritize trades that give us needed resources
-                if get in CITY_COST:
+                if CITY_COST[get]:
                     value += 25  # Extra value for city resources
                 if value > best_value:
                     best_value = value
@@ -1687,7 +1861,7 @@ class QLearningAgent(PlayerAgent):
             reward += resource_value * 20
         elif action[0] == ACTIONS.TRADE:
             _, (give, get) = action
-            if self.is_close_to_settlement() and get in SETTLEMENT_COST:
+            if self.is_close_to_settlement() and SETTLEMENT_COST[get]:
                 reward += 200  # High reward for trading towards a settlement
         elif action[0] == ACTIONS.ROAD:
             if self.road_leads_to_settlement(action[1], gameState.board):
@@ -1726,16 +1900,17 @@ class QLearningAgent(PlayerAgent):
             opponent_impact = self.evaluate_win_likelihood(opponent_next_state)
             priority *= (1 + opponent_impact)  # Increase priority if the opponent's action is impactful
 
-        experience = Experience(state, action, next_state, reward, gameState, priority)
+        experience = Experience(state, action, next_state, reward, gameState.gameOver(), priority)
         
         if len(self.experience_buffer) < self.buffer_size:
             self.experience_buffer.append(experience)
         else:
-            index = np.random.randint(0, self.buffer_size)
+            index = self.rng.randrange(self.buffer_size)
             self.experience_buffer[index] = experience
         
         self.perform_experience_replay()
         self.visit_counts[state] += 1
+        self.enforce_memory_caps()
 
         # Prune Q-table periodically
         if self.iteration % self.prune_frequency == 0:
@@ -1772,7 +1947,7 @@ class QLearningAgent(PlayerAgent):
             len(opponent.settlements),
             len(opponent.cities),
             len(opponent.roads),
-            tuple(opponent.resources.values()),
+            handKey(opponent.resources),
         )
 
     def predict_opponent_action(self, gameState):
@@ -1812,12 +1987,18 @@ class QLearningAgent(PlayerAgent):
         priorities = np.array([exp.priority for exp in self.experience_buffer])
         probabilities = priorities / np.sum(priorities)
         
-        indices = np.random.choice(len(self.experience_buffer), size=self.batch_size, p=probabilities, replace=False)
+        indices = self.numpy_rng().choice(len(self.experience_buffer), size=self.batch_size, p=probabilities, replace=False)
         batch = [self.experience_buffer[i] for i in indices]
         
         for experience in batch:
-            self.q_learning_update(experience.state, experience.action, experience.next_state, experience.reward, experience.gameState)
+            self.q_learning_update(experience.state, experience.action, experience.next_state, experience.reward, experience.outcome)
     
+    def numpy_rng(self):
+        # Derived from the agent's stream on first use, so replay sampling is reproducible too
+        if self.np_rng is None:
+            self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        return self.np_rng
+
     def calculate_reward(self, old_state, new_state, gameState):
         reward = 0
         if new_state[0] > old_state[0]:  # Victory points increased
@@ -1834,13 +2015,13 @@ class QLearningAgent(PlayerAgent):
             reward += 200
         return reward
     
-    def q_learning_update(self, state, action, next_state, reward, gameState):
+    def q_learning_update(self, state, action, next_state, reward, outcome):
         old_q = self.get_q_value(state, action)
         next_max = self.get_max_q_value(next_state)
 
-        if gameState.gameOver() == self.agentIndex:
+        if outcome == self.agentIndex:
             reward = 2000
-        elif gameState.gameOver() >= 0:
+        elif outcome >= 0:
             reward = -2000
         else:
             vp_gain = next_state[0] - state[0]
@@ -1878,6 +2059,8 @@ class QLearningAgent(PlayerAgent):
         self.save_q_table()
 
     def save_q_table_data(self, q_table, iteration):
+        if not self.persist:
+            return
         filename = f"q_table_player_{self.agentIndex}.pkl"
         data = {
             'q_table': q_table,
@@ -2150,37 +2333,39 @@ class QLearningAgent(PlayerAgent):
         return value
     
     def discard_half_on_seven(self, gameState):
-        total_resources = sum(self.resources.values())
+        total_resources = sum(self.resources)
         if total_resources <= 7:
             return None
 
         discard_count = total_resources // 2
-        discarded = Counter()
+        discarded = resourceArray()
         resource_values = self.calculate_resource_values()
 
         for _ in range(discard_count):
-            resource = min(self.resources.keys(), key=lambda r: resource_values.get(r, 0) if self.resources[r] > 0 else float('inf'))
+            resource = min(RESOURCES, key=lambda r: resource_values.get(r, 0) if self.resources[r] > discarded[r] else float('inf'))
             discarded[resource] += 1
-            self.resources[resource] = max(0, self.resources[resource] - 1)
 
-        gameState.bank += discarded
+        payResources(self.resources, gameState.bank, discarded)
         return discarded
     
     def calculate_resource_values(self):
         values = {r: 0 for r in ResourceTypes if r != ResourceTypes.NOTHING}
         if self.canSettle():
-            for r in SETTLEMENT_COST:
-                values[r] += 2
+            for r in RESOURCES:
+                if SETTLEMENT_COST[r]:
+                    values[r] += 2
         if self.canBuildCity():
-            for r in CITY_COST:
-                values[r] += 3
+            for r in RESOURCES:
+                if CITY_COST[r]:
+                    values[r] += 3
         if len(self.roads) < MAX_ROADS:
-            for r in ROAD_COST:
-                values[r] += 1
+            for r in RESOURCES:
+                if ROAD_COST[r]:
+                    values[r] += 1
         return values
 
-    def steal_resource(self, victim):
-        if not victim.resources or sum(victim.resources.values()) == 0:
+    def steal_resource(self, victim, rng=random):
+        if sum(victim.resources) == 0:
             return None
         
         # Use a simplified state representation that doesn't depend on gameState
@@ -2189,14 +2374,14 @@ class QLearningAgent(PlayerAgent):
             len(self.settlements),
             len(self.cities),
             len(self.roads),
-            tuple(self.resources.values())
+            handKey(self.resources)
         )
         
-        if state not in self.q_table or not victim.resources:
-            resource = random.choice([r for r in victim.resources.keys() if victim.resources[r] > 0])
+        if state not in self.q_table:
+            resource = rng.choice([r for r in RESOURCES if victim.resources[r] > 0])
         else:
             resource = max(
-                [r for r in victim.resources.keys() if victim.resources[r] > 0],
+                [r for r in RESOURCES if victim.resources[r] > 0],
                 key=lambda r: self.q_table[state].get((ACTIONS.STEAL, r), 0)
             )
         
@@ -2231,6 +2416,35 @@ class QLearningAgent(PlayerAgent):
         print(f"Pruned {len(states_to_remove)} states from Q-table")
         self.save_q_table()  # Save the pruned Q-table
 
+    def enforce_memory_caps(self):
+        # Once a table outgrows its cap, evict its least used states down to EVICTION_TARGET of the cap
+        if self.max_q_states is not None:
+            if len(self.q_table) > self.max_q_states:
+                for state in self.least_used(self.q_table, self.visit_counts.__getitem__, self.max_q_states):
+                    del self.q_table[state]
+                    self.visit_counts.pop(state, None)
+                    self.evicted_states += 1
+            if len(self.visit_counts) > self.max_q_states:
+                for state in self.least_used(self.visit_counts, self.visit_counts.__getitem__, self.max_q_states):
+                    del self.visit_counts[state]
+        if self.max_opponent_states is not None and len(self.opponent_model) > self.max_opponent_states:
+            counts = lambda state: sum(self.opponent_model[state].values())
+            for state in self.least_used(self.opponent_model, counts, self.max_opponent_states):
+                del self.opponent_model[state]
+                self.evicted_states += 1
+
+    def least_used(self, table, count, cap):
+        excess = len(table) - int(cap * EVICTION_TARGET)
+        return sorted(table, key=count)[:excess]
+
+    def memory_structures(self):
+        return {
+            "q_table": self.q_table,
+            "visit_counts": self.visit_counts,
+            "opponent_model": self.opponent_model,
+            "experience_buffer": self.experience_buffer,
+        }
+
 
     def predict_opponent_action(self, gameState):
         opponent_index = 1 - self.agentIndex
@@ -2250,9 +2464,12 @@ class LookAheadRolloutPlayer(ValueFunctionPlayer):
     
     def getAction(self, state):
         # In our code rn, self.epsilon is always None
-        if self.epsilon is not None and random.random() < self.epsilon:
-            return random.choice(state.getLegalActions(self.agentIndex))
+        if self.epsilon is not None and self.rng.random() < self.epsilon:
+            return self.rng.choice(state.getLegalActions(self.agentIndex))
 
+        stats = self.search_stats
+        stats.begin_decision()
+        stats.nodes_expanded += 1
         best_value = float("-inf")
         best_action = None
         for action in state.getLegalActions(self.agentIndex):
@@ -2264,14 +2481,17 @@ class LookAheadRolloutPlayer(ValueFunctionPlayer):
             if value > best_value:
                 best_value = value
                 best_action = action
+        stats.end_decision()
         return 0 if not best_action else best_value, best_action if best_action else (ACTIONS.PASS, None)
 
 
     def rollout_policy(self, state, i):
-        return random.choice(state.getLegalActions(i))
+        self.search_stats.rollout_steps += 1
+        return self.rng.choice(state.getLegalActions(i))
 
     def rollout(self, state, initial_action, depth):
 
+        stats = self.search_stats
         value = 0
         num_turns = 0
         tookinitialaction = False
@@ -2282,6 +2502,9 @@ class LookAheadRolloutPlayer(ValueFunctionPlayer):
             tookinitialaction = True
             successor = successor.generateSuccessor(self.agentIndex, my_action)
             value += self.value_fn(successor, self.agentIndex)
+            stats.successors_generated += 1
+            stats.evaluations += 1
+            stats.reached(num_turns + 1)
 
             if successor.gameOver() >= 0:
                 if successor.gameOver() == self.agentIndex:
@@ -2290,11 +2513,14 @@ class LookAheadRolloutPlayer(ValueFunctionPlayer):
             opponent_index = 1 - self.agentIndex
             opponent_action = self.rollout_policy(successor, opponent_index)
             successor = successor.generateSuccessor(opponent_index, opponent_action)
+            stats.successors_generated += 1
+            stats.reached(num_turns + 2)
 
             if successor.gameOver() >= 0:
                 return DEFAULT_WEIGHTS["losing"]
 
             value += self.value_fn(successor, self.agentIndex)
+            stats.evaluations += 1
             num_turns += 2
         
         if num_turns > 0: 
@@ -0,0 +1,615 @@
+"""
+Array-backed engine for batches of random playouts.
+
+BatchEngine keeps the complete state of B two-player games in NumPy arrays, one
+row per game: building and road occupancy, hands, bank, dev card counts, robber,
+victory points and the longest road and largest army caches. Dice, production,
+sevens, legal action masks and uniform random action choice are computed for all
+rows at once, so a batch of games costs a handful of array operations per turn
+instead of a Python object graph per game.
+
+The rules are the ones GameState implements, quirks included: the robber does not
+block production, and dev cards are played the way PlayerAgentRandom plays the
+actions getLegalActions offers (one road for Road Building, grain and lumber for
+Year of Plenty, grain for Monopoly). The random policy picks uniformly among the
+distinct legal action ids, and ids are ActionSpace ids, so masks line up with
+VecCatanEnv and game records.
+
+Usage:
+    engine = BatchEngine(4096, seed=0)
+    engine.reset()
+    winners = engine.run()
+
+    # Monte Carlo win probabilities from a real game's position
+    estimate_win_probability(game.gameState, game.currentAgentIndex, numPlayouts=2048)
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+from actionSpace import ActionSpace
+from board import Board, LAYOUTS, getLayoutId
+from gameConstants import *
+
+RESOURCE_INDEX = {resource: i for i, resource in enumerate(RESOURCES)}
+BRICK, WOOL, ORE, GRAIN, LUMBER = (RESOURCE_INDEX[resource] for resource in
+                                   (ResourceTypes.BRICK, ResourceTypes.WOOL, ResourceTypes.ORE,
+                                    ResourceTypes.GRAIN, ResourceTypes.LUMBER))
+DEV_INDEX = {cardType: i for i, cardType in enumerate(DevCardTypes)}
+KNIGHT_CARD, VICTORY_POINT_CARD, ROAD_BUILDING_CARD = (DEV_INDEX[DevCardTypes.KNIGHT], DEV_INDEX[DevCardTypes.VICTORY_POINT],
+                                                       DEV_INDEX[DevCardTypes.ROAD_BUILDING])
+YEAR_OF_PLENTY_CARD, MONOPOLY_CARD = DEV_INDEX[DevCardTypes.YEAR_OF_PLENTY], DEV_INDEX[DevCardTypes.MONOPOLY]
+
+
+def costVector(cost):
+    return np.array([cost[resource] for resource in RESOURCES], dtype=np.int16)
+
+
+ROAD_COST_VECTOR = costVector(ROAD_COST)
+SETTLEMENT_COST_VECTOR = costVector(SETTLEMENT_COST)
+CITY_COST_VECTOR = costVector(CITY_COST)
+DEV_CARD_COST_VECTOR = costVector(DEV_CARD_COST)
+BANK_VECTOR = costVector(BANK_RESOURCES)
+DECK_VECTOR = np.array([DEV_CARD_DECK.count(cardType) for cardType in DevCardTypes], dtype=np.int16)
+
+
+class BoardArrays:
+    """
+    The static adjacency of a layout as index arrays, with vertices, edges and hexes
+    numbered in ActionSpace order. Missing neighbours are padded with one past the
+    last index, which the engine keeps as an always-empty column.
+    """
+
+    _cache = {}
+
+    def __init__(self, layoutId):
+        space = ActionSpace.forLayout(layoutId)
+        board = Board(LAYOUTS[layoutId])
+        self.space = space
+        vertexIndex = {location: i for i, location in enumerate(space.vertices)}
+        edgeIndex = {location: i for i, location in enumerate(space.edges)}
+        self.numVertices = V = len(space.vertices)
+        self.numEdges = E = len(space.edges)
+        self.numHexes = H = len(space.hexes)
+
+        def index(piece, lookup):
+            return lookup[(piece.X, piece.Y)]
+
+        self.edgeVertices = np.array([[index(vertex, vertexIndex) for vertex in board.getVertexEnds(board.getEdge(*location))]
+                                      for location in space.edges])
+        self.edgeVertexList = [tuple(vertices) for vertices in self.edgeVertices.tolist()]
+        self.vertexEdges = np.full((V, 3), E)
+        self.vertexNeighbors = np.full((V, 3), V)
+        for i, location in enumerate(space.vertices):
+            vertex = board.getVertex(*location)
+            for j, edge in enumerate(board.getEdgesOfVertex(vertex)):
+                self.vertexEdges[i, j] = index(edge, edgeIndex)
+            for j, neighbor in enumerate(board.getNeighborVertices(vertex)):
+                self.vertexNeighbors[i, j] = index(neighbor, vertexIndex)
+
+        self.vertexEdgeList = [[edge for edge in edges if edge < E] for edges in self.vertexEdges.tolist()]
+
+        self.hexVertices = np.zeros((H, 6), dtype=np.intp)
+        self.hexNumber = np.zeros(H, dtype=np.int16)
+        self.hexResources = np.zeros((H, len(RESOURCES)), dtype=np.float32)  # one-hot, all zero for the desert
+        self.incidence = np.zeros((V, H), dtype=np.float32)  # vertex i touches hex j
+        for j, location in enumerate(space.hexes):
+            hexagon = board.getHex(*location)
+            self.hexNumber[j] = hexagon.diceValue
+            if hexagon.resource != ResourceTypes.NOTHING:
+                self.hexResources[j, RESOURCE_INDEX[hexagon.resource]] = 1
+            for k, vertex in enumerate(board.getVertices(hexagon)):
+                self.hexVertices[j, k] = index(vertex, vertexIndex)
+                self.incidence[self.hexVertices[j, k], j] = 1
+        self.producing = self.hexResources.any(axis=1)  # every hex but the desert
+        # The producing hexes of each dice roll, padded with a hex past the end that touches only padding
+        self.paddedHexVertices = np.vstack([self.hexVertices, np.full((1, 6), V)])
+        self.paddedHexResources = np.vstack([self.hexResources, np.zeros((1, len(RESOURCES)))]).astype(np.int16)
+        rollHexes = [np.flatnonzero((self.hexNumber == roll) & self.producing) for roll in range(13)]
+        self.rollHexes = np.full((13, max(len(hexes) for hexes in rollHexes)), H)
+        for roll, hexes in enumerate(rollHexes):
+            self.rollHexes[roll, :len(hexes)] = hexes
+        desert = board.get_desert_hex()
+        self.desert = space.hexes.index((desert.X, desert.Y))
+        self.vertexResources = self.incidence @ self.hexResources  # resources a settlement on each vertex touches
+
+        ids = space.ids
+        self.PASS = ids[(ACTIONS.PASS, None)]
+        self.BUY_DEV_CARD = ids[(ACTIONS.BUY_DEV_CARD, None)]
+        self.TRADE = ids[(ACTIONS.TRADE, (RESOURCES[0], RESOURCES[1]))]
+        trades = [(give, get) for give in range(len(RESOURCES)) for get in range(len(RESOURCES)) if give != get]
+        self.tradeGive = np.array([give for give, get in trades])
+        self.tradeGet = np.array([get for give, get in trades])
+        self.ROAD = ids[(ACTIONS.ROAD, space.edges[0])]
+        self.SETTLE = ids[(ACTIONS.SETTLE, space.vertices[0])]
+        self.CITY = ids[(ACTIONS.CITY, space.vertices[0])]
+        self.KNIGHT = ids[(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.KNIGHT, space.hexes[0]))]
+        self.ROAD_BUILDING = ids[(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING, space.edges[0]))]
+        self.YEAR_OF_PLENTY = ids[(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.YEAR_OF_PLENTY, (ResourceTypes.GRAIN, ResourceTypes.LUMBER)))]
+        self.MONOPOLY = ids[(ACTIONS.PLAY_DEV_CARD, (DevCardTypes.MONOPOLY, ResourceTypes.GRAIN))]
+        # Only the ids below this can ever be legal for the random policy
+        self.numActions = max(self.YEAR_OF_PLENTY, self.MONOPOLY, self.ROAD_BUILDING + E) + 1
+
+    @classmethod
+    def forLayout(cls, layoutId):
+        if layoutId not in cls._cache:
+            cls._cache[layoutId] = cls(layoutId)
+        return cls._cache[layoutId]
+
+
+class BatchEngine:
+    def __init__(self, numGames, layoutId=0, seed=None):
+        self.numGames = numGames
+        self.board = BoardArrays.forLayout(layoutId)
+        self.rng = np.random.default_rng(seed)
+
+        B, P, R, D = numGames, NUM_PLAYERS, len(RESOURCES), len(DevCardTypes)
+        V, E = self.board.numVertices, self.board.numEdges
+        self.vertexOwner = np.full((B, V + 1), -1, dtype=np.int8)
+        self.vertexCity = np.zeros((B, V + 1), dtype=bool)
+        self.edgeOwner = np.full((B, E + 1), -1, dtype=np.int8)
+        self.hands = np.zeros((B, P, R), dtype=np.int16)
+        self.bank = np.zeros((B, R), dtype=np.int16)
+        self.deck = np.zeros((B, D), dtype=np.int16)
+        self.devNew = np.zeros((B, P, D), dtype=np.int16)  # bought this turn, playable from the next
+        self.devPlayable = np.zeros((B, P, D), dtype=np.int16)
+        self.devPlayed = np.zeros((B, P, D), dtype=np.int16)
+        self.robber = np.zeros(B, dtype=np.intp)
+        self.victoryPoints = np.zeros((B, P), dtype=np.int16)
+        self.numRoads = np.zeros((B, P), dtype=np.int16)
+        self.numSettlements = np.zeros((B, P), dtype=np.int16)  # counted the way PlayerAgent counts them
+        self.numCities = np.zeros((B, P), dtype=np.int16)
+        self.knights = np.zeros((B, P), dtype=np.int16)
+        self.longestRoad = np.zeros((B, P), dtype=np.int16)
+        self.longestRoadHolder = np.full(B, -1, dtype=np.int8)
+        self.largestArmyHolder = np.full(B, -1, dtype=np.int8)
+        self.current = np.zeros(B, dtype=np.int8)
+        self.turn = np.ones(B, dtype=np.int32)
+        self.winner = np.full(B, -1, dtype=np.int8)
+        self.done = np.ones(B, dtype=bool)
+        self.turnsPlayed = 0  # game turns summed over all rows
+
+    def clear(self, rows):
+        self.vertexOwner[rows] = -1
+        self.vertexCity[rows] = False
+        self.edgeOwner[rows] = -1
+        self.hands[rows] = 0
+        self.bank[rows] = BANK_VECTOR
+        self.deck[rows] = DECK_VECTOR
+        self.devNew[rows] = 0
+        self.devPlayable[rows] = 0
+        self.devPlayed[rows] = 0
+        self.robber[rows] = self.board.desert
+        self.victoryPoints[rows] = 2
+        self.numRoads[rows] = 2
+        self.numSettlements[rows] = 2
+        self.numCities[rows] = 0
+        self.knights[rows] = 0
+        self.longestRoad[rows] = 0
+        self.longestRoadHolder[rows] = -1
+        self.largestArmyHolder[rows] = -1
+        self.current[rows] = 0
+        self.turn[rows] = 1
+        self.winner[rows] = -1
+        self.done[rows] = False
+
+    def reset(self, rows=None):
+        # Fresh games with random setup placements, as Game plays them for random agents
+        board = self.board
+        rows = np.arange(self.numGames) if rows is None else np.asarray(rows)
+        self.clear(rows)
+        lastSettlement = np.zeros((rows.size, NUM_PLAYERS), dtype=np.intp)
+        for player in [0, 1, 1, 0]:
+            owners = self.vertexOwner[rows]
+            free = (owners[:, :board.numVertices] < 0) & (owners[:, board.vertexNeighbors] < 0).all(axis=2)
+            vertex = self.sample(free)
+            self.vertexOwner[rows, vertex] = player
+            lastSettlement[:, player] = vertex
+            edges = board.vertexEdges[vertex]
+            free = (self.edgeOwner[rows[:, None], edges] < 0) & (edges < board.numEdges)
+            edge = edges[np.arange(rows.size), self.sample(free)]
+            self.edgeOwner[rows, edge] = player
+        for player in range(NUM_PLAYERS):
+            # The bank can always cover the first handout
+            resources = board.vertexResources[lastSettlement[:, player]].astype(np.int16)
+            self.hands[rows, player] += resources
+            self.bank[rows] -= resources
+
+    def load(self, gameState, currentPlayer, turnNumber=1, rows=None):
+        # Copies a GameState, with currentPlayer about to roll, into rows (every row by default)
+        board = self.board
+        space = board.space
+        rows = np.arange(self.numGames) if rows is None else np.asarray(rows)
+        self.clear(rows)
+        vertexIndex = {location: i for i, location in enumerate(space.vertices)}
+        edgeIndex = {location: i for i, location in enumerate(space.edges)}
+        for player, agent in enumerate(gameState.playerAgents):
+            for vertex in agent.settlements + agent.cities:
+                self.vertexOwner[rows, vertexIndex[(vertex.X, vertex.Y)]] = player
+            for vertex in agent.cities:
+                self.vertexCity[rows, vertexIndex[(vertex.X, vertex.Y)]] = True
+            for edge in agent.roads:
+                self.edgeOwner[rows, edgeIndex[(edge.X, edge.Y)]] = player
+            self.hands[rows, player] = agent.resources
+            self.devNew[rows, player] = agent.unplayable_dev_cards
+            self.devPlayable[rows, player] = agent.playable_dev_cards
+            self.devPlayed[rows, player] = agent.played_dev_cards
+            self.victoryPoints[rows, player] = agent.victoryPoints
+            self.numRoads[rows, player] = agent.numRoads
+            self.numSettlements[rows, player] = agent.numSettlements
+            self.numCities[rows, player] = agent.numCities
+            self.knights[rows, player] = agent.played_knights
+            self.longestRoad[rows, player] = agent.longestRoadLength
+            if agent.hasLongestRoad:
+                self.longestRoadHolder[rows] = player
+            if agent.has_largest_army:
+                self.largestArmyHolder[rows] = player
+        self.bank[rows] = gameState.bank
+        self.deck[rows] = [gameState.dev_card_deck.count(cardType) for cardType in DevCardTypes]
+        robber = gameState.board.robber.hex
+        self.robber[rows] = space.hexes.index((robber.X, robber.Y))
+        self.current[rows] = currentPlayer
+        self.turn[rows] = turnNumber
+        self.check_winners(rows)
+
+    def sample(self, mask):
+        # Uniform choice of a True column in every row of mask
+        return np.argmax(self.rng.random(mask.shape, dtype=np.float32) * mask, axis=1)
+
+    def sample_card(self, counts):
+        # One card drawn uniformly from each row's (non-empty) pile of counts
+        draw = self.rng.random(len(counts)) * counts.sum(axis=1)
+        return (np.cumsum(counts, axis=1) <= draw[:, None]).sum(axis=1)
+
+    def run(self, maxTurns=None):
+        # Plays every unfinished game to the end (or for maxTurns turns); returns the winners, -1 for cut off games
+        turns = 0
+        while not self.done.all() and (maxTurns is None or turns < maxTurns):
+            self.play_turn()
+            turns += 1
+        return self.winner.copy()
+
+    def play_turn(self):
+        rows = np.flatnonzero(~self.done)
+        players = self.current[rows].astype(np.intp)
+        rolls = self.rng.integers(1, 7, rows.size) + self.rng.integers(1, 7, rows.size)
+        seven = rolls == 7
+        self.produce(rows[~seven], rolls[~seven])
+        self.handle_seven(rows[seven], players[seven])
+        self.play_actions(rows)
+        self.end_turn(rows[~self.done[rows]])
+        self.turnsPlayed += rows.size
+
+    def produce(self, rows, rolls):
+        board = self.board
+        # Only the (at most two) hexes with the rolled number are looked at
+        hexes = board.rollHexes[rolls]
+        vertices = board.paddedHexVertices[hexes]
+        owners = self.vertexOwner[rows[:, None, None], vertices]
+        amounts = 1 + self.vertexCity[rows[:, None, None], vertices]
+        resources = board.paddedHexResources[hexes]
+        for player in range(NUM_PLAYERS):
+            perHex = ((owners == player) * amounts).sum(axis=2, dtype=np.int16)
+            gain = (perHex[:, :, None] * resources).sum(axis=1, dtype=np.int16)
+            # As in GameState, a player whose whole payout the bank can't cover gets nothing
+            gain *= (self.bank[rows] >= gain).all(axis=1)[:, None]
+            self.bank[rows] -= gain
+            self.hands[rows, player] += gain
+
+    def handle_seven(self, rows, players):
+        for player in range(NUM_PLAYERS):
+            total = self.hands[rows, player].sum(axis=1)
+            remaining = np.where(total > 7, total // 2, 0)
+            while remaining.any():
+                discarding = np.flatnonzero(remaining)
+                discardRows = rows[discarding]
+                card = self.sample_card(self.hands[discardRows, player])
+                self.hands[discardRows, player, card] -= 1
+                self.bank[discardRows, card] += 1
+                remaining[discarding] -= 1
+        valid = self.board.producing & (np.arange(self.board.numHexes) != self.robber[rows, None])
+        self.move_robber_and_steal(rows, players, self.sample(valid))
+
+    def move_robber_and_steal(self, rows, players, hexes):
+        self.robber[rows] = hexes
+        victims = 1 - players
+        adjacent = (self.vertexOwner[rows[:, None], self.board.hexVertices[hexes]] == victims[:, None]).any(axis=1)
+        stealing = np.flatnonzero(adjacent & (self.hands[rows, victims].sum(axis=1) > 0))
+        if stealing.size:
+            stealRows, thieves, victims = rows[stealing], players[stealing], victims[stealing]
+            card = self.sample_card(self.hands[stealRows, victims])
+            self.hands[stealRows, victims, card] -= 1
+            self.hands[stealRows, thieves, card] += 1
+
+    def play_actions(self, rows):
+        # The random policy keeps acting until it picks PASS (or wins)
+        acting = rows
+        while acting.size:
+            players = self.current[acting].astype(np.intp)
+            # Most of the time a player can afford nothing, and PASS is the only choice
+            able = self.can_act(acting, players)
+            acting, players = acting[able], players[able]
+            if not acting.size:
+                break
+            actions = self.sample(self.legal_mask(acting, players))
+            self.apply(acting, players, actions)
+            self.check_winners(acting)
+            keep = (actions != self.board.PASS) & ~self.done[acting]
+            acting = acting[keep]
+
+    def can_act(self, rows, players):
+        # Whether anything but PASS might be legal; cheap enough to run on every acting row
+        hands = self.hands[rows, players]
+        return ((hands[:, BRICK] >= 1) & (hands[:, LUMBER] >= 1) & (self.numRoads[rows, players] < MAX_ROADS)
+                | (hands >= SETTLEMENT_COST_VECTOR).all(axis=1)
+                | (hands >= CITY_COST_VECTOR).all(axis=1)
+                | (hands >= DEV_CARD_COST_VECTOR).all(axis=1)
+                | (hands >= 4).any(axis=1)
+                | (self.devPlayable[rows, players] > 0).any(axis=1))
+
+    def legal_mask(self, rows, players):
+        board = self.board
+        V, E = board.numVertices, board.numEdges
+        mask = np.zeros((rows.size, board.numActions), dtype=bool)
+        mask[:, board.PASS] = True
+        hands = self.hands[rows, players]
+        playable = self.devPlayable[rows, players]
+        numRoads = self.numRoads[rows, players]
+        numSettlements = self.numSettlements[rows, players]
+        owners = self.vertexOwner[rows]
+
+        ownRoads = self.edgeOwner[rows] == players[:, None]
+        roadAtVertex = ownRoads[:, board.vertexEdges].any(axis=2)
+        roadSpots = (self.edgeOwner[rows, :E] < 0) & (roadAtVertex[:, board.edgeVertices[:, 0]] | roadAtVertex[:, board.edgeVertices[:, 1]])
+        canRoad = (hands[:, BRICK] >= 1) & (hands[:, LUMBER] >= 1) & (numRoads < MAX_ROADS)
+        mask[:, board.ROAD:board.ROAD + E] = roadSpots & canRoad[:, None]
+
+        canSettle = (hands >= SETTLEMENT_COST_VECTOR).all(axis=1) & (numSettlements < MAX_SETTLEMENTS)
+        if canSettle.any():
+            settleSpots = (owners[:, :V] < 0) & (owners[:, board.vertexNeighbors] < 0).all(axis=2) & roadAtVertex
+            mask[:, board.SETTLE:board.SETTLE + V] = settleSpots & canSettle[:, None]
+
+        canCity = (hands >= CITY_COST_VECTOR).all(axis=1) & (self.numCities[rows, players] < MAX_CITIES) & (numSettlements > 0)
+        if canCity.any():
+            citySpots = (owners[:, :V] == players[:, None]) & ~self.vertexCity[rows, :V]
+            mask[:, board.CITY:board.CITY + V] = citySpots & canCity[:, None]
+
+        mask[:, board.TRADE:board.TRADE + len(board.tradeGive)] = (hands[:, board.tradeGive] >= 4) & (self.bank[rows][:, board.tradeGet] > 0)
+        mask[:, board.BUY_DEV_CARD] = (hands >= DEV_CARD_COST_VECTOR).all(axis=1) & (self.deck[rows].sum(axis=1) > 0)
+
+        if playable.any():
+            robberHexes = board.producing & (np.arange(board.numHexes) != self.robber[rows, None])
+            mask[:, board.KNIGHT:board.KNIGHT + board.numHexes] = robberHexes & (playable[:, KNIGHT_CARD] > 0)[:, None]
+            mask[:, board.ROAD_BUILDING:board.ROAD_BUILDING + E] = roadSpots & (playable[:, ROAD_BUILDING_CARD] > 0)[:, None]
+            mask[:, board.YEAR_OF_PLENTY] = playable[:, YEAR_OF_PLENTY_CARD] > 0
+            mask[:, board.MONOPOLY] = playable[:, MONOPOLY_CARD] > 0
+        return mask
+
+    def apply(self, rows, players, actions):
+        board = self.board
+
+        def select(start, count=1):
+            chosen = np.flatnonzero((actions >= start) & (actions < start + count))
+            return rows[chosen], players[chosen], actions[chosen] - start
+
+        r, p, _ = select(board.BUY_DEV_CARD)
+        if r.size:
+            self.pay(r, p, DEV_CARD_COST_VECTOR)
+            card = self.sample_card(self.deck[r])
+            self.deck[r, card] -= 1
+            self.devNew[r, p, card] += 1
+            self.victoryPoints[r, p] += card == VICTORY_POINT_CARD
+
+        r, p, trade = select(board.TRADE, len(board.tradeGive))
+        if r.size:
+            give, get = board.tradeGive[trade], board.tradeGet[trade]
+            self.hands[r, p, give] -= 4
+            self.hands[r, p, get] += 1
+            self.bank[r, give] += 4
+            self.bank[r, get] -= 1
+
+        r, p, edge = select(board.ROAD, board.numEdges)
+        if r.size:
+            self.pay(r, p, ROAD_COST_VECTOR)
+            self.edgeOwner[r, edge] = p
+            self.numRoads[r, p] += 1
+            self.update_longest_road(r, p, edge)
+
+        r, p, vertex = select(board.SETTLE, board.numVertices)
+        if r.size:
+            self.pay(r, p, SETTLEMENT_COST_VECTOR)
+            self.vertexOwner[r, vertex] = p
+            self.victoryPoints[r, p] += SETTLEMENT_VICTORY_POINTS
+            self.numSettlements[r, p] += 1
+
+        r, p, vertex = select(board.CITY, board.numVertices)
+        if r.size:
+            self.pay(r, p, CITY_COST_VECTOR)
+            self.vertexCity[r, vertex] = True
+            self.victoryPoints[r, p] += 1
+            self.numCities[r, p] += 1
+            self.numSettlements[r, p] -= 1
+
+        r, p, hexes = select(board.KNIGHT, board.numHexes)
+        if r.size:
+            self.use_card(r, p, KNIGHT_CARD)
+            self.knights[r, p] += 1
+            self.move_robber_and_steal(r, p, hexes)
+
+        r, p, edge = select(board.ROAD_BUILDING, board.numEdges)
+        if r.size:
+            # Like PlayerAgent.applyAction, a free road doesn't update the longest road
+            self.use_card(r, p, ROAD_BUILDING_CARD)
+            building = self.numRoads[r, p] < MAX_ROADS
+            r, p, edge = r[building], p[building], edge[building]
+            self.edgeOwner[r, edge] = p
+            self.numRoads[r, p] += 1
+
+        r, p, _ = select(board.YEAR_OF_PLENTY)
+        if r.size:
+            self.use_card(r, p, YEAR_OF_PLENTY_CARD)
+            for resource in (GRAIN, LUMBER):
+                available = (self.bank[r, resource] > 0).astype(np.int16)
+                self.hands[r, p, resource] += available
+                self.bank[r, resource] -= available
+
+        r, p, _ = select(board.MONOPOLY)
+        if r.size:
+            self.use_card(r, p, MONOPOLY_CARD)
+            self.hands[r, p, GRAIN] += self.hands[r, 1 - p, GRAIN]
+            self.hands[r, 1 - p, GRAIN] = 0
+
+    def pay(self, rows, players, cost):
+        self.hands[rows, players] -= cost
+        self.bank[rows] += cost
+
+    def use_card(self, rows, players, card):
+        self.devPlayable[rows, players, card] -= 1
+        self.devPlayed[rows, players, card] += 1
+
+    def update_longest_road(self, rows, players, edges):
+        # Mirrors PlayerAgent.updateLongestRoad. Roads are never removed, so a player's longest
+        # road only changes within the network the new road joins, and a network of fewer than
+        # LONGEST_ROAD_LENGTH roads can't take the award or beat a holder.
+        enough = self.numRoads[rows, players] >= LONGEST_ROAD_LENGTH
+        for row, player, edge in zip(rows[enough].tolist(), players[enough].tolist(), edges[enough].tolist()):
+            length = self.network_longest_road(row, player, edge)
+            if length is None:
+                continue
+            length = max(length, self.longestRoad[row, player])
+            other = 1 - player
+            holder = self.longestRoadHolder[row]
+            if length >= LONGEST_ROAD_LENGTH and length > self.longestRoad[row, other]:
+                if holder != player:
+                    self.victoryPoints[row, player] += LONGEST_ROAD_POINTS
+                    if holder == other:
+                        self.victoryPoints[row, other] -= LONGEST_ROAD_POINTS
+                    self.longestRoadHolder[row] = player
+            elif holder == player and length < self.longestRoad[row, other]:
+                self.victoryPoints[row, player] -= LONGEST_ROAD_POINTS
+                self.longestRoadHolder[row] = -1
+            self.longestRoad[row, player] = length
+
+    def network_longest_road(self, row, player, edge):
+        # Longest path without repeated vertices (as Board.calculateLongestRoad counts it) in the
+        # network of the player's roads containing edge, or None if the network is too small to matter
+        board = self.board
+        owned = (self.edgeOwner[row] == player).tolist()
+        neighbors = {}
+        network = {edge}
+        stack = [edge]
+        while stack:
+            start, end = board.edgeVertexList[stack.pop()]
+            neighbors.setdefault(start, []).append(end)
+            neighbors.setdefault(end, []).append(start)
+            for vertex in (start, end):
+                for nextEdge in board.vertexEdgeList[vertex]:
+                    if owned[nextEdge] and nextEdge not in network:
+                        network.add(nextEdge)
+                        stack.append(nextEdge)
+        if len(network) < LONGEST_ROAD_LENGTH:
+            return None
+
+        if len(neighbors) == len(network) + 1:
+            # A tree (the usual case): its longest path is its diameter, found with two sweeps
+            far, _ = self.farthest(neighbors, next(iter(neighbors)))
+            return self.farthest(neighbors, far)[1]
+
+        def longest_from(vertex, visited):
+            best = 0
+            for neighbor in neighbors[vertex]:
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    best = max(best, 1 + longest_from(neighbor, visited))
+                    visited.remove(neighbor)
+            return best
+
+        return max(longest_from(vertex, {vertex}) for vertex in neighbors)
+
+    @staticmethod
+    def farthest(neighbors, start):
+        distance = {start: 0}
+        frontier = [start]
+        while frontier:
+            nextFrontier = []
+            for vertex in frontier:
+                for neighbor in neighbors[vertex]:
+                    if neighbor not in distance:
+                        distance[neighbor] = distance[vertex] + 1
+                        nextFrontier.append(neighbor)
+            frontier = nextFrontier
+        vertex = max(distance, key=distance.get)
+        return vertex, distance[vertex]
+
+    def end_turn(self, rows):
+        # GameState.checkLargestArmy (ties go to the lower seat, as max() picks there) and PlayerAgent.endTurn
+        knights = self.knights[rows]
+        leader = np.argmax(knights, axis=1)
+        holder = self.largestArmyHolder[rows]
+        changing = (knights[np.arange(rows.size), leader] >= LARGEST_ARMY_REQUIREMENT) & (holder != leader)
+        if changing.any():
+            changeRows, leader, holder = rows[changing], leader[changing], holder[changing]
+            losing = holder >= 0
+            self.victoryPoints[changeRows[losing], holder[losing]] -= LARGEST_ARMY_POINTS
+            self.victoryPoints[changeRows, leader] += LARGEST_ARMY_POINTS
+            self.largestArmyHolder[changeRows] = leader
+
+        players = self.current[rows].astype(np.intp)
+        self.devPlayable[rows, players] += self.devNew[rows, players]
+        self.devNew[rows, players] = 0
+        self.current[rows] = 1 - players
+        self.turn[rows] += 1
+        self.check_winners(rows)
+        cutOff = rows[~self.done[rows] & (self.turn[rows] > CUTOFF_TURNS)]
+        self.done[cutOff] = True
+
+    def check_winners(self, rows):
+        # The first seat with enough points wins, as GameState.gameOver decides
+        won = self.victoryPoints[rows] >= VICTORY_POINTS_TO_WIN
+        finished = won.any(axis=1)
+        if finished.any():
+            self.winner[rows[finished]] = np.argmax(won[finished], axis=1)
+            self.done[rows[finished]] = True
+
+
+def estimate_win_probability(gameState, currentPlayer, numPlayouts=1024, seed=None, turnNumber=1):
+    # Fraction of random playouts from gameState each player wins (cut off games count for neither)
+    engine = BatchEngine(numPlayouts, getLayoutId(gameState.board.layout), seed)
+    engine.load(gameState, currentPlayer, turnNumber)
+    winners = engine.run()
+    return np.array([(winners == player).mean() for player in range(NUM_PLAYERS)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play batches of random games on the array engine and report throughput.")
+    parser.add_argument("-b", "--batch", type=int, default=4096, help="Games played at once.")
+    parser.add_argument("-n", "--num-batches", type=int, default=1, help="Batches to play.")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the first batch.")
+    args = parser.parse_args()
+
+    wins = np.zeros(NUM_PLAYERS + 1, dtype=np.int64)
+    turns = 0
+    start = time.perf_counter()
+    for batch in range(args.num_batches):
+        engine = BatchEngine(args.batch, seed=args.seed + batch)
+        engine.reset()
+        winners = engine.run()
+        wins += np.bincount(winners.astype(np.intp) + 1, minlength=NUM_PLAYERS + 1)
+        turns += engine.turnsPlayed
+    seconds = time.perf_counter() - start
+
+    games = args.batch * args.num_batches
+    print(f"{games} games, {turns} turns in {seconds:.2f}s: {turns / seconds:,.0f} turns/s, "
+          f"{turns / games:.1f} turns per game")
+    for player in range(NUM_PLAYERS):
+        print(f"Player {player} won {wins[player + 1] / games:.1%}")
+    print(f"Cut off: {wins[0] / games:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Engine benchmark suite.
+
+Times the engine's hot paths (board construction, state copies, legal action
+generation, longest road, the base_fn features and evaluation), whole random games
+on both the object engine and the array-backed BatchEngine, and the decision rate
+of every agent Game.createPlayer can build. All game states come from fixed seeds,
+so two runs do the same work and their JSON reports can be compared to catch
+regressions between builds.
+
+Usage:
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json --threshold 0.1
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# pygame greets on import, which would land in front of the JSON report on stdout
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from agents import REACHABILITY_DEPTH, base_fn
+from batchEngine import BatchEngine
+from board import BeginnerLayout, Board
+from game import Game, getStringForPlayer
+from gameConstants import *
+
+SEED = 0
+STATE_SEEDS = range(5)
+STATE_TURNS = 40
+REPEATS = 3
+
+
+def play_random_turns(seed, turns, playerAgentNums=(0, 0)):
+    game = Game(playerAgentNums=list(playerAgentNums), graphics=False, save_learning=False)
+    game.reset_game(seed)
+    while game.gameState.gameOver() < 0 and game.turnNumber <= turns:
+        game.run_game_turn()
+    return game
+
+
+def midgame_states():
+    return [play_random_turns(seed, STATE_TURNS).gameState for seed in STATE_SEEDS]
+
+
+def dense_road_board():
+    # One player owning a connected block of MAX_ROADS roads around neighbouring hexes,
+    # which is full of cycles and the worst case for the longest road search
+    board = Board(BeginnerLayout)
+    start = board.getHex(2, 2)
+    frontier = list(board.getVertices(start))
+    claimed = set()
+    while frontier and len(claimed) < MAX_ROADS:
+        vertex = frontier.pop(0)
+        for edge in board.getEdgesOfVertex(vertex):
+            if len(claimed) < MAX_ROADS and (edge.X, edge.Y) not in claimed:
+                claimed.add((edge.X, edge.Y))
+                board.applyAction(0, (ACTIONS.ROAD, edge))
+                frontier.extend(board.getVertexEnds(edge))
+    return board
+
+
+def measure(fn, ops):
+    # Best of REPEATS runs, so a noisy neighbour on the machine doesn't show up as a regression
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return {"ops": ops, "seconds": best, "ops_per_sec": ops / best if best > 0 else None}
+
+
+def bench_board_construction(n=200):
+    def run():
+        for _ in range(n):
+            Board(BeginnerLayout)
+    return measure(run, n)
+
+
+def bench_deep_copy(states, n=50):
+    def run():
+        for _ in range(n):
+            for state in states:
+                state.deepCopy()
+    return measure(run, n * len(states))
+
+
+def bench_generate_successor(states, n=5):
+    pairs = [(state, action) for state in states for action in state.getLegalActions(0)]
+
+    def run():
+        for _ in range(n):
+            for state, action in pairs:
+                state.generateSuccessor(0, action)
+    return measure(run, n * len(pairs))
+
+
+def bench_legal_actions(states, n=500):
+    def run():
+        for _ in range(n):
+            for state in states:
+                state.getLegalActions(0)
+                state.getLegalActions(1)
+    return measure(run, 2 * n * len(states))
+
+
+def bench_longest_road(n=20):
+    board = dense_road_board()
+
+    def run():
+        for _ in range(n):
+            board.calculateLongestRoad(0)
+    result = measure(run, n)
+    result["roads"] = len(board.allRoads)
+    return result
+
+
+def bench_reachability(states, n=100):
+    def run():
+        for _ in range(n):
+            for state in states:
+                state.board.reachability_features(REACHABILITY_DEPTH)
+    return measure(run, n * len(states))
+
+
+def bench_base_fn(states, n=100):
+    value_fn = base_fn()
+
+    def run():
+        for _ in range(n):
+            for state in states:
+                value_fn(state, 0)
+    return measure(run, n * len(states))
+
+
+def bench_random_games(n=20):
+    # Timed once; the games themselves are long enough to be stable
+    turns = 0
+    start = time.perf_counter()
+    for game_num in range(n):
+        game = Game(playerAgentNums=[0, 0], graphics=False, save_learning=False)
+        game.play_test_game(SEED + game_num)
+        turns += game.turnNumber - 1
+    seconds = time.perf_counter() - start
+    return {"ops": n, "seconds": seconds, "ops_per_sec": n / seconds, "turns_per_sec": turns / seconds}
+
+
+def bench_batch_engine(batch=4096, turns=100):
+    # Random-policy turns per second, with every game of the batch in lockstep for `turns` turns
+    turnsPlayed = []
+
+    def run():
+        engine = BatchEngine(batch, seed=SEED)
+        engine.reset()
+        engine.run(maxTurns=turns)
+        turnsPlayed.append(engine.turnsPlayed)
+    result = measure(run, batch * turns)
+    result["ops"] = turnsPlayed[-1]
+    result["ops_per_sec"] = turnsPlayed[-1] / result["seconds"]
+    return result
+
+
+def bench_decisions(playerCode, turns=60):
+    # Times every getAction call the agent makes in a game against the random agent
+    game = Game(playerAgentNums=[playerCode, 0], graphics=False, save_learning=False)
+    game.reset_game(SEED)
+    agent = game.gameState.playerAgents[0]
+    getAction = agent.getAction
+    calls = [0, 0.0]
+
+    def timed_get_action(state):
+        start = time.perf_counter()
+        result = getAction(state)
+        calls[0] += 1
+        calls[1] += time.perf_counter() - start
+        return result
+
+    agent.getAction = timed_get_action
+    while game.gameState.gameOver() < 0 and game.turnNumber <= turns:
+        game.run_game_turn()
+    decisions, seconds = calls
+    return {"agent": type(agent).__name__, "ops": decisions, "seconds": seconds,
+            "ops_per_sec": decisions / seconds if seconds > 0 else None}
+
+
+def run_benchmarks(agents=(0, 2, 3, 4, 5)):
+    states = midgame_states()
+    results = {
+        "board_construction": bench_board_construction(),
+        "deep_copy": bench_deep_copy(states),
+        "generate_successor": bench_generate_successor(states),
+        "get_legal_actions": bench_legal_actions(states),
+        "longest_road_dense": bench_longest_road(),
+        "reachability_features": bench_reachability(states),
+        "base_fn": bench_base_fn(states),
+        "random_games": bench_random_games(),
+        "batch_engine_turns": bench_batch_engine(),
+    }
+    for playerCode in agents:
+        name = f"decisions_{playerCode}"
+        try:
+            results[name] = bench_decisions(playerCode)
+        except Exception as e:
+            # Some agents can't finish a game (e.g. broken setup placement); keep the rest of the report
+            results[name] = {"agent": getStringForPlayer(playerCode), "error": repr(e)}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    # Returns the names of benchmarks whose throughput dropped by more than threshold
+    regressions = []
+    for name, result in report["benchmarks"].items():
+        old = baseline["benchmarks"].get(name, {}).get("ops_per_sec")
+        new = result.get("ops_per_sec")
+        if not old or not new:
+            continue
+        change = new / old - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:24} {old:12.1f} -> {new:12.1f} ops/s ({change:+.1%}){flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine's hot paths and write a JSON report.")
+    parser.add_argument("-o", "--output", default=None, help="Write the report here instead of stdout.")
+    parser.add_argument("-c", "--compare", default=None, help="A previous report to compare against.")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                        help="Relative throughput drop that counts as a regression (default 0.1).")
+    parser.add_argument("-a", "--agents", type=int, nargs="*", default=[0, 2, 3, 4, 5],
+                        help="Agent codes to measure decisions per second for.")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": SEED,
+        },
+    }
+    # Games print progress notes (e.g. hitting the turn limit); keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report["benchmarks"] = run_benchmarks(args.agents)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
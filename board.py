@@ -16,6 +16,8 @@ from collections import Counter
 #     TRADE = 5
 
 class Hexagon:
+    __slots__ = ("X", "Y", "resource", "diceValue", "center")
+
     def __init__(self, X, Y, resource, diceValue):
         self.X = X
         self.Y = Y
@@ -24,7 +26,8 @@ class Hexagon:
         self.center = None
 
     def deepCopy(self):
-        return Hexagon(self.X, self.Y, self.resource, self.diceValue)
+        # Hexagons never change after construction and are shared by every board of a layout
+        return self
 
     def __repr__(self):
         return f"/{ResourceDict[self.resource]}{self.diceValue} ({self.X}, {self.Y})\\"
@@ -38,6 +41,8 @@ class Hexagon:
         return hash((self.X, self.Y))
 
 class Vertex:
+    __slots__ = ("X", "Y", "player", "isSettlement", "isCity", "canSettle")
+
     def __init__(self, X, Y):
         self.X = X
         self.Y = Y
@@ -53,7 +58,9 @@ class Vertex:
         return self.isSettlement or self.isCity
 
     def deepCopy(self):
-        copy = Vertex(self.X, self.Y)
+        copy = Vertex.__new__(Vertex)
+        copy.X = self.X
+        copy.Y = self.Y
         copy.player = self.player
         copy.isSettlement = self.isSettlement
         copy.isCity = self.isCity
@@ -93,6 +100,8 @@ class Vertex:
             return f"Unoccupied{coordinateString}"
 
 class Edge:
+    __slots__ = ("X", "Y", "player")
+
     def __init__(self, X, Y, playerIndex=None):
         self.X = X
         self.Y = Y
@@ -139,31 +148,38 @@ BeginnerLayout = [
     [None, Tile(ResourceTypes.BRICK, 8), Tile(ResourceTypes.ORE, 5), Tile(ResourceTypes.GRAIN, 2), None]
 ]
 
+# Game records refer to a layout by its index in this list, so only ever append to it
+LAYOUTS = [BeginnerLayout]
+
+def getLayoutId(layout):
+    for layoutId, knownLayout in enumerate(LAYOUTS):
+        if knownLayout is layout:
+            return layoutId
+    raise ValueError("Layout is not registered in LAYOUTS")
+
 class Robber:
+    __slots__ = ("hex",)
+
     def __init__(self, initial_hex):
         self.hex = initial_hex
 
     def move(self, new_hex):
         self.hex = new_hex
 
-class Board:
-    def __init__(self, layout=None):
-        if layout is None:
-            raise Exception("Must pass layout to Board.")
+class SharedLayout:
+    """
+    Everything about a Board that follows from its layout alone: the Hexagons, the
+    lookups built from them and where the vertices and edges are. Built once per
+    layout and shared by every Board of it, so a Board (and each copy of one)
+    only allocates its own vertices, edges and robber.
+    """
+    def __init__(self, layout):
         self.layout = layout
-        random.seed()
-        
         self.numRows = len(layout)
         self.numCols = len(layout[0])
         self.hexagons = [[None for _ in range(self.numCols)] for _ in range(self.numRows)]
-        self.edges = [[None for _ in range(self.numCols*2+2)] for _ in range(self.numRows*2+2)]
-        self.vertices = [[None for _ in range(self.numCols*2+2)] for _ in range(self.numRows*2+2)]
-        self.allSettlements = []
-        self.allCities = []
-        self.allRoads = []
         self.dieRollDict = {}
         self.resourceDict = {}
-        self.draw = None
 
         for i in range(self.numRows):
             for j in range(self.numCols):
@@ -182,18 +198,18 @@ class Board:
                     else:
                         self.resourceDict[tile.resource] = [self.hexagons[i][j]]
 
+        self.edgeLocations = []
+        self.vertexLocations = []
         for row in self.hexagons:
             for hexagon in row:
                 if hexagon is None:
                     continue
-                edgeLocations = self.getEdgeLocations(hexagon)
-                vertexLocations = self.getVertexLocations(hexagon)
-                for xLoc, yLoc in edgeLocations:
-                    if self.edges[xLoc][yLoc] is None:
-                        self.edges[xLoc][yLoc] = Edge(xLoc, yLoc)
-                for xLoc, yLoc in vertexLocations:
-                    if self.vertices[xLoc][yLoc] is None:
-                        self.vertices[xLoc][yLoc] = Vertex(xLoc, yLoc)
+                for location in Board.getEdgeLocations(hexagon):
+                    if location not in self.edgeLocations:
+                        self.edgeLocations.append(location)
+                for location in Board.getVertexLocations(hexagon):
+                    if location not in self.vertexLocations:
+                        self.vertexLocations.append(location)
 
         if self.numRows == 5 and self.numCols == 5:
             self.visualBoard = [
@@ -207,8 +223,44 @@ class Board:
             self.visualBoard = None
         self.tiles = [tile for row in self.visualBoard if row for tile in row if tile is not None]
 
+_sharedLayouts = {}
+
+def getSharedLayout(layout):
+    shared = _sharedLayouts.get(id(layout))
+    if shared is None or shared.layout is not layout:
+        shared = _sharedLayouts[id(layout)] = SharedLayout(layout)
+    return shared
+
+class Board:
+    def __init__(self, layout=None):
+        if layout is None:
+            raise Exception("Must pass layout to Board.")
+        self.useSharedLayout(getSharedLayout(layout))
+        self.edges = [[None for _ in range(self.numCols*2+2)] for _ in range(self.numRows*2+2)]
+        self.vertices = [[None for _ in range(self.numCols*2+2)] for _ in range(self.numRows*2+2)]
+        self.allSettlements = []
+        self.allCities = []
+        self.allRoads = []
+        self.draw = None
+
+        for xLoc, yLoc in self.shared.edgeLocations:
+            self.edges[xLoc][yLoc] = Edge(xLoc, yLoc)
+        for xLoc, yLoc in self.shared.vertexLocations:
+            self.vertices[xLoc][yLoc] = Vertex(xLoc, yLoc)
+
         self.robber = Robber(self.get_desert_hex())
 
+    def useSharedLayout(self, shared):
+        self.shared = shared
+        self.layout = shared.layout
+        self.numRows = shared.numRows
+        self.numCols = shared.numCols
+        self.hexagons = shared.hexagons
+        self.dieRollDict = shared.dieRollDict
+        self.resourceDict = shared.resourceDict
+        self.visualBoard = shared.visualBoard
+        self.tiles = shared.tiles
+
     def set_draw(self, draw):
         self.draw = draw
 
@@ -218,13 +270,15 @@ class Board:
         print(self.vertices)
 
     def deepCopy(self):
-        _copy = Board(self.layout)
-        _copy.hexagons = [[h.deepCopy() if h is not None else None for h in row] for row in self.hexagons]
+        _copy = Board.__new__(Board)
+        _copy.useSharedLayout(self.shared)
         _copy.edges = [[e.deepCopy() if e is not None else None for e in row] for row in self.edges]
         _copy.vertices = [[v.deepCopy() if v is not None else None for v in row] for row in self.vertices]
-        _copy.allSettlements = [s.deepCopy() for s in self.allSettlements]
-        _copy.allRoads = [r.deepCopy() for r in self.allRoads]
-        _copy.robber = copy.deepcopy(self.robber)
+        _copy.allSettlements = [_copy.vertices[s.X][s.Y] for s in self.allSettlements]
+        _copy.allCities = [_copy.vertices[c.X][c.Y] for c in self.allCities]
+        _copy.allRoads = [_copy.edges[r.X][r.Y] for r in self.allRoads]
+        _copy.draw = None
+        _copy.robber = Robber(self.robber.hex)
         return _copy
 
     def applyAction(self, playerIndex, action):
@@ -266,17 +320,17 @@ class Board:
                             resources.append(hexagon.resource)
         return resources
 
-    def getRandomResourceHex(self, resource):
-        return random.choice(self.resourceDict[resource])
+    def getRandomResourceHex(self, resource, rng=random):
+        return rng.choice(self.resourceDict[resource])
 
-    def getRandomVerticesForAllResources(self):
+    def getRandomVerticesForAllResources(self, rng=random):
         resourcesForSettlement = [ResourceTypes.LUMBER, ResourceTypes.BRICK, ResourceTypes.WOOL, ResourceTypes.GRAIN]
         randomVerticesForBothPlayers = []
         for playerAgent in range(2):
             verticesForPlayer = []
             for resource in resourcesForSettlement:
-                randomHex = self.getRandomResourceHex(resource)
-                randomVertex = self.getRandomVertexOnHex(randomHex)
+                randomHex = self.getRandomResourceHex(resource, rng)
+                randomVertex = self.getRandomVertexOnHex(randomHex, rng)
                 self.applyAction(playerAgent, (ACTIONS.SETTLE, randomVertex))
                 verticesForPlayer.append(randomVertex)
             randomVerticesForBothPlayers.append(verticesForPlayer)
@@ -297,29 +351,29 @@ class Board:
             3: self.hexagons[1][4]
         }.get(index, None)
 
-    def getRandomVertexOnHex(self, hex):
+    def getRandomVertexOnHex(self, hex, rng=random):
         vertices = self.getVertices(hex)
         vertex = None
         while vertex is None:
-            index = random.randint(0, len(vertices)-1)
+            index = rng.randint(0, len(vertices)-1)
             vertex = vertices[index]
             if not vertex.canSettle:
                 vertex = None
         return vertex
 
-    def getRandomVerticesForSettlement(self):
+    def getRandomVerticesForSettlement(self, rng=random):
         lumberHexes = [self.getLumberHex(i) for i in range(1, 5)]
         brickHexes = [self.getBrickHex(i) for i in range(1, 4)]
         
-        random.shuffle(lumberHexes)
-        random.shuffle(brickHexes)
+        rng.shuffle(lumberHexes)
+        rng.shuffle(brickHexes)
         
         settlements = []
         
         for playerIndex in range(2):
             playerSettlements = []
             for _ in range(2): 
-                vertex = self.getRandomUnoccupiedVertexOnHex(hex) 
+                vertex = self.getRandomUnoccupiedVertexOnHex(hex, rng) 
                 if vertex:
                     self.applyAction(playerIndex, (ACTIONS.SETTLE, vertex))
                     playerSettlements.append(vertex)
@@ -328,9 +382,9 @@ class Board:
         print("Settlements: ", settlements)
         return settlements
 
-    def getRandomUnoccupiedVertexOnHex(self, hex):
+    def getRandomUnoccupiedVertexOnHex(self, hex, rng=random):
         vertices = self.getAllVertices()
-        random.shuffle(vertices)
+        rng.shuffle(vertices)
         for vertex in vertices:
             if vertex.canSettle:
                 return vertex
@@ -345,7 +399,7 @@ class Board:
         
         return choose_vertex(possibleVertices, self.draw)
 
-    def getRandomVertexForSettlement(self):
+    def getRandomVertexForSettlement(self, rng=random):
         valid_vertices = []
         for x in range(len(self.vertices)):
             for y in range(len(self.vertices[x])):
@@ -358,13 +412,13 @@ class Board:
         if not valid_vertices:
             return None  # No valid spots available
         
-        return random.choice(valid_vertices)
+        return rng.choice(valid_vertices)
 
     def getHumanRoad(self, vertex):
         possibleEdges = self.getEdgesOfVertex(vertex)
         return choose_edge(possibleEdges, self, self.draw)
 
-    def getRandomRoad(self, vertex):
+    def getRandomRoad(self, vertex, rng=random):
         valid_edges = []
         for edge in self.getEdgesOfVertex(vertex):
             if not edge.isOccupied():
@@ -373,7 +427,7 @@ class Board:
         if not valid_edges:
             return None  # No valid spots available
     
-        return random.choice(valid_edges)
+        return rng.choice(valid_edges)
 
     def getEdge(self, x, y):
         return self.edges[x][y]
@@ -433,7 +487,8 @@ class Board:
                 neighbors.append(vertexThree)
         return neighbors
 
-    def getVertexLocations(self, hex):
+    @staticmethod
+    def getVertexLocations(hex):
         x, y = hex.X, hex.Y
         offset = -(x % 2)
         return [
@@ -441,7 +496,8 @@ class Board:
             (x+1, 2*y+offset), (x+1, 2*y+1+offset), (x+1, 2*y+2+offset)
         ]
 
-    def getEdgeLocations(self, hex):
+    @staticmethod
+    def getEdgeLocations(hex):
         x, y = hex.X, hex.Y
         offset = -(x % 2)
         return [
@@ -607,20 +663,20 @@ class Board:
         return connected
 
 
+    def productionArray(self, playerIndex):
+        # Resource array of what every die roll (2-12) pays playerIndex, cities counting twice
+        counts = resourceArray()
+        for i in range(1, 13):
+            for resource in self.getResourcesFromDieRollForPlayer(playerIndex, i):
+                counts[resource] += 1
+        return counts
+
     def getProductionSample(self, playerIndex): 
         prefix = "EFFECTIVE_"
-        # Simulate rolls for every possible value (2-12 dice rolls)
-        res_list = []
-        for i in range(1, 13): 
-            res_list += self.getResourcesFromDieRollForPlayer(playerIndex, i)
-        
-        # Count resource occurrences
-        resource_count = Counter(res_list)
-        
         # Format the result into the desired structure
         production_features = {
-            f"{prefix}P{playerIndex}_{str(resource)}_PRODUCTION": resource_count[resource]
-            for resource in RESOURCES
+            f"{prefix}P{playerIndex}_{str(resource)}_PRODUCTION": count
+            for resource, count in zip(RESOURCES, self.productionArray(playerIndex))
         }
         
         return production_features
@@ -641,10 +697,19 @@ class Board:
         NB: Nodes are actually "vertices". 
         """
         features = {}
+        for currentPlayerIndex, playerLevels in enumerate(self.reachabilityArrays(levels)):
+            for level, production in enumerate(playerLevels):
+                for resource, count in zip(RESOURCES, production):
+                    features[f"P{currentPlayerIndex}_{level}_ROAD_REACHABLE_{resource}"] = count
+        return features
+
+    def reachabilityArrays(self, levels, playerIndices=(0, 1)):
+        # reachability_features without the string keys: result[i][level] is a resource array for playerIndices[i]
+        result = []
         board_buildable = set([v for v in self.getAllVertices() if v.canSettle])
 
         # loop for player
-        for currentPlayerIndex in range(2):
+        for currentPlayerIndex in playerIndices:
             owned_or_buildable = set([v for v in board_buildable if v.player == currentPlayerIndex])
     
             # BreathFirst Search
@@ -654,11 +719,9 @@ class Board:
                     if vertex.isCity or vertex.isSettlement:
                         zero_nodes.append(vertex) # level zero reachable resources 
 
-            production = self.countProduction(owned_or_buildable.union(zero_nodes))
-
             # layer 0 
-            for resource in RESOURCES:
-                features[f"P{currentPlayerIndex}_0_ROAD_REACHABLE_{resource}"] = production[resource]
+            production = self.countProduction(owned_or_buildable.union(zero_nodes))
+            playerLevels = [[production[resource] for resource in RESOURCES]]
             
             # rest of the layers 
             def iter_level_nodes(zero_nodes, num_roads):
@@ -687,12 +750,12 @@ class Board:
                 last_layer_nodes = level_nodes
                 return result
             
-            for level, level_nodes, _ in iter_level_nodes(zero_nodes, levels):
+            for level, level_nodes, _ in (iter_level_nodes(zero_nodes, levels) if levels > 1 else []):
                 production = self.countProduction(level_nodes)
-                for resource in RESOURCES:
-                    features[f"P{currentPlayerIndex}_{level}_ROAD_REACHABLE_{resource}"] = production[resource]
+                playerLevels.append([production[resource] for resource in RESOURCES])
+            result.append(playerLevels)
 
-        return features
+        return result
 
     def countProduction(self, vertices): 
         production = Counter() 
@@ -720,4 +783,62 @@ class Board:
                 continue
             if vertex.canSettle:
                 count += 1
-        return count
\ No newline at end of file
+        return count
+
+class BoardView(Board):
+    """
+    Copy-on-write overlay of a Board for one-ply lookahead. It starts out sharing the parent's
+    grids and piece lists and copies a grid row, and the Vertex or Edge in it, only when a move
+    writes there, so every Board query answers for the successor without a full deepCopy.
+    """
+    def __init__(self, parent):
+        self.useSharedLayout(parent.shared)
+        self.parent = parent
+        self.edges = parent.edges
+        self.vertices = parent.vertices
+        self.allSettlements = parent.allSettlements
+        self.allCities = parent.allCities
+        self.allRoads = parent.allRoads
+        self.draw = None
+        self.robber = parent.robber
+
+    def ownVertex(self, X, Y):
+        parentRows = self.parent.vertices
+        if self.vertices is parentRows:
+            self.vertices = parentRows[:]
+        row = self.vertices[X]
+        if row is parentRows[X]:
+            row = self.vertices[X] = row[:]
+        vertex = row[Y]
+        if vertex is parentRows[X][Y]:
+            vertex = row[Y] = vertex.deepCopy()
+        return vertex
+
+    def ownEdge(self, X, Y):
+        parentRows = self.parent.edges
+        if self.edges is parentRows:
+            self.edges = parentRows[:]
+        row = self.edges[X]
+        if row is parentRows[X]:
+            row = self.edges[X] = row[:]
+        edge = row[Y]
+        if edge is parentRows[X][Y]:
+            edge = row[Y] = edge.deepCopy()
+        return edge
+
+    def applyAction(self, playerIndex, action):
+        if action is None:
+            return
+        if action[0] == ACTIONS.SETTLE or action[0] == ACTIONS.CITY:
+            vertex = self.ownVertex(action[1].X, action[1].Y)
+            if action[0] == ACTIONS.SETTLE:
+                for neighborVertex in self.getNeighborVertices(vertex):
+                    self.ownVertex(neighborVertex.X, neighborVertex.Y)
+        elif action[0] == ACTIONS.ROAD:
+            self.ownEdge(action[1].X, action[1].Y)
+        else:
+            return
+        self.allSettlements = self.allSettlements[:]
+        self.allCities = self.allCities[:]
+        self.allRoads = self.allRoads[:]
+        Board.applyAction(self, playerIndex, action)
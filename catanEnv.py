@@ -0,0 +1,338 @@
+"""
+Environments for reinforcement learning.
+
+CatanEnv is a single game behind reset(seed) / step(action_id), returning a
+fixed-length float32 observation (see ObservationEncoder), the reward and the
+legal action mask over ActionSpace ids. VecCatanEnv holds N independent headless
+games and steps them in lockstep: one call takes an action id per game and returns
+NumPy arrays of observations, rewards, dones and legal action masks, and finished
+games are reset automatically with the next seed. The learner controls one seat of
+every game; the other seat is played by an ordinary agent (random by default).
+
+The learner only picks main-phase actions on its own turn. Setup placements,
+discards and robber moves on its behalf are made by a random agent in its seat.
+
+Usage:
+    env = CatanEnv(opponent=3)
+    obs, mask = env.reset(seed=0)
+    obs, reward, done, mask = env.step(actionId)
+
+    env = VecCatanEnv(64, opponent=3, seed=0)
+    obs, masks = env.reset()
+    obs, rewards, dones, masks, infos = env.step(actions)
+"""
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+from actionSpace import ActionSpace
+from board import getLayoutId
+from game import Game
+from gameConstants import *
+
+
+class EnvGame:
+    """
+    One game driven from the learner's side: every call leaves it at the start of one
+    of the learner's decisions, or finished.
+    """
+
+    def __init__(self, opponent=0, seat=0):
+        self.seat = seat
+        playerAgentNums = [opponent] * NUM_PLAYERS
+        playerAgentNums[seat] = 0
+        self.game = Game(playerAgentNums=playerAgentNums, graphics=False, save_learning=False)
+        self.done = True
+
+    @property
+    def state(self):
+        return self.game.gameState
+
+    def reset(self, seed):
+        self.game.reset_game(seed)
+        self.done = False
+        self.advance()
+
+    def step(self, action):
+        # Applies one learner action; passing ends its turn and plays until its next decision
+        game = self.game
+        if action[0] == ACTIONS.PASS:
+            self.end_turn()
+            self.advance()
+        else:
+            game.recordAction(action)
+            game.gameState.applyAction(self.seat, action)
+            if game.gameState.gameOver() >= 0:
+                self.end_turn()
+                self.finish()
+        return self.reward()
+
+    def reward(self):
+        if not self.done:
+            return 0.0
+        winner = self.state.gameOver()
+        if winner < 0:
+            return 0.0  # Reached the turn limit
+        return 1.0 if winner == self.seat else -1.0
+
+    def advance(self):
+        # Plays opponent turns until the learner has rolled and has to act
+        game = self.game
+        while True:
+            if game.gameState.gameOver() >= 0 or game.turnNumber > CUTOFF_TURNS:
+                self.finish()
+                return
+            if game.currentAgentIndex != self.seat:
+                game.run_game_turn()
+                continue
+            self.begin_turn()
+            if game.gameState.gameOver() < 0:
+                return
+
+    def begin_turn(self):
+        # Mirrors the start of Game.run_game_turn
+        game = self.game
+        player = game.gameState.playerAgents[self.seat]
+        diceRoll = game.gameState.diceAgent.rollDice()
+        game.record.beginTurn(diceRoll)
+        if diceRoll == 7:
+            game.handle_seven_rolled(player)
+        else:
+            game.gameState.updatePlayerResourcesForDiceRoll(diceRoll)
+        player.dev_card_played_this_turn = False
+
+    def end_turn(self):
+        # Mirrors the end of Game.run_game_turn
+        game = self.game
+        game.gameState.checkLargestArmy()
+        game.gameState.playerAgents[self.seat].endTurn()
+        game.record.endTurn(game.gameState.stateHash())
+        game.currentAgentIndex = (game.currentAgentIndex + 1) % NUM_PLAYERS
+        game.turnNumber += 1
+
+    def finish(self):
+        self.done = True
+        self.game.finish_record()
+
+
+class ObservationEncoder:
+    """
+    The fixed-length float32 observation of a game from one seat, written into a
+    caller's buffer. In order, with the observing seat's blocks first:
+
+        occupancy   own settlement, own city, opponent settlement, opponent city (per vertex)
+        roads       own road, opponent road (per edge)
+        robber      one-hot over hexes
+        production  expected resources per roll, per player and resource
+        hands       resource counts, per player
+        dev cards   own unplayable, playable and played counts per card type;
+                    the opponent's played counts per type and its number of unplayed cards
+        bank        resource counts and cards left in the dev card deck
+        awards      victory points, longest road length, longest road, knights played and
+                    largest army, per player
+
+    Counts are raw, not normalized.
+    """
+
+    def __init__(self, board, seat=0):
+        self.seat = seat
+        self.actionSpace = ActionSpace.forLayout(getLayoutId(board.layout))
+        space = self.actionSpace
+        # Index lookups by coordinate, as nested lists so encoding builds no tuples
+        self.vertexGrid = self.grid(space.vertices)
+        self.edgeGrid = self.grid(space.edges)
+        self.hexGrid = self.grid(space.hexes)
+        self.numVertices = V = len(space.vertices)
+        self.numEdges = E = len(space.edges)
+        numHexes = len(space.hexes)
+        R = len(RESOURCES)
+        D = len(DevCardTypes)
+
+        # Expected yield of a settlement on each vertex, per roll
+        self.vertexProduction = np.zeros((V, R), dtype=np.float32)
+        for i, location in enumerate(space.vertices):
+            for hexagon in board.getHexes(board.getVertex(*location)):
+                if hexagon.resource != ResourceTypes.NOTHING:
+                    self.vertexProduction[i, RESOURCES.index(hexagon.resource)] += (6 - abs(7 - hexagon.diceValue)) / 36
+
+        sizes = [("occupancy", 4 * V), ("roads", 2 * E), ("robber", numHexes), ("production", NUM_PLAYERS * R),
+                 ("hands", NUM_PLAYERS * R), ("own_dev_cards", 3 * D), ("opponent_dev_cards", D + 1),
+                 ("bank", R + 1), ("awards", NUM_PLAYERS * 5)]
+        self.offsets = {}
+        offset = 0
+        for name, size in sizes:
+            self.offsets[name] = offset
+            offset += size
+        self.size = offset
+        self.passId = space.encode((ACTIONS.PASS, None))
+
+    @staticmethod
+    def grid(locations):
+        grid = [[None] * (max(Y for X, Y in locations) + 1) for _ in range(max(X for X, Y in locations) + 1)]
+        for i, (X, Y) in enumerate(locations):
+            grid[X][Y] = i
+        return grid
+
+    def observe(self, state, out):
+        out[:] = 0
+        V, E = self.numVertices, self.numEdges
+        R = len(RESOURCES)
+        offsets = self.offsets
+        vertexGrid, edgeGrid = self.vertexGrid, self.edgeGrid
+        players = [state.playerAgents[(self.seat + k) % NUM_PLAYERS] for k in range(NUM_PLAYERS)]
+
+        for k, player in enumerate(players):
+            settlements = offsets["occupancy"] + 2 * k * V
+            cities = settlements + V
+            for vertex in player.settlements:
+                out[settlements + vertexGrid[vertex.X][vertex.Y]] = 1
+            for vertex in player.cities:
+                out[cities + vertexGrid[vertex.X][vertex.Y]] = 1
+            roads = offsets["roads"] + k * E
+            for edge in player.roads:
+                out[roads + edgeGrid[edge.X][edge.Y]] = 1
+            production = offsets["production"] + k * R
+            out[production:production + R] = (out[settlements:settlements + V] + 2 * out[cities:cities + V]) @ self.vertexProduction
+            hand = offsets["hands"] + k * R
+            out[hand:hand + R] = player.resources
+            awards = offsets["awards"] + k * 5
+            out[awards] = player.victoryPoints
+            out[awards + 1] = player.longestRoadLength
+            out[awards + 2] = player.hasLongestRoad
+            out[awards + 3] = player.played_knights
+            out[awards + 4] = player.has_largest_army
+
+        robber = state.board.robber.hex
+        out[offsets["robber"] + self.hexGrid[robber.X][robber.Y]] = 1
+
+        D = len(DevCardTypes)
+        own = offsets["own_dev_cards"]
+        out[own:own + D] = players[0].unplayable_dev_cards
+        out[own + D:own + 2 * D] = players[0].playable_dev_cards
+        out[own + 2 * D:own + 3 * D] = players[0].played_dev_cards
+        opponent = offsets["opponent_dev_cards"]
+        out[opponent:opponent + D] = players[1].played_dev_cards
+        out[opponent + D] = sum(players[1].unplayable_dev_cards) + sum(players[1].playable_dev_cards)
+
+        bank = offsets["bank"]
+        out[bank:bank + R] = state.bank
+        out[bank + R] = len(state.dev_card_deck)
+
+    def legal_mask(self, state, out):
+        out[:] = False
+        encode = self.actionSpace.encode
+        for action in state.getLegalActions(self.seat):
+            try:
+                out[encode(action)] = True
+            except ValueError:
+                pass  # Only actions with an id can be chosen by the learner
+        if not out.any():
+            out[self.passId] = True
+
+
+class CatanEnv:
+    """
+    A single game behind a reset(seed) / step(action_id) interface. The observation
+    and legal mask live in buffers allocated once; step overwrites them in place and
+    returns the same arrays, so copy them to keep a history.
+    """
+
+    def __init__(self, opponent=0, seat=0):
+        self.envGame = EnvGame(opponent, seat)
+        self.encoder = ObservationEncoder(self.envGame.state.board, seat)
+        self.actionSpace = self.encoder.actionSpace
+        self.observation_size = self.encoder.size
+        self.num_actions = len(self.actionSpace)
+        self.observation = np.zeros(self.observation_size, dtype=np.float32)
+        self.mask = np.zeros(self.num_actions, dtype=bool)
+
+    @property
+    def state(self):
+        return self.envGame.state
+
+    @property
+    def done(self):
+        return self.envGame.done
+
+    @property
+    def winner(self):
+        return self.envGame.state.gameOver()
+
+    @property
+    def record(self):
+        return self.envGame.game.record
+
+    def reset(self, seed=None):
+        self.envGame.reset(seed)
+        self.encoder.observe(self.state, self.observation)
+        self.encoder.legal_mask(self.state, self.mask)
+        return self.observation, self.mask
+
+    def step(self, actionId):
+        # Returns (observation, reward, done, legal mask); reward is +1/-1 for a win/loss, 0 otherwise
+        if self.envGame.done:
+            raise RuntimeError("The game is over; call reset() first")
+        if not self.mask[actionId]:
+            raise ValueError(f"Action {actionId} is not legal")
+        reward = self.envGame.step(self.actionSpace.decode(actionId, self.state.board))
+        self.encoder.observe(self.state, self.observation)
+        self.encoder.legal_mask(self.state, self.mask)
+        return self.observation, reward, self.envGame.done, self.mask
+
+
+class VecCatanEnv:
+    def __init__(self, num_envs, opponent=0, seat=0, seed=0):
+        self.num_envs = num_envs
+        self.seat = seat
+        self.games = [EnvGame(opponent, seat) for _ in range(num_envs)]
+        self.nextSeed = seed
+
+        self.encoder = ObservationEncoder(self.games[0].state.board, seat)
+        self.actionSpace = self.encoder.actionSpace
+        self.observation_size = self.encoder.size
+        self.num_actions = len(self.actionSpace)
+
+        # Returned arrays are reused between steps; copy them to keep a batch around
+        self.observations = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.masks = np.zeros((num_envs, self.num_actions), dtype=bool)
+
+    def reset(self):
+        for i in range(self.num_envs):
+            self.reset_game(i)
+            self.observe(i)
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.observations, self.masks
+
+    def reset_game(self, i):
+        self.games[i].reset(self.nextSeed)
+        self.nextSeed += 1
+
+    def step(self, actions):
+        # infos[i] holds the final observation, mask and winner of a game that just finished
+        infos = [{} for _ in range(self.num_envs)]
+        for i, envGame in enumerate(self.games):
+            actionId = int(actions[i])
+            if not self.masks[i, actionId]:
+                raise ValueError(f"Action {actionId} is not legal in game {i}")
+            self.rewards[i] = envGame.step(self.actionSpace.decode(actionId, envGame.state.board))
+            self.dones[i] = envGame.done
+            if envGame.done:
+                self.observe(i)
+                infos[i] = {"terminal_observation": self.observations[i].copy(), "terminal_mask": self.masks[i].copy(),
+                            "winner": envGame.state.gameOver(), "seed": envGame.state.rng.seed,
+                            "turns": envGame.game.turnNumber - 1}
+                self.reset_game(i)
+            self.observe(i)
+        return self.observations, self.rewards, self.dones, self.masks, infos
+
+    def observe(self, i):
+        # Writes game i's observation and legal action mask into row i of the batch
+        state = self.games[i].state
+        self.encoder.observe(state, self.observations[i])
+        self.encoder.legal_mask(state, self.masks[i])
@@ -0,0 +1,13 @@
+"""
+Tests for the engine, records, replay and value features. Run from the repository root:
+
+    python -m pytest -q engineTests
+
+Tests/ holds the original Python 2 board checks, which run on their own.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
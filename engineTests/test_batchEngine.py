@@ -0,0 +1,28 @@
+import numpy as np
+
+from actionSpace import ActionSpace
+from batchEngine import BatchEngine
+from benchmark import play_random_turns
+from gameConstants import *
+
+SEEDS = range(30)
+TURNS = (5, 20, 40, 80)
+
+
+def test_legal_mask_matches_get_legal_actions():
+    space = ActionSpace.forLayout(0)
+    checked = 0
+    for seed in SEEDS:
+        for turns in TURNS:
+            game = play_random_turns(seed, turns)
+            if game.gameState.gameOver() >= 0:
+                continue
+            engine = BatchEngine(1, seed=0)
+            engine.load(game.gameState, game.currentAgentIndex, game.turnNumber)
+            for player in range(NUM_PLAYERS):
+                engine.current[0] = player
+                mask = engine.legal_mask(np.array([0]), np.array([player]))[0]
+                expected = {space.encode(action) for action in game.gameState.getLegalActions(player)}
+                assert set(np.flatnonzero(mask).tolist()) == expected, (seed, turns, player)
+                checked += 1
+    assert checked
@@ -0,0 +1,49 @@
+from benchmark import play_random_turns
+from board import LAYOUTS, Board, Edge, Hexagon, Vertex
+from gameConstants import *
+
+
+def occupancy(board):
+    vertices = {(v.X, v.Y): (v.player, v.isSettlement, v.isCity, v.canSettle) for v in board.getAllVertices()}
+    edges = {(e.X, e.Y): e.player for row in board.edges for e in row if e is not None}
+    pieces = [sorted((p.X, p.Y) for p in pieces) for pieces in (board.allSettlements, board.allCities, board.allRoads)]
+    return vertices, edges, pieces, (board.robber.hex.X, board.robber.hex.Y)
+
+
+def test_boards_of_a_layout_share_its_hexagons():
+    for layout in LAYOUTS:
+        first, second = Board(layout), Board(layout)
+        assert first.shared is second.shared
+        assert first.hexagons is second.hexagons
+        assert first.deepCopy().shared is first.shared
+        for row in first.hexagons:
+            for hexagon in row:
+                if hexagon is not None:
+                    assert hexagon.deepCopy() is hexagon
+
+
+def test_pieces_have_slots():
+    for piece in (Hexagon(0, 0, ResourceTypes.NOTHING, 0), Vertex(0, 0), Edge(0, 0)):
+        assert not hasattr(piece, "__dict__")
+
+
+def test_copies_have_their_own_occupancy():
+    board = play_random_turns(3, 60).gameState.board
+    copy = board.deepCopy()
+    assert occupancy(copy) == occupancy(board)
+    for pieces, copied in ((board.allSettlements, copy.allSettlements), (board.allCities, copy.allCities),
+                           (board.allRoads, copy.allRoads)):
+        for piece, copiedPiece in zip(pieces, copied):
+            assert copiedPiece is not piece
+    assert all(copy.getVertex(v.X, v.Y) is v for v in copy.allSettlements + copy.allCities)
+    assert all(copy.getEdge(e.X, e.Y) is e for e in copy.allRoads)
+
+    before = occupancy(board)
+    settlement = copy.allSettlements[0]
+    copy.applyAction(settlement.player, (ACTIONS.CITY, settlement))
+    edge = next(e for row in copy.edges for e in row if e is not None and not e.isOccupied())
+    copy.applyAction(0, (ACTIONS.ROAD, edge))
+    assert occupancy(board) == before
+    assert occupancy(copy) != before
+    # Copying a copy keeps the city it built
+    assert [(c.X, c.Y) for c in copy.deepCopy().allCities] == [(c.X, c.Y) for c in copy.allCities]
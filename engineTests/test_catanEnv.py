@@ -0,0 +1,27 @@
+import numpy as np
+
+from catanEnv import VecCatanEnv
+from gameConstants import *
+
+NUM_ENVS = 4
+STEPS = 150
+
+
+def test_masks_and_hands_match_the_games():
+    env = VecCatanEnv(NUM_ENVS, opponent=0, seed=0)
+    space = env.actionSpace
+    hands = env.encoder.offsets["hands"]
+    rng = np.random.default_rng(0)
+    observations, masks = env.reset()
+    finished = 0
+    for _ in range(STEPS):
+        for i, envGame in enumerate(env.games):
+            state = envGame.state
+            expected = {space.encode(action) for action in state.getLegalActions(env.seat)}
+            assert set(np.flatnonzero(masks[i]).tolist()) == (expected or {env.encoder.passId})
+            player = state.playerAgents[env.seat]
+            assert observations[i, hands:hands + NUM_RESOURCES].tolist() == list(player.resources)
+        actions = [rng.choice(np.flatnonzero(mask)) for mask in masks]
+        observations, rewards, dones, masks, infos = env.step(actions)
+        finished += int(dones.sum())
+    assert finished
@@ -0,0 +1,44 @@
+import copy
+
+import pytest
+
+from agents import PlayerAgentExpectiminimax, PlayerAgentExpectimax, base_fn
+from game import Game
+from gameConstants import *
+from replay import Replayer
+from valueFeatures import LeafBatch
+
+TURNS = (4, 12, 24, 40)
+
+
+@pytest.fixture(scope="module")
+def states():
+    game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False)
+    game.play_test_game(0)
+    replayer = Replayer(game.record)
+    return [replayer.stateAt(turn) for turn in TURNS if turn < len(replayer)]
+
+
+@pytest.mark.parametrize("agentClass", [PlayerAgentExpectimax, PlayerAgentExpectiminimax])
+def test_batched_search_picks_what_per_leaf_search_picks(states, agentClass):
+    for state in states:
+        for playerIndex in range(NUM_PLAYERS):
+            choices = []
+            for batch_leaves in (True, False):
+                agent = agentClass(f"Player {playerIndex}", playerIndex, getColorForPlayer(playerIndex), depth=2,
+                                   evalFn=base_fn(), batch_leaves=batch_leaves)
+                agent.TIME_LIMIT = float("inf")
+                # Successors made during a search share one random stream, so each search gets a fresh copy
+                choices.append(agent.getAction(copy.deepcopy(state)))
+            (batchedValue, batchedAction), (value, action) = choices
+            assert batchedAction == action
+            assert batchedValue == pytest.approx(value, abs=1e-9)
+
+
+def test_leaf_batch_values_match_the_value_function(states):
+    value_fn = base_fn()
+    batch = LeafBatch(value_fn, 0, capacity=1)
+    slots = [batch.add(state) for state in states]
+    values = batch.evaluate()
+    for slot, state in zip(slots, states):
+        assert values[slot] == pytest.approx(value_fn(state, 0), abs=1e-9)
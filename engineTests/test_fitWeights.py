@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from fitWeights import Trajectories
+from valueFeatures import NUM_FEATURES
+
+
+def trajectories(lengths, outcomes):
+    trajectory = np.repeat(np.arange(len(lengths)), lengths)
+    step = np.concatenate([np.arange(length) for length in lengths])
+    return Trajectories(np.zeros((len(trajectory), NUM_FEATURES)), trajectory, step, np.array(outcomes, dtype=float),
+                        np.arange(len(lengths)))
+
+
+def test_one_step_returns_bootstrap_from_the_next_value_and_end_on_the_outcome():
+    data = trajectories([3], [1.0])
+    np.testing.assert_allclose(data.lambdaReturns(np.array([0.2, 0.4, 0.6]), 0.0), [0.4, 1.0, 1.0])
+
+
+def test_full_returns_are_the_outcome():
+    data = trajectories([3, 2, 1], [1.0, 0.0, 1.0])
+    values = np.array([0.2, 0.4, 0.6, 0.7, 0.9, 0.3])
+    np.testing.assert_allclose(data.lambdaReturns(values, 1.0), data.rowOutcomes())
+
+
+@pytest.mark.parametrize("lam", [0.0, 0.5, 0.9])
+def test_returns_match_the_recursion(lam):
+    data = trajectories([4, 2], [0.0, 1.0])
+    values = np.array([0.1, 0.3, 0.5, 0.8, 0.6, 0.2])
+    expected = []
+    for t, outcome in enumerate(data.outcome):
+        own = values[data.trajectory == t]
+        own[-1] = outcome
+        returns = [outcome]
+        for step in range(len(own) - 2, -1, -1):
+            returns.insert(0, (1 - lam) * own[step + 1] + lam * returns[0])
+        expected.extend(returns)
+    np.testing.assert_allclose(data.lambdaReturns(values, lam), expected)
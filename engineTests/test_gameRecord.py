@@ -0,0 +1,83 @@
+import pytest
+
+from actionSpace import SECOND_ROAD, ActionSpace
+from board import LAYOUTS, Board
+from game import Game
+from gameConstants import *
+from gameRecord import GameRecord, GameRecordWriter, readGameRecords
+
+
+def actionKey(action):
+    # The coordinates an action refers to, comparable across boards
+    kind, arg = action
+    if kind in (ACTIONS.SETTLE, ACTIONS.CITY, ACTIONS.ROAD, ACTIONS.MOVE_ROBBER):
+        return kind, (arg.X, arg.Y)
+    if kind == ACTIONS.PLAY_DEV_CARD:
+        cardType, cardAction = arg
+        if cardType == DevCardTypes.KNIGHT:
+            return kind, cardType, (cardAction.X, cardAction.Y)
+        if cardType == DevCardTypes.ROAD_BUILDING:
+            return kind, cardType, tuple((edge.X, edge.Y) for edge in cardAction)
+        if cardType == DevCardTypes.YEAR_OF_PLENTY:
+            return kind, cardType, tuple(cardAction)
+    return action
+
+
+def test_every_action_id_round_trips():
+    for layoutId, layout in enumerate(LAYOUTS):
+        space = ActionSpace.forLayout(layoutId)
+        board = Board(layout)
+        for actionId, (kind, payload) in enumerate(space.actions):
+            if kind == ACTIONS.PLAY_DEV_CARD and payload[0] == SECOND_ROAD:
+                continue
+            action = space.decode(actionId, board)
+            assert space.encode(action) == actionId
+            assert space.encodeAll(action) == [actionId]
+            assert space.decodeAll([actionId], board) == [action]
+
+
+def test_two_road_road_building_round_trips():
+    for layoutId, layout in enumerate(LAYOUTS):
+        space = ActionSpace.forLayout(layoutId)
+        board = Board(layout)
+        first, second = (board.getEdge(*location) for location in space.edges[:2])
+        action = (ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING, [first, second]))
+        ids = space.encodeAll(action)
+        assert len(ids) == 2
+        assert ids[0] == space.encode((ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING, [first])))
+        # Whatever follows in the turn decodes on its own
+        decoded = space.decodeAll(ids + [space.encode((ACTIONS.PASS, None))], board)
+        assert [actionKey(a) for a in decoded] == [actionKey(action), (ACTIONS.PASS, None)]
+
+
+def test_record_log_round_trips(tmp_path):
+    space = ActionSpace.forLayout(0)
+    board = Board(LAYOUTS[0])
+    twoRoads = space.encodeAll((ACTIONS.PLAY_DEV_CARD, (DevCardTypes.ROAD_BUILDING,
+                                                        [board.getEdge(*space.edges[3]), board.getEdge(*space.edges[4])])))
+    records = [
+        GameRecord(7, 0, [3, 0], setup=[1, 2, 3, 4, 5, 6, 7, 8], turns=[(6, [0]), (7, list(range(300, 320))), (12, twoRoads)],
+                   winner=1, hashes=[0x1234, 0xFFFF, 0]),
+        GameRecord(2 ** 40, 0, [5, 4], setup=[], turns=[(2, [len(space) - 1])], winner=-1),
+    ]
+    path = tmp_path / "games.ctnr"
+    with GameRecordWriter(path) as writer:
+        writer.write(records[0])
+    # Reopening appends after the records already there
+    with GameRecordWriter(path) as writer:
+        writer.write(records[1])
+
+    loaded = list(readGameRecords(path))
+    assert len(loaded) == len(records)
+    for record, copy in zip(records, loaded):
+        assert (copy.seed, copy.layoutId, copy.agents, copy.setup, copy.turns, copy.winner) == \
+               (record.seed, record.layoutId, record.agents, record.setup, record.turns, record.winner)
+        assert copy.hashes == (record.hashes if record.hasStateHashes() else [])
+
+
+def test_seeds_round_trip_and_negative_seeds_are_refused():
+    for seed in (0, 1, 127, 128, 2 ** 63 - 1):
+        assert GameRecord.decode(GameRecord(seed, agents=[3, 0]).encode()).seed == seed
+    game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False)
+    with pytest.raises(ValueError):
+        game.play_test_game(-1)
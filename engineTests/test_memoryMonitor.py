@@ -0,0 +1,25 @@
+import gc
+import tracemalloc
+
+from game import Game
+from profiling import MemoryMonitor
+
+
+def test_profiled_game_leaves_tracing_off():
+    game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False, memory_profiling=True)
+    assert not tracemalloc.is_tracing()
+    game.play_test_game(0)
+    assert not tracemalloc.is_tracing()
+    assert game.memory_monitor.on_gc not in gc.callbacks
+    assert game.memory_monitor.summary()["decision_peak_bytes"]["ValueFunctionPlayer"]["count"]
+
+
+def test_monitor_leaves_tracing_it_did_not_start():
+    tracemalloc.start()
+    try:
+        monitor = MemoryMonitor()
+        monitor.start()
+        monitor.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,57 @@
+import pytest
+
+from agents import PlayerState
+from benchmark import play_random_turns
+from gameConstants import *
+
+PIECES = ("roads", "settlements", "cities")
+
+
+@pytest.fixture
+def game():
+    return play_random_turns(3, 60)
+
+
+def slotValue(player, slot):
+    value = getattr(player, slot)
+    if slot in PIECES:
+        return sorted((piece.X, piece.Y) for piece in value)
+    return list(value) if slot == "resources" else value
+
+
+def test_seated_agents_read_and_write_their_state(game):
+    state = game.gameState
+    for agent, player in zip(state.playerAgents, state.players):
+        assert agent.state is player
+        assert agent.resources is player.resources
+        agent.longestRoadLength += 1
+        assert player.longestRoadLength == agent.longestRoadLength
+
+
+def test_deep_copies_carry_every_slot_in_their_own_objects(game):
+    state = game.gameState
+    copy = state.deepCopy()
+    assert copy.playerAgents is copy.players
+    for original, copied in zip(state.players, copy.players):
+        assert type(copied) is PlayerState
+        for slot in PlayerState.__slots__:
+            assert slotValue(copied, slot) == slotValue(original, slot), slot
+            if isinstance(getattr(original, slot), list):
+                assert getattr(copied, slot) is not getattr(original, slot), slot
+        for slot in PIECES:
+            # Pieces point into the copy's board, not the original's
+            for piece in getattr(copied, slot):
+                location = copy.board.getEdge(piece.X, piece.Y) if slot == "roads" else copy.board.getVertex(piece.X, piece.Y)
+                assert piece is location
+
+
+def test_successors_leave_the_parent_alone(game):
+    state = game.gameState
+    for playerIndex in range(NUM_PLAYERS):
+        state.players[playerIndex].resources[:] = [5] * NUM_RESOURCES
+        before = state.stateHash()
+        for action in state.getLegalActions(playerIndex):
+            if action[0] in (ACTIONS.ROAD, ACTIONS.SETTLE, ACTIONS.CITY, ACTIONS.TRADE, ACTIONS.BUY_DEV_CARD):
+                successor = state.generateSuccessor(playerIndex, action)
+                assert successor.stateHash() != before
+        assert state.stateHash() == before
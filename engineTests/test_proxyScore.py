@@ -0,0 +1,75 @@
+import copy
+
+import numpy as np
+import pytest
+
+from agents import ValueFunctionPlayer, base_fn
+from game import Game
+from gameConstants import *
+from replay import Replayer
+from valueFeatures import DISCARD_PENALTY, extractFeatures, featureDelta, proxyScore
+
+AGENT = 0
+TOP_K = 3
+
+
+@pytest.fixture(scope="module")
+def states():
+    # Player 0's position after every turn of a seeded game, wherever it has something to rank
+    game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False)
+    game.play_test_game(0)
+    return [copy.deepcopy(state) for _, state in Replayer(game.record).states()
+            if state.gameOver() < 0 and len(rankable(state)) > 1]
+
+
+def rankable(state):
+    return [action for action in state.getLegalActions(AGENT) if action[0] != ACTIONS.PASS]
+
+
+def test_trade_scores_are_the_value_change(states):
+    # A trade only moves the hand terms, and the proxy has all of them but the discard penalty
+    value_fn = base_fn()
+    checked = 0
+    for state in states:
+        root = extractFeatures(state, AGENT)
+        for action in rankable(state):
+            if action[0] != ACTIONS.TRADE:
+                continue
+            successor = featureDelta(root, state.successorView(AGENT, action), AGENT, action)
+            if successor[DISCARD_PENALTY] != root[DISCARD_PENALTY]:
+                continue
+            assert proxyScore(state, AGENT, action, value_fn.weights) == pytest.approx((successor - root) @ value_fn.weights)
+            checked += 1
+    assert checked
+
+
+def decide(states, **options):
+    agent = ValueFunctionPlayer(f"Player {AGENT}", AGENT, getColorForPlayer(AGENT), **options)
+    # Successors that draw cards come from a stream every search shares, so each agent gets fresh copies
+    actions = [agent.getAction(copy.deepcopy(state))[1] for state in states]
+    return agent, actions
+
+
+def test_top_k_recall(states):
+    full, fullActions = decide(states)
+    shortlisted, shortlistedActions = decide(states, top_k=TOP_K)
+    measured, measuredActions = decide(states, top_k=TOP_K, measure_recall=True)
+    stats = measured.search_stats
+
+    # Measuring recall changes neither the choices nor the work the counters report
+    assert measuredActions == shortlistedActions
+    for name in ("successors_generated", "evaluations"):
+        assert getattr(stats, name) == getattr(shortlisted.search_stats, name) < getattr(full.search_stats, name)
+
+    # A decision is a hit when the full ranking's winner made the shortlist; the shortlist then picks it too
+    assert stats.proxy_checks == sum(len(rankable(state)) > TOP_K for state in states)
+    assert 0 < stats.proxy_hits <= stats.proxy_checks
+    agree = sum(a == b for a, b in zip(fullActions, shortlistedActions))
+    assert stats.proxy_hits + (len(states) - stats.proxy_checks) <= agree
+
+
+def test_a_shortlist_of_everything_ranks_like_the_full_search(states):
+    _, fullActions = decide(states)
+    everything, actions = decide(states, top_k=max(len(rankable(state)) for state in states), measure_recall=True)
+    assert actions == fullActions
+    assert everything.search_stats.proxy_checks == 0
@@ -0,0 +1,46 @@
+import pytest
+
+from game import Game
+from replay import SNAPSHOT_INTERVAL, ReplayDivergence, Replayer
+
+MATCHUPS = [([3, 0], 0), ([3, 0], 1), ([4, 3], 2)]
+
+
+def playRecord(playerAgentNums, seed):
+    game = Game(playerAgentNums=playerAgentNums, graphics=False, save_learning=False)
+    game.play_test_game(seed)
+    return game.record, game.gameState.stateHash()
+
+
+@pytest.fixture(scope="module")
+def records():
+    return [playRecord(playerAgentNums, seed) for playerAgentNums, seed in MATCHUPS]
+
+
+def test_replays_match_recorded_hashes(records):
+    for record, finalHash in records:
+        assert record.hasStateHashes()
+        replayer = Replayer(record)
+        assert replayer.verifyAll().stateHash() == finalHash == record.hashes[-1]
+
+
+def test_seeks_after_a_full_replay_start_from_checkpoints(records):
+    record, _ = records[0]
+    replayer = Replayer(record)
+    replayer.verifyAll()
+    assert sorted(replayer.snapshots) == list(range(0, len(replayer) + 1, SNAPSHOT_INTERVAL))
+    sequential = {turn: state.stateHash() for turn, state in Replayer(record).states()}
+    for turn in (0, 1, len(replayer) // 2, len(replayer)):
+        assert replayer.stateAt(turn).stateHash() == sequential[turn]
+
+
+def test_tampered_hash_raises(records):
+    record, _ = records[0]
+    turn = len(record.turns) // 2
+    record.hashes[turn] ^= 1
+    try:
+        with pytest.raises(ReplayDivergence) as raised:
+            Replayer(record).verifyAll()
+        assert raised.value.turn == turn
+    finally:
+        record.hashes[turn] ^= 1
@@ -0,0 +1,37 @@
+import random
+from collections import Counter
+
+from gameConstants import *
+
+
+def randomHands(count, seed=0):
+    rng = random.Random(seed)
+    return [Counter({resource: rng.randint(0, 6) for resource in RESOURCES}) for _ in range(count)]
+
+
+def test_arrays_round_trip_through_counters():
+    for hand in randomHands(50):
+        array = resourceArray(hand)
+        assert resourceCounter(array) == hand
+        for resource in RESOURCES:
+            assert array[resource] == hand[resource]
+        assert Counter(resourceList(array)) == +hand
+
+
+def test_resource_types_index_their_slot():
+    assert [resource.__index__() for resource in RESOURCES] == list(range(NUM_RESOURCES))
+    hand = [10, 20, 30, 40, 50]
+    assert [hand[resource] for resource in RESOURCES] == hand
+
+
+def test_paying_matches_counter_arithmetic():
+    costs = [ROAD_COST, SETTLEMENT_COST, CITY_COST, DEV_CARD_COST]
+    for handCounter, bankCounter in zip(randomHands(50), randomHands(50, seed=1)):
+        for cost in costs:
+            costCounter = resourceCounter(cost)
+            assert canAfford(resourceArray(handCounter), cost) == all(handCounter[r] >= costCounter[r] for r in RESOURCES)
+            hand, bank = resourceArray(handCounter), resourceArray(bankCounter)
+            payResources(hand, bank, cost)
+            handCounter.subtract(costCounter)
+            bankCounter.update(costCounter)
+            assert hand == resourceArray(handCounter) and bank == resourceArray(bankCounter)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from actionSpace import ActionSpace
+from gameConstants import *
+from selfPlayData import ShardDataset, ShardWriter, generate, shardFields
+from valueFeatures import NUM_FEATURES
+
+NUM_ACTIONS = 20
+NUM_FEATURES_SMALL = 3
+
+
+def makeRows(start, count):
+    # Rows whose every field encodes its global index, so reads can be checked against it
+    index = np.arange(start, start + count)
+    legal = np.zeros((count, NUM_ACTIONS), dtype=bool)
+    legal[np.arange(count), index % NUM_ACTIONS] = True
+    return {
+        "features": np.repeat(index[:, None], NUM_FEATURES_SMALL, axis=1).astype(np.float32),
+        "action": (index % NUM_ACTIONS).astype(np.int32),
+        "legal": np.packbits(legal, axis=1),
+        "outcome": (index % 2).astype(np.float32),
+        "turn": index.astype(np.int32),
+        "player": (index % NUM_PLAYERS).astype(np.int8),
+        "seed": index.astype(np.int64),
+    }
+
+
+def test_appends_reopen_and_read_back(tmp_path):
+    with ShardWriter(tmp_path, NUM_ACTIONS, shardSize=8, numFeatures=NUM_FEATURES_SMALL) as writer:
+        writer.append(makeRows(0, 5))
+        writer.append(makeRows(5, 6))
+    # Reopening tops up the half-full last shard before starting another
+    with ShardWriter(tmp_path, NUM_ACTIONS, numFeatures=NUM_FEATURES_SMALL) as writer:
+        assert len(writer) == 11
+        writer.append(makeRows(11, 10))
+        assert [shard["rows"] for shard in writer.index["shards"]] == [8, 8, 5]
+
+    dataset = ShardDataset(tmp_path)
+    assert len(dataset) == 21
+    indices = np.array([20, 0, 7, 8, 15, 3, 16, 7])
+    batch = dataset.rows(indices)
+    np.testing.assert_array_equal(batch["turn"], indices)
+    np.testing.assert_array_equal(batch["features"][:, 0], indices)
+    np.testing.assert_array_equal(batch["action"], indices % NUM_ACTIONS)
+    assert batch["legal"].shape == (len(indices), NUM_ACTIONS)
+    np.testing.assert_array_equal(np.flatnonzero(batch["legal"][0]), [20 % NUM_ACTIONS])
+    assert set(shardFields(NUM_FEATURES_SMALL, NUM_ACTIONS)) == set(batch)
+    sample = dataset.sample(32, np.random.default_rng(0))
+    np.testing.assert_array_equal(sample["seed"], sample["turn"])
+
+
+def test_reopening_with_another_schema_fails(tmp_path):
+    with ShardWriter(tmp_path, NUM_ACTIONS, shardSize=8, numFeatures=NUM_FEATURES_SMALL) as writer:
+        writer.append(makeRows(0, 3))
+    with pytest.raises(ValueError):
+        ShardWriter(tmp_path, NUM_ACTIONS + 1, numFeatures=NUM_FEATURES_SMALL)
+
+
+def test_generated_decisions_are_legal(tmp_path):
+    written = generate(tmp_path, [3, 0], 2, num_workers=1, seed=0, shard_size=1000)
+    dataset = ShardDataset(tmp_path)
+    assert len(dataset) == written > 0
+    batch = dataset.rows(np.arange(len(dataset)))
+    assert batch["features"].shape == (written, NUM_FEATURES)
+    assert batch["legal"].shape[1] == len(ActionSpace.forLayout(0))
+    chosen = batch["action"] >= 0
+    assert batch["legal"][np.flatnonzero(chosen), batch["action"][chosen]].all()
+    assert set(np.unique(batch["outcome"])) <= {0.0, 0.5, 1.0}
+    assert set(np.unique(batch["seed"])) == {0, 1}
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from agents import PlayerState
+from benchmark import play_random_turns
+from game import VIEW_ACTIONS, StateView
+from gameConstants import *
+from valueFeatures import extractFeatures
+
+SEEDS = (1, 3, 5)
+
+
+def boardCells(board):
+    vertices = {(v.X, v.Y): (v.player, v.isSettlement, v.isCity, v.canSettle) for v in board.getAllVertices()}
+    edges = {(e.X, e.Y): e.player for row in board.edges for e in row if e is not None}
+    pieces = [sorted((p.X, p.Y) for p in pieces) for pieces in (board.allSettlements, board.allCities, board.allRoads)]
+    return vertices, edges, pieces
+
+
+def playerFields(player):
+    fields = []
+    for slot in PlayerState.__slots__:
+        value = getattr(player, slot)
+        if slot in ("roads", "settlements", "cities"):
+            value = sorted((piece.X, piece.Y) for piece in value)
+        elif isinstance(value, list):
+            value = list(value)
+        fields.append(value)
+    return fields
+
+
+@pytest.fixture(scope="module")
+def states():
+    # Mid-game states where both players can afford anything
+    states = []
+    for seed in SEEDS:
+        state = play_random_turns(seed, 40).gameState
+        for player in state.players:
+            player.resources[:] = [6] * NUM_RESOURCES
+        states.append(state)
+    return states
+
+
+def test_views_leave_the_parent_unchanged_and_match_full_copies(states):
+    checked = 0
+    for state in states:
+        for playerIndex in range(NUM_PLAYERS):
+            parentHash, parentCells = state.stateHash(), boardCells(state.board)
+            parentPlayers = [playerFields(player) for player in state.players]
+            for action in state.getLegalActions(playerIndex):
+                if action[0] not in VIEW_ACTIONS:
+                    continue
+                view = state.successorView(playerIndex, action)
+                successor = state.generateSuccessor(playerIndex, action)
+                assert isinstance(view, StateView)
+                assert boardCells(view.board) == boardCells(successor.board)
+                assert [playerFields(player) for player in view.players] == \
+                       [playerFields(player) for player in successor.players]
+                for p in range(NUM_PLAYERS):
+                    np.testing.assert_array_equal(extractFeatures(view, p), extractFeatures(successor, p))
+                checked += 1
+            assert state.stateHash() == parentHash
+            assert boardCells(state.board) == parentCells
+            assert [playerFields(player) for player in state.players] == parentPlayers
+    assert checked
+
+
+def test_view_writes_copy_only_what_they_touch(states):
+    state = states[0]
+    playerIndex = 0
+    road = next(action for action in state.getLegalActions(playerIndex) if action[0] == ACTIONS.ROAD)
+    view = state.successorView(playerIndex, road)
+    edge = road[1]
+    assert view.board.getEdge(edge.X, edge.Y) is not state.board.getEdge(edge.X, edge.Y)
+    assert view.board.vertices is state.board.vertices
+    assert view.players[1 - playerIndex] is state.players[1 - playerIndex]
+    assert view.bank is not state.bank
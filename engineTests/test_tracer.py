@@ -0,0 +1,45 @@
+import pytest
+
+from agents import ValueFunctionPlayer
+from game import Game
+from gameConstants import *
+from profiling import Tracer
+from replay import Replayer
+
+
+def playGame(seed, tracer=None):
+    game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False, tracer=tracer)
+    result = game.play_test_game(seed)
+    return game, result
+
+
+def test_traced_value_function_keeps_its_attributes():
+    game, _ = playGame(0, Tracer())
+    agent = next(agent for agent in game.gameState.playerAgents if isinstance(agent, ValueFunctionPlayer))
+    for name in ("features", "delta", "weights", "plan", "evaluate_batch"):
+        assert hasattr(agent.value_fn, name)
+
+
+def test_traced_game_plays_like_an_untraced_one():
+    for seed in range(2):
+        tracer = Tracer()
+        traced = playGame(seed, tracer)[1]
+        assert traced[:2] == playGame(seed)[1][:2]
+        assert not tracer.open
+
+
+def test_failed_successor_closes_its_span():
+    game, _ = playGame(0)
+    state = Replayer(game.record).stateAt(len(game.record.turns) // 2)
+    tracer = Tracer()
+    state.tracer = tracer
+    tracer.begin_decision("decision")
+    player = state.players[0]
+    player.resources[:] = [0] * len(player.resources)
+    vertex = next(vertex for vertex in state.board.getAllVertices() if vertex.canSettle)
+    with pytest.raises(Exception):
+        state.generateSuccessor(0, (ACTIONS.SETTLE, vertex))
+    assert tracer.open == [True]
+    tracer.end_decision()
+    phases = [event[0] for event in tracer.events]
+    assert phases.count("B") == phases.count("E") == 2
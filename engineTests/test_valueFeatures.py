@@ -0,0 +1,149 @@
+import copy
+
+import numpy as np
+import pytest
+
+from agents import CONTENDER_WEIGHTS, DEFAULT_WEIGHTS, ValueFunctionPlayer, base_fn
+from game import VIEW_ACTIONS, Game
+from gameConstants import *
+from valueFeatures import (FEATURE_INDEX, LONGEST_ROAD_OPEN_WEIGHT, NUM_FEATURES, FeatureCache, extractFeatures, featureDelta,
+                           rankLexicographic)
+
+SEEDS = (0, 1)
+AGENT = 0  # The ValueFunctionPlayer's seat in the games played below
+
+
+@pytest.fixture(scope="module")
+def decisions():
+    # Copies of the states the ValueFunctionPlayer decided in, in the order it saw them
+    states = []
+    for seed in SEEDS:
+        game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False)
+
+        def keep(gameState, agent, action):
+            if agent.agentIndex == AGENT:
+                states.append(copy.deepcopy(gameState))
+
+        game.decision_listener = keep
+        game.play_test_game(seed)
+    return states
+
+
+def viewActions(state):
+    return [action for action in state.getLegalActions(AGENT) if action[0] in VIEW_ACTIONS]
+
+
+def fullRows(state, actions, plan=None):
+    return np.array([extractFeatures(state.successorView(AGENT, action), AGENT, plan=plan) for action in actions])
+
+
+def paramsValue(state, playerIndex, params):
+    # base_fn's value as a sum over the params dict, with the longest road's open-board weight
+    features = extractFeatures(state, playerIndex)
+    player = state.players[playerIndex]
+    assert features[FEATURE_INDEX["public_vps"]] == player.victoryPoints
+    assert features[FEATURE_INDEX["hand_resources"]] == sum(player.resources)
+    assert features[FEATURE_INDEX["hand_devs"]] == player.num_dev_cards()
+    assert features[FEATURE_INDEX["longest_road_length"]] == state.board.calculateLongestRoad(playerIndex)
+    value = 0.0
+    for name, weight in params.items():
+        if name not in FEATURE_INDEX:
+            continue  # DEFAULT_WEIGHTS' "winning" and "losing" are not terms of the value
+        if name == "longest_road":
+            length = features[FEATURE_INDEX["longest_road_length"]]
+            blocked = features[FEATURE_INDEX["buildable_nodes"]] == 0
+            value += length * (weight if blocked else LONGEST_ROAD_OPEN_WEIGHT)
+        else:
+            value += weight * features[FEATURE_INDEX[name]]
+    return value
+
+
+@pytest.mark.parametrize("params", [DEFAULT_WEIGHTS, CONTENDER_WEIGHTS], ids=["default", "contender"])
+def test_base_fn_is_the_weighted_sum_of_its_params(decisions, params):
+    value_fn = base_fn(params)
+    for state in decisions[::5]:
+        for playerIndex in range(NUM_PLAYERS):
+            assert value_fn(state, playerIndex) == pytest.approx(paramsValue(state, playerIndex, params), rel=1e-12)
+
+
+def test_planned_extraction_ignores_what_the_buffer_held(decisions):
+    value_fn = base_fn()
+    for state in decisions[::10]:
+        out = np.full(NUM_FEATURES, np.nan)
+        extractFeatures(state, AGENT, out, value_fn.plan)
+        np.testing.assert_array_equal(out, extractFeatures(state, AGENT, plan=value_fn.plan))
+        assert out @ value_fn.weights == pytest.approx(extractFeatures(state, AGENT) @ value_fn.weights, abs=1e-9)
+
+
+def test_feature_deltas_match_full_extraction(decisions):
+    checked = 0
+    for state in decisions:
+        actions = viewActions(state)
+        if not actions:
+            continue
+        root = extractFeatures(state, AGENT)
+        deltas = np.array([featureDelta(root, state.successorView(AGENT, action), AGENT, action) for action in actions])
+        np.testing.assert_allclose(deltas, fullRows(state, actions), rtol=0, atol=1e-9)
+        checked += len(actions)
+    assert checked
+
+
+@pytest.mark.parametrize("params", [DEFAULT_WEIGHTS, CONTENDER_WEIGHTS], ids=["default", "contender"])
+def test_lexicographic_ranking_matches_full_ranking(decisions, params):
+    value_fn = base_fn(params)
+    for state in decisions:
+        actions = viewActions(state)
+        if not actions:
+            continue
+        values = fullRows(state, actions, value_fn.plan) @ value_fn.weights
+        successors = [state.successorView(AGENT, action) for action in actions]
+        root = value_fn.features(state, AGENT)
+        best, value = rankLexicographic(root, successors, AGENT, actions, value_fn.weights, value_fn.plan)
+        assert values[best] == values.max()
+        assert value == pytest.approx(values.max(), abs=1e-9)
+
+
+def test_feature_cache_matches_feature_deltas(decisions):
+    # One cache carried across every decision, the way ValueFunctionPlayer keeps it
+    value_fn = base_fn()
+    cache = FeatureCache()
+    for state in decisions:
+        actions = viewActions(state)
+        if not actions:
+            continue
+        root = value_fn.features(state, AGENT)
+        rows = cache.fill(state, AGENT, actions, root, value_fn.plan, np.empty((len(actions), len(root))))
+        np.testing.assert_allclose(rows, fullRows(state, actions, value_fn.plan), rtol=0, atol=1e-9)
+    assert cache.hits
+
+
+@pytest.mark.parametrize("params", [None, DEFAULT_WEIGHTS], ids=["unplanned", "planned"])
+def test_feature_cache_rows_match_fresh_extraction(decisions, params):
+    # Every action but PASS, dev cards included, filled into buffers full of NaN. Successors that
+    # draw from the search stream come out the same from two copies of one state
+    plan = None if params is None else base_fn(params).plan
+    cache = FeatureCache()
+    for state in decisions:
+        actions = [action for action in state.getLegalActions(AGENT) if action[0] != ACTIONS.PASS]
+        if not actions:
+            continue
+        root = extractFeatures(state, AGENT, plan=plan)
+        rows = np.full((len(actions), NUM_FEATURES), np.nan)
+        cache.fill(copy.deepcopy(state), AGENT, actions, root, plan, rows)
+        np.testing.assert_allclose(rows, fullRows(copy.deepcopy(state), actions, plan), rtol=0, atol=1e-9)
+        if plan is not None:
+            weights = base_fn(params).weights
+            np.testing.assert_allclose(rows @ weights, fullRows(copy.deepcopy(state), actions) @ weights, rtol=1e-12)
+    assert cache.hits
+
+
+def test_ranked_actions_match_full_ranking(decisions):
+    agent = ValueFunctionPlayer("Player 0", AGENT, getColorForPlayer(AGENT))
+    for state in decisions:
+        actions = viewActions(state)
+        if not actions:
+            continue
+        values = fullRows(state, actions, agent.value_fn.plan) @ agent.value_fn.weights
+        best, value = agent.rankActions(state, actions, agent.value_fn.features(state, AGENT))
+        assert values[best] == pytest.approx(values.max(), abs=1e-9)
+        assert value == pytest.approx(values.max(), abs=1e-9)
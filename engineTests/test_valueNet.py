@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from game import Game
+from gameConstants import *
+from replay import Replayer
+from valueFeatures import extractFeatures
+from valueNet import MLPValueNet, mlp_fn, recordPositions
+
+SIZES = (6, 5, 4, 1)
+
+
+def data(count=64, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(count, SIZES[0]))
+    y = (X[:, 0] + 0.5 * X[:, 1] > 0).astype(float)
+    return X, y
+
+
+def test_save_and_load_round_trip(tmp_path):
+    X, y = data()
+    net = MLPValueNet(SIZES, seed=1)
+    net.fit(X, y, epochs=2, batchSize=16)
+    path = tmp_path / "net.npz"
+    net.save(path)
+    loaded = MLPValueNet.load(path)
+    assert loaded.sizes == net.sizes
+    np.testing.assert_array_equal(loaded.predict(X), net.predict(X))
+    np.testing.assert_array_equal(mlp_fn(str(path)).evaluate_batch(X), net.predict(X))
+
+
+def test_gradients_match_finite_differences():
+    X, y = data(16)
+    net = MLPValueNet(SIZES, seed=2)
+    net.normalizeFor(X)
+    grads, loss = net.gradients(X, y)
+    assert loss == pytest.approx(net.loss(X, y))
+    step = 1e-6
+    for param, grad in zip(net.parameters(), grads):
+        flat, flatGrad = param.reshape(-1), grad.reshape(-1)
+        for i in range(0, flat.size, max(1, flat.size // 7)):
+            original = flat[i]
+            flat[i] = original + step
+            above = net.loss(X, y)
+            flat[i] = original - step
+            below = net.loss(X, y)
+            flat[i] = original
+            assert flatGrad[i] == pytest.approx((above - below) / (2 * step), abs=1e-6)
+
+
+@pytest.mark.parametrize("optimizer", ["adam", "sgd"])
+def test_fitting_lowers_the_loss(optimizer):
+    X, y = data(256)
+    net = MLPValueNet(SIZES, seed=3)
+    history = net.fit(X, y, epochs=30, batchSize=32, learningRate=1e-2, optimizer=optimizer)
+    assert history[-1] < history[0]
+    assert np.mean((net.predict(X) > 0.5) == (y > 0.5)) > 0.9
+
+
+def test_record_positions_are_every_turns_features():
+    # recordPositions only re-extracts the board terms on turns that build
+    game = Game(playerAgentNums=[3, 0], graphics=False, save_learning=False)
+    game.play_test_game(0)
+    positions = recordPositions(game.record)
+    assert len(positions) == len(game.record.turns) + 1
+    for turn, state in Replayer(game.record).states():
+        for playerIndex in range(NUM_PLAYERS):
+            np.testing.assert_array_equal(positions[turn, playerIndex], extractFeatures(state, playerIndex))
@@ -0,0 +1,227 @@
+"""
+Offline fitting of the linear value function's weights from game records.
+
+Replays a game record log (see valueNet.replayPositions) into the feature vectors base_fn
+weighs, one per player after every turn, and fits a weight per feature so that
+sigmoid(features @ weights + bias) predicts the player's chances of winning:
+
+    logistic  regresses every position on the final outcome of its game.
+    td        fits TD(lambda) values: each position's target is its lambda-return, the
+              outcome blended with the current fit's values of the player's later
+              positions. Targets and fit alternate for --sweeps rounds; lambda = 1 is the
+              logistic fit.
+
+Each fit is a few Newton steps on the cross-entropy over the whole dataset, so
+millions of positions take seconds once replayed. The longest road's open-board term
+keeps the fixed weight weightVector gives it (it enters the fit as an offset), and
+the bias is dropped, since it adds the same to every state's value. The result is a
+params dict like CONTENDER_WEIGHTS, in logit units; rankings only depend on the ratios
+between weights. It is printed and, with --out, saved as JSON:
+
+    contender_fn(loadWeights("weights.json"))
+
+Usage:
+    python tournament.py --agents 3 5 --num-games 2000 --record games.ctnr
+    python fitWeights.py games.ctnr --method td --lam 0.7 --num-workers 8 --out weights.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from valueFeatures import FEATURES, FIXED_WEIGHTS, NUM_FEATURES
+from valueNet import replayPositions, sigmoid
+
+METHODS = ("logistic", "td")
+# The features a params dict sets; the rest have FIXED_WEIGHTS
+FITTED = [i for i, name in enumerate(FEATURES) if name not in FIXED_WEIGHTS]
+FIXED = np.array([FIXED_WEIGHTS.get(name, 0.0) for name in FEATURES])
+NEWTON_TOLERANCE = 1e-8
+
+
+class Trajectories:
+    """
+    Every player's positions through every game, stored flat: a player's positions in one
+    game are consecutive rows of X. trajectory[i] and step[i] locate row i, and outcome
+    and games hold, per trajectory, the final outcome and the game's index in the log.
+    """
+
+    def __init__(self, X, trajectory, step, outcome, games):
+        self.X = X
+        self.trajectory = trajectory
+        self.step = step
+        self.outcome = outcome
+        self.games = games
+        self.lengths = np.bincount(trajectory, minlength=len(outcome))
+
+    @classmethod
+    def fromLog(cls, path, maxGames=None, numWorkers=1):
+        blocks, outcomes, games = [], [], []
+        for gameNum, winner, positions in replayPositions(path, maxGames, numWorkers):
+            for playerIndex in range(positions.shape[1]):
+                blocks.append(positions[:, playerIndex])
+                outcomes.append(float(playerIndex == winner))
+                games.append(gameNum)
+        lengths = np.array([len(block) for block in blocks], dtype=int)
+        X = np.concatenate(blocks) if blocks else np.empty((0, NUM_FEATURES))
+        trajectory = np.repeat(np.arange(len(blocks)), lengths)
+        step = np.arange(len(X)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return cls(X, trajectory, step, np.array(outcomes), np.array(games, dtype=int))
+
+    def __len__(self):
+        return len(self.X)
+
+    def subset(self, keep):
+        # The trajectories where keep (one flag per trajectory) is set
+        rows = keep[self.trajectory]
+        renumber = np.cumsum(keep) - 1
+        return Trajectories(self.X[rows], renumber[self.trajectory[rows]], self.step[rows], self.outcome[keep],
+                            self.games[keep])
+
+    def rowOutcomes(self):
+        return self.outcome[self.trajectory]
+
+    def lambdaReturns(self, values, lam):
+        """
+        Every row's lambda-return under values (one per row), with no reward before the end and
+        the outcome as the value of the last position: G_T = outcome, G_t = (1 - lam) V_{t+1} + lam G_{t+1}.
+        Runs backwards over steps, vectorized across trajectories.
+        """
+        grid = np.zeros((len(self.outcome), self.lengths.max(initial=0) + 1))
+        grid[self.trajectory, self.step] = values
+        last = self.lengths - 1
+        # The last position is terminal, so it is worth the outcome rather than the fit's value of it
+        grid[np.arange(len(self.outcome)), last] = self.outcome
+        returns = np.zeros_like(grid)
+        following = np.zeros(len(self.outcome))
+        for step in range(grid.shape[1] - 2, -1, -1):
+            blended = (1 - lam) * grid[:, step + 1] + lam * following
+            following = np.where(step == last, self.outcome, blended)
+            returns[:, step] = following
+        return returns[self.trajectory, self.step]
+
+
+def logisticFit(Z, targets, offset, l2=1e-4, iterations=25, coef=None):
+    """
+    Newton's method for the coefficients (last one the bias) minimizing the cross-entropy of
+    sigmoid(Z @ coef[:-1] + coef[-1] + offset) against targets in [0, 1], plus l2 on the weights.
+    """
+    Zb = np.hstack([Z, np.ones((len(Z), 1))])
+    coef = np.zeros(Zb.shape[1]) if coef is None else coef.copy()
+    ridge = np.full(Zb.shape[1], l2)
+    ridge[-1] = 0
+    for _ in range(iterations):
+        p = sigmoid(Zb @ coef + offset)
+        gradient = Zb.T @ (p - targets) / len(Zb) + ridge * coef
+        hessian = (Zb * (p * (1 - p))[:, None]).T @ Zb / len(Zb) + np.diag(ridge)
+        step = np.linalg.lstsq(hessian, gradient, rcond=None)[0]
+        coef -= step
+        if np.abs(step).max() < NEWTON_TOLERANCE:
+            break
+    return coef
+
+
+class LinearFit:
+    """
+    Fits the free weights on standardized features and maps them back, so that
+    value(X) = sigmoid(X @ weights + bias) with weights[FIXED_WEIGHTS] at their fixed values.
+    """
+
+    def __init__(self, X):
+        free = X[:, FITTED]
+        self.mean = free.mean(axis=0) if len(X) else np.zeros(len(FITTED))
+        std = free.std(axis=0) if len(X) else np.ones(len(FITTED))
+        self.constant = std == 0  # Nothing to fit; their weights stay 0
+        self.std = np.where(self.constant, 1, std)
+        self.weights = FIXED.copy()
+        self.bias = 0.0
+        self.coef = None
+
+    def fit(self, X, targets, l2=1e-4):
+        Z = (X[:, FITTED] - self.mean) / self.std
+        self.coef = logisticFit(Z, targets, X @ FIXED, l2, coef=self.coef)
+        self.weights = FIXED.copy()
+        self.weights[FITTED] = np.where(self.constant, 0, self.coef[:-1] / self.std)
+        self.bias = self.coef[-1] - self.coef[:-1] @ (self.mean / self.std)
+        return self
+
+    def predict(self, X):
+        return sigmoid(X @ self.weights + self.bias)
+
+    def params(self):
+        return {name: float(self.weights[i]) for i, name in enumerate(FEATURES) if name not in FIXED_WEIGHTS}
+
+
+def fitWeights(trajectories, method="td", lam=0.7, sweeps=5, l2=1e-4):
+    """
+    Fits a LinearFit to trajectories by logistic regression on outcomes, or by TD(lambda):
+    alternately recomputing lambda-returns under the current fit and refitting to them.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    X = trajectories.X
+    model = LinearFit(X).fit(X, trajectories.rowOutcomes(), l2)
+    if method == "td" and lam < 1:
+        for _ in range(sweeps):
+            model.fit(X, trajectories.lambdaReturns(model.predict(X), lam), l2)
+    return model
+
+
+def crossEntropy(p, outcomes):
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(-np.mean(outcomes * np.log(p) + (1 - outcomes) * np.log(1 - p)))
+
+
+def loadWeights(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the linear value function's weights to recorded games.")
+    parser.add_argument("log", help="A game record log written by tournament.py --record.")
+    parser.add_argument("-m", "--method", choices=METHODS, default="td")
+    parser.add_argument("--lam", type=float, default=0.7, help="TD(lambda)'s lambda; 1 is the logistic fit.")
+    parser.add_argument("--sweeps", type=int, default=5, help="TD rounds of recomputing targets and refitting.")
+    parser.add_argument("--l2", type=float, default=1e-4, help="L2 penalty on the standardized weights.")
+    parser.add_argument("--validation", type=float, default=0.1, help="Fraction of games held out to report loss on.")
+    parser.add_argument("-g", "--max-games", type=int, default=None, help="Only read this many games from the log.")
+    parser.add_argument("-w", "--num-workers", type=int, default=1, help="Processes replaying the log.")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-o", "--out", default=None, help="Save the weights dict to this JSON file.")
+    args = parser.parse_args()
+
+    start = time.time()
+    data = Trajectories.fromLog(args.log, args.max_games, args.num_workers)
+    if not len(data):
+        parser.error(f"{args.log} has no finished games")
+    gameIds = np.unique(data.games)
+    heldOut = np.isin(data.games, np.random.default_rng(args.seed).permutation(gameIds)[:int(len(gameIds) * args.validation)])
+    train, validation = data.subset(~heldOut), data.subset(heldOut)
+    replayed = time.time()
+    print(f"Replayed {len(data)} positions from {len(gameIds)} games in {replayed - start:.1f}s, "
+          f"{len(validation)} held out")
+
+    model = fitWeights(train, args.method, args.lam, args.sweeps, args.l2)
+    print(f"Fitted in {time.time() - replayed:.2f}s")
+    for name, subset in (("Training", train), ("Validation", validation)):
+        if len(subset):
+            p = model.predict(subset.X)
+            outcomes = subset.rowOutcomes()
+            print(f"{name} loss {crossEntropy(p, outcomes):.4f}, accuracy {np.mean((p > 0.5) == (outcomes > 0.5)):.3f}")
+
+    weights = model.params()
+    print("WEIGHTS = {")
+    for name, weight in weights.items():
+        print(f"    {name!r}: {weight!r},")
+    print("}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(weights, f, indent=4)
+        print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
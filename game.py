@@ -6,37 +6,54 @@
 
 import pygame
 from agents import *
-from board import BeginnerLayout, Board, Edge, Hexagon, Vertex
+from board import BeginnerLayout, Board, BoardView, Edge, Hexagon, Vertex, getLayoutId
+from actionSpace import ActionSpace
+from gameRecord import GameRecord
+from profiling import MemoryMonitor, PhaseTimer, SearchStats
 from gameConstants import *
 from collections import Counter
 from draw import Draw
+from gameRNG import GameRNG
 import time
+import zlib
+from array import array
 
 import argparse
 
 class GameState:
-    def __init__(self, layout=BeginnerLayout):
-        self.board = Board(layout)
+    def __init__(self, layout=BeginnerLayout, seed=None, rng=None, board=None):
+        self.rng = rng if rng is not None else GameRNG(seed)
+        self.board = board if board is not None else Board(layout)
         self.playerAgents = [None] * NUM_PLAYERS
-        self.diceAgent = DiceAgent()
-        self.bank = Counter(BANK_RESOURCES)
+        self.players = [None] * NUM_PLAYERS  # Each seat's PlayerState; seated agents share these
+        self.diceAgent = DiceAgent(rng=self.rng.dice)
+        self.bank = resourceArray(BANK_RESOURCES)
         self.dev_card_deck = DEV_CARD_DECK.copy()
-        random.shuffle(self.dev_card_deck)
+        self.rng.deck.shuffle(self.dev_card_deck)
         self.largest_army_holder = None
         self.last_actions = [None, None]  # Store last action for each player
+        self.eventListener = None  # Called with engine-resolved events (steals) so they can be recorded
+        self.phaseTimer = None  # Set by Game when phase timing is on; search copies never time
+        self.tracer = None  # Unlike the phase timer, shared with search copies so successors show up in traces
 
     def deepCopy(self):
-        copy = GameState()
-        copy.board = self.board.deepCopy()
-        copy.playerAgents = [playerAgent.deepCopy(copy.board) for playerAgent in self.playerAgents]
+        copy = GameState(self.board.layout, rng=self.rng.forSearch(), board=self.board.deepCopy())
+        copy.tracer = self.tracer
+        copy.players = [player.deepCopy(copy.board) for player in self.players]
+        # Search copies have no agents; their seats are the copied states, which answer the same rule queries
+        copy.playerAgents = copy.players
         return copy
+
+    def seatPlayer(self, agent):
+        self.playerAgents[agent.agentIndex] = agent
+        self.players[agent.agentIndex] = agent.state
     
 
     def getLegalActions(self, agentIndex):
         legalActions = []
         if self.gameOver() >= 0:
             return legalActions
-        agent = self.playerAgents[agentIndex]
+        agent = self.players[agentIndex]
 
         if agent.canBuildRoad():
             for road in agent.roads:
@@ -65,19 +82,19 @@ class GameState:
         if agent.canBuyDevCard(self):
             legalActions.append((ACTIONS.BUY_DEV_CARD, None))
         
-        for card in agent.dev_cards:
-            if card.can_be_used and not card.has_been_used:
-                if card.type == DevCardTypes.KNIGHT:
+        for card_type, playable in zip(DEV_CARD_TYPES, agent.playable_dev_cards):
+            if playable:
+                if card_type == DevCardTypes.KNIGHT:
                     for hex in self.board.get_valid_robber_hexes():
-                        legalActions.append((ACTIONS.PLAY_DEV_CARD, (card.type, hex)))
-                elif card.type == DevCardTypes.ROAD_BUILDING: 
+                        legalActions.append((ACTIONS.PLAY_DEV_CARD, (card_type, hex)))
+                elif card_type == DevCardTypes.ROAD_BUILDING: 
                     for road in agent.roads:
                         vertices = self.board.getVertexEnds(road)
                         for vertex in vertices:
                             edges = self.board.getEdgesOfVertex(vertex)
                             for edge in edges:
                                 if not edge.isOccupied():
-                                    legalActions.append((ACTIONS.PLAY_DEV_CARD, (card.type, [edge]))) 
+                                    legalActions.append((ACTIONS.PLAY_DEV_CARD, (card_type, [edge]))) 
                                     #TODO: Should be able to build more than one road but limiting to one for now 
                                     """
                                     Consider doing: 
@@ -87,10 +104,10 @@ class GameState:
                                     legal_edges = [Edge(spot[0], spot[1]) for spot in self.get_legal_road_spots(gameState.board)]
                                     edge2 = choose_edge(legal_edges, gameState.board, self.draw)
                                     """
-                elif card.type == DevCardTypes.YEAR_OF_PLENTY: 
-                    legalActions.append((ACTIONS.PLAY_DEV_CARD, (card.type, [ResourceTypes.GRAIN, ResourceTypes.LUMBER])))
-                elif card.type == DevCardTypes.MONOPOLY: 
-                    legalActions.append((ACTIONS.PLAY_DEV_CARD, (card.type, ResourceTypes.GRAIN)))
+                elif card_type == DevCardTypes.YEAR_OF_PLENTY: 
+                    legalActions.append((ACTIONS.PLAY_DEV_CARD, (card_type, [ResourceTypes.GRAIN, ResourceTypes.LUMBER])))
+                elif card_type == DevCardTypes.MONOPOLY: 
+                    legalActions.append((ACTIONS.PLAY_DEV_CARD, (card_type, ResourceTypes.GRAIN)))
             
 
         legalActions.append((ACTIONS.PASS, None))
@@ -100,30 +117,47 @@ class GameState:
         if self.gameOver() >= 0:
             raise Exception("Can't generate a successor of a terminal state!")
 
-        copy = self.deepCopy()
-        # copy.playerAgents[playerIndex].applyAction(action, copy.board, copy)
-        copy.board.applyAction(playerIndex, action)
-        copy.playerAgents[playerIndex].applyAction(action, copy.board, copy)
-        
+        tracer = self.tracer
+        traced = tracer is not None and tracer.detail
+        if traced:
+            tracer.begin("generateSuccessor", "engine")
+        try:
+            copy = self.deepCopy()
+            # copy.playerAgents[playerIndex].applyAction(action, copy.board, copy)
+            copy.board.applyAction(playerIndex, action)
+            copy.players[playerIndex].applyAction(action, copy.board, copy)
+        finally:
+            # An illegal action raises out of applyAction; the span still has to close
+            if traced:
+                tracer.end()
         
         return copy
 
+    def successorView(self, playerIndex, action):
+        # Builds and bank trades only touch a few cells and two small arrays, so they get a StateView;
+        # anything that draws from the deck or moves the robber still goes through a full copy
+        if action[0] not in VIEW_ACTIONS:
+            return self.generateSuccessor(playerIndex, action)
+        if self.gameOver() >= 0:
+            raise Exception("Can't generate a successor of a terminal state!")
+        return StateView(self, playerIndex, action)
+
     def makeMove(self, playerIndex, action):
-        self.playerAgents[playerIndex].applyAction(action, self.board)
+        self.players[playerIndex].applyAction(action, self.board)
         self.board.applyAction(playerIndex, action)
 
     def getNumPlayerAgents(self):
         return len(self.playerAgents)
 
     def gameOver(self):
-        for agent in self.playerAgents:
+        for agent in self.players:
             if agent.hasWon():
                 return agent.agentIndex
         return -1
 
     def updatePlayerResourcesForDiceRoll(self, diceRoll):
         hexagons = self.board.dieRollDict.get(diceRoll, [])
-        player_resources = {i: Counter() for i in range(NUM_PLAYERS)}
+        player_resources = [resourceArray() for _ in range(NUM_PLAYERS)]
 
         for hexagon in hexagons:
             if (hexagon.resource != ResourceTypes.NOTHING):
@@ -133,35 +167,66 @@ class GameState:
                         if vertex.isCity:
                             player_resources[vertex.player][hexagon.resource] += 1
 
-        for player_index, resources in player_resources.items():
-            can_fulfill = all(self.bank[resource] >= amount for resource, amount in resources.items())
+        for player_index, resources in enumerate(player_resources):
+            can_fulfill = canAfford(self.bank, resources)
             if can_fulfill:
-                for resource, amount in resources.items():
-                    self.bank[resource] -= amount
-                    self.playerAgents[player_index].resources[resource] += amount
+                payResources(self.bank, self.players[player_index].resources, resources)
             else:
                 # If bank can't fulfill the entire request, no one gets any resources
                 pass
 
         if VERBOSE and DEBUG:
-            for agent in self.playerAgents:
-                print(f"{agent.name} received: {player_resources[agent.agentIndex] if can_fulfill else 'Nothing'}")
-                print(f"{agent.name} now has: {agent.resources}")
+            for agent in self.players:
+                print(f"{agent.name} received: {formatResources(player_resources[agent.agentIndex]) if can_fulfill else 'Nothing'}")
+                print(f"{agent.name} now has: {formatResources(agent.resources)}")
 
     def applyAction(self, playerIndex, action):
         # raise NotImplementedError
-        result = self.playerAgents[playerIndex].applyAction(action, self.board, self)
+        result = self.players[playerIndex].applyAction(action, self.board, self)
         self.board.applyAction(playerIndex, action)
         if action[0] == ACTIONS.ROAD:
-            self.playerAgents[playerIndex].updateLongestRoad(self.board, self)
+            timer = self.phaseTimer
+            start = time.perf_counter() if timer else 0
+            self.players[playerIndex].updateLongestRoad(self.board, self)
+            if timer:
+                timer.lap(type(self.playerAgents[playerIndex]).__name__, "longest_road", start)
         self.last_actions[playerIndex] = action
         return result
     
+    def distributeInitialResources(self):
+        for agent in self.players:
+            # We'll use the last settlement in the list, which should be the second one placed
+            second_settlement = agent.settlements[-1]
+            initial_resources = Counter()
+
+            # Get the hexes surrounding the second settlement
+            surrounding_hexes = self.board.getHexes(second_settlement)
+            
+            for hex in surrounding_hexes:
+                if hex.resource != ResourceTypes.NOTHING:
+                    initial_resources[hex.resource] += 1
+
+            # Distribute the resources
+            if initial_resources:
+                can_fulfill = all(self.bank[resource] >= amount for resource, amount in initial_resources.items())
+                if can_fulfill:
+                    for resource, amount in initial_resources.items():
+                        self.bank[resource] -= amount
+                        agent.resources[resource] += amount
+                    if VERBOSE:
+                        print(f"{agent.name} received initial resources: {dict(initial_resources)}")
+                else:
+                    if VERBOSE:
+                        print(f"Bank couldn't fulfill initial resources for {agent.name}")
+            else:
+                if VERBOSE:
+                    print(f"No initial resources collected for {agent.name}")
+
     def getLastAction(self, agentIndex):
         return self.last_actions[agentIndex]
 
     def format_bank_resources(self):
-        return ', '.join([f"{ResourceDict[resource]}: {count}" for resource, count in self.bank.items()])
+        return ', '.join([f"{ResourceDict[resource]}: {self.bank[resource]}" for resource in RESOURCES])
 
     def drawDevCard(self):
         if len(self.dev_card_deck) > 0:
@@ -173,12 +238,15 @@ class GameState:
             print(f"{moving_player.name} moved the robber to hex {new_hex}")
         
         self.board.move_robber(new_hex)
-        victims = [p for p in self.playerAgents 
-                if p != moving_player and any(v in self.board.getVertices(new_hex) 
+        victims = [p for p in self.players
+                if p.agentIndex != moving_player.agentIndex and any(v in self.board.getVertices(new_hex) 
                                                 for v in p.settlements + p.cities)]
         if victims:
-            victim = random.choice(victims)
-            stolen_resource = moving_player.steal_resource(victim)
+            victim = self.rng.steal.choice(victims)
+            # Steal through whoever sits in the seat, so an agent's own steal policy still applies
+            stolen_resource = self.playerAgents[moving_player.agentIndex].steal_resource(victim, self.rng.steal)
+            if stolen_resource and self.eventListener:
+                self.eventListener((ACTIONS.STEAL, stolen_resource))
             if VERBOSE:
                 if stolen_resource:
                     print(f"{moving_player.name} stole a {stolen_resource.name} from {victim.name}")
@@ -189,8 +257,25 @@ class GameState:
             print(f"No players to steal from at the new robber location")
         return None
 
+    def stateHash(self):
+        # 16-bit digest of everything a replay has to reproduce, stored per turn in game records
+        values = [len(self.dev_card_deck), self.board.robber.hex.X, self.board.robber.hex.Y]
+        values.extend(self.bank)
+        for agent in self.players:
+            values.extend(agent.resources)
+            values.extend([agent.victoryPoints, agent.numRoads, agent.numSettlements, agent.numCities, agent.played_knights,
+                           agent.longestRoadLength, agent.hasLongestRoad, agent.has_largest_army])
+            for pieces in (agent.settlements, agent.cities, agent.roads):
+                values.append(len(pieces))
+                for X, Y in sorted((piece.X, piece.Y) for piece in pieces):
+                    values.extend((X, Y))
+            values.extend(agent.unplayable_dev_cards)
+            values.extend(agent.playable_dev_cards)
+            values.extend(agent.played_dev_cards)
+        return zlib.crc32(array('i', values).tobytes()) & 0xFFFF
+
     def checkLargestArmy(self):
-        players_with_3_plus_knights = [player for player in self.playerAgents if player.played_knights >= LARGEST_ARMY_REQUIREMENT]
+        players_with_3_plus_knights = [player for player in self.players if player.played_knights >= LARGEST_ARMY_REQUIREMENT]
         
         if not players_with_3_plus_knights:
             if self.largest_army_holder:
@@ -213,9 +298,63 @@ class GameState:
         if VERBOSE:
             print(f"{self.largest_army_holder.name} now holds the Largest Army with {self.largest_army_holder.played_knights} knights played.")
 
+VIEW_ACTIONS = (ACTIONS.SETTLE, ACTIONS.ROAD, ACTIONS.CITY, ACTIONS.TRADE)
+
+class StateView:
+    """
+    Copy-on-write successor of a GameState for one-ply evaluation. It keeps a reference to the
+    parent and holds only what the move changed: a BoardView with the touched cells, a copy of the
+    mover's hand and pieces, and the bank. It answers the same read queries as a GameState, so
+    evaluation functions take either. Only VIEW_ACTIONS are supported; use successorView.
+    """
+    __slots__ = ("parent", "board", "players", "playerAgents", "bank", "tracer")
+
+    def __init__(self, parent, playerIndex, action):
+        self.parent = parent
+        self.tracer = parent.tracer
+        self.board = BoardView(parent.board)
+        self.bank = parent.bank[:]
+        self.players = parent.players[:]
+        self.players[playerIndex] = self.players[playerIndex].viewCopy()
+        self.playerAgents = self.players
+        self.board.applyAction(playerIndex, action)
+        self.players[playerIndex].applyAction(action, self.board, self)
+
+    @property
+    def rng(self):
+        return self.parent.rng
+
+    @property
+    def dev_card_deck(self):
+        return self.parent.dev_card_deck
+
+    @property
+    def largest_army_holder(self):
+        return self.parent.largest_army_holder
+
+    @property
+    def last_actions(self):
+        return self.parent.last_actions
+
+    gameOver = GameState.gameOver
+    getLastAction = GameState.getLastAction
+    getNumPlayerAgents = GameState.getNumPlayerAgents
+    format_bank_resources = GameState.format_bank_resources
+    stateHash = GameState.stateHash
+
 class Game:
-    def __init__(self, playerAgentNums=None, num_test_games=NUM_TEST_GAMES):
-        if GRAPHICS: 
+    def __init__(self, playerAgentNums=None, num_test_games=NUM_TEST_GAMES, graphics=GRAPHICS, save_learning=True, seed=None,
+                 phase_timing=False, tracer=None, memory_profiling=False):
+        self.graphics = graphics
+        self.save_learning = save_learning
+        self.seed = seed  # Game i of a test run is played with seed + i
+        # Per-phase turn timings, aggregated over every game this Game plays
+        self.phase_timer = PhaseTimer() if phase_timing else None
+        self.tracer = tracer  # profiling.Tracer, for a timeline of every turn and decision
+        self.memory_monitor = None
+        if memory_profiling:
+            self.memory_monitor = MemoryMonitor()  # Only traces while play_test_game runs
+        if self.graphics: 
             pygame.init()
             self.screen_width = 1020
             self.screen_height = 800
@@ -223,12 +362,14 @@ class Game:
             pygame.display.set_caption("Settlers of Catan")
             self.clock = pygame.time.Clock()
 
-        self.moveHistory = []
-        self.gameState = GameState()
+        self.gameState = GameState(seed=seed)
+        self.record = None
+        self.record_writer = None  # Optional GameRecordWriter; finished games are appended to it
+        self.decision_listener = None  # Optional; called with (gameState, agent, action) before each chosen action is applied
         self.playerAgentNums = playerAgentNums 
         self.menu_state = "MAIN"  # Can be "MAIN", "GAME", or "WINNER"
         
-        if GRAPHICS: 
+        if self.graphics: 
             self.load_images()
             self.init_menu()
 
@@ -240,6 +381,8 @@ class Game:
         self.test_results = {0: 0, 1: 0}  # To keep track of wins in test mode
         
         self.player_victory_points = {0: [], 1: []}
+        # Search counters per seat, summed over every test game
+        self.search_stats = [SearchStats() for _ in range(NUM_PLAYERS)]
 
     def load_images(self):
         self.menu_bg = pygame.image.load("resources/menuScreen.gif").convert()
@@ -279,19 +422,29 @@ class Game:
         self.screen.blit(new_game_text, (self.start_button.x + (self.start_button.width - new_game_text.get_width()) // 2,
                                          self.start_button.y + (self.start_button.height - new_game_text.get_height()) // 2))
 
-    def reset_game(self):
+    def reset_game(self, seed=None):
+        if seed is not None and seed < 0:
+            # Game records store the seed as a varint; better to fail here than when the game is recorded
+            raise ValueError(f"Game seeds must be non-negative, got {seed}")
         if VERBOSE and DEBUG:
             print("Resetting game")
-        self.moveHistory = []
-        self.gameState = GameState()
+        self.gameState = GameState(seed=seed)
+        self.gameState.phaseTimer = self.phase_timer
         self.currentAgentIndex = 0
         self.turnNumber = 1
-        if GRAPHICS:
+        if self.graphics:
             self.draw = Draw(self.gameState.board.tiles, self.screen, self.gameState.board)
+        else:
+            self.draw = None
         self.initializePlayers()
+        self.start_record()
+        if self.tracer:
+            self.gameState.tracer = self.tracer
+            for agent in self.gameState.playerAgents:
+                self.tracer.instrument_agent(agent)
         self.gameState.board.set_draw(self.draw)
         self.initializeBasedOnPlayerAgent()
-        self.distributeInitialResources()  # Add this line
+        self.gameState.distributeInitialResources()
 
         if VERBOSE and DEBUG:
             print("Player agent nums: ", self.playerAgentNums)
@@ -315,6 +468,11 @@ class Game:
         self.draw.drawSettlements(self.gameState.board.allSettlements)
         self.draw.drawCities(self.gameState.board.allCities)
 
+    def render(self):
+        if self.graphics:
+            self.drawGame()
+            pygame.display.flip()
+
     def createPlayer(self, playerCode, index):
         color = getColorForPlayer(index)
         playerName = f"Player {index}"
@@ -324,7 +482,7 @@ class Game:
             1: lambda name, index, color: PlayerAgentHuman(name, index, color), 
             2: lambda name, index, color: PlayerAgentExpectimax(name, index, color),
             3: lambda name, index, color: ValueFunctionPlayer(name, index, color),
-            4: lambda name, index, color: QLearningAgent(name, index, color),
+            4: lambda name, index, color: QLearningAgent(name, index, color, persist=self.save_learning),
             5: lambda name, index, color: LookAheadRolloutPlayer(name, index, color)
         }
 
@@ -334,17 +492,18 @@ class Game:
         if self.playerAgentNums is None:
             self.playerAgentNums = getPlayerAgentSpecifications()
         for i in range(NUM_PLAYERS):
-            self.gameState.playerAgents[i] = self.createPlayer(self.playerAgentNums[i], i)
+            agent = self.createPlayer(self.playerAgentNums[i], i)
+            agent.rng = self.gameState.rng.agents[i]
+            self.gameState.seatPlayer(agent)
 
     def initializeBasedOnPlayerAgent(self):
-        self.drawGame()
-        pygame.display.flip()
+        self.render()
         for i in [0,1,1,0]:
             agent = self.gameState.playerAgents[i]
 
             # Get settlement
             if isinstance(agent, PlayerAgentRandom):
-                vertex = self.gameState.board.getRandomVertexForSettlement()
+                vertex = self.gameState.board.getRandomVertexForSettlement(agent.rng)
                 if vertex is None:
                     raise Exception("No valid settlement spots available")
             elif isinstance(agent, (PlayerAgentExpectiminimax, PlayerAgentExpectimax, ValueFunctionPlayer, QLearningAgent)):
@@ -352,17 +511,17 @@ class Game:
             elif isinstance(agent, PlayerAgentHuman):
                 vertex = self.gameState.board.getHumanVertexForSettlement()
             else:
-                vertex = self.gameState.board.getRandomVertexForSettlement()
+                vertex = self.gameState.board.getRandomVertexForSettlement(agent.rng)
 
+            self.recordAction((ACTIONS.SETTLE, vertex))
             self.gameState.board.applyAction(i, (ACTIONS.SETTLE, vertex))
             agent.settlements.extend([vertex])
 
-            self.drawGame()
-            pygame.display.flip()
+            self.render()
 
             # Get connected road
             if isinstance(agent, PlayerAgentRandom):
-                road = self.gameState.board.getRandomRoad(vertex)
+                road = self.gameState.board.getRandomRoad(vertex, agent.rng)
                 if road is None:
                     raise Exception("No valid road spots available")
             elif isinstance(agent, (PlayerAgentExpectiminimax, PlayerAgentExpectimax, ValueFunctionPlayer, QLearningAgent)):
@@ -370,13 +529,13 @@ class Game:
             elif isinstance(agent, PlayerAgentHuman):
                 road = self.gameState.board.getHumanRoad(vertex)
             else:
-                road = self.gameState.board.getRandomRoad(vertex)
+                road = self.gameState.board.getRandomRoad(vertex, agent.rng)
 
+            self.recordAction((ACTIONS.ROAD, road))
             self.gameState.board.applyAction(i, (ACTIONS.ROAD, road))
             agent.roads.extend([road])
 
-            self.drawGame()
-            pygame.display.flip()
+            self.render()
 
         for i in range(2):
             self.gameState.playerAgents[i].collectInitialResources(self.gameState.board)
@@ -474,16 +633,29 @@ class Game:
             old_state = current_player.get_state(self.gameState)
             old_score = current_player.victoryPoints
 
+        timer = self.phase_timer
+        if timer:
+            agentType = type(current_player).__name__
+            lap = time.perf_counter()
+
         # First, handle discarding
         for player in self.gameState.playerAgents:
             discarded = player.discard_half_on_seven(self.gameState)
             if discarded:
+                for resource in RESOURCES:
+                    for _ in range(discarded[resource]):
+                        self.recordAction((ACTIONS.DISCARD, (player.agentIndex, resource)))
                 if VERBOSE:
-                    print(f"{player.name} discarded {sum(discarded.values())} resources: {discarded}")
+                    print(f"{player.name} discarded {sum(discarded)} resources: {formatResources(discarded)}")
+        if timer:
+            lap = timer.lap(agentType, "discard", lap)
 
         # Now, move the robber and steal
         new_hex = current_player.choose_robber_placement(self.gameState.board)
+        self.recordAction((ACTIONS.MOVE_ROBBER, new_hex))
         victim = self.gameState.move_robber_and_steal(current_player, new_hex)
+        if timer:
+            timer.lap(agentType, "move_robber", lap)
 
         if isinstance(current_player, QLearningAgent):
             new_state = current_player.get_state(self.gameState)
@@ -493,15 +665,19 @@ class Game:
             current_player.update(old_state, (ACTIONS.MOVE_ROBBER, (new_hex.X, new_hex.Y)), new_state, reward, self.gameState)
             
             # If a resource was stolen, update Q-value for stealing
-            if victim and sum(victim.resources.values()) > 0:
-                stolen_resource = current_player.steal_resource(victim)
+            if victim and sum(victim.resources) > 0:
+                stolen_resource = current_player.steal_resource(victim, self.gameState.rng.steal)
                 if stolen_resource:
+                    self.recordAction((ACTIONS.STEAL, stolen_resource))
                     new_state = current_player.get_state(self.gameState)
                     reward = 1  # You can adjust this reward as needed
                     current_player.update(old_state, (ACTIONS.STEAL, stolen_resource), new_state, reward, self.gameState)
 
-        if GRAPHICS:
+        if self.graphics:
+            lap = time.perf_counter()
             self.drawGame()
+            if timer:
+                timer.lap(agentType, "render", lap)
 
     def run(self):
         if TEST_MODE:
@@ -512,9 +688,10 @@ class Game:
             print("-----------------------------")
 
         self.initializePlayers()
+        self.start_record()
         running = True
 
-        if GRAPHICS: 
+        if self.graphics: 
             while running:
                 if self.menu_state == "MAIN":
                     self.draw_menu()
@@ -531,6 +708,7 @@ class Game:
                 elif self.menu_state == "GAME":
                     if self.gameState.gameOver() >= 0:
                         self.menu_state = "WINNER"
+                        self.finish_record()
                         for agent in self.gameState.playerAgents:
                             if isinstance(agent, QLearningAgent):
                                 agent.save_q_table()  # Save Q-table at the end of each game
@@ -571,6 +749,7 @@ class Game:
         else: 
             while running: 
                 if self.gameState.gameOver() >= 0:
+                    self.finish_record()
                     for agent in self.gameState.playerAgents:
                         if isinstance(agent, QLearningAgent):
                             agent.end_game_update(self.gameState)
@@ -596,52 +775,63 @@ class Game:
         start_time_all = time.time()
 
         for game_num in range(self.num_test_games):
-            self.reset_game()
-            start_time = time.time()
-            while self.gameState.gameOver() < 0 and self.turnNumber <= CUTOFF_TURNS:
-                self.run_game_turn()
-            
-            end_time = time.time()
-            game_time = end_time - start_time
+            seed = None if self.seed is None else self.seed + game_num
+            winner, points, game_time = self.play_test_game(seed)
             total_time += game_time
-            
-            winner = self.gameState.gameOver()
-            if winner >= 0:
-                self.test_results[winner] += 1
-                winner_type = type(self.gameState.playerAgents[winner]).__name__
-                loser = 1 - winner
-                winner_points = self.gameState.playerAgents[winner].victoryPoints
-                loser_points = self.gameState.playerAgents[loser].victoryPoints
-                
-                # Store the victory points for this game
-                self.player_victory_points[winner].append(winner_points)
-                self.player_victory_points[loser].append(loser_points)
-                
-                print(f"Game {game_num + 1}/{self.num_test_games} completed in {game_time:.2f} seconds. "
-                    f"Player {winner} ({winner_type}) won. Score: ({winner_points}-{loser_points})")
-            else:
-                player0_points = self.gameState.playerAgents[0].victoryPoints
-                player1_points = self.gameState.playerAgents[1].victoryPoints
-                
-                # Store the victory points for this game
-                self.player_victory_points[0].append(player0_points)
-                self.player_victory_points[1].append(player1_points)
-                
-                print(f"Game {game_num + 1}/{self.num_test_games} completed in {game_time:.2f} seconds. "
-                    f"No winner (reached turn limit). Score: ({player0_points}-{player1_points})")
-
-            # Update Q-table after each game if using QLearningAgent
-            for agent in self.gameState.playerAgents:
-                if isinstance(agent, QLearningAgent):
-                    agent.end_game_update(self.gameState)
+            self.record_test_result(game_num, winner, points, game_time)
 
         end_time_all = time.time()
         total_time_all = end_time_all - start_time_all
 
         self.print_test_results(total_time, total_time_all)
 
+    def play_test_game(self, seed=None):
+        self.reset_game(seed)
+        if self.memory_monitor:
+            self.memory_monitor.start()
+        start_time = time.time()
+        try:
+            while self.gameState.gameOver() < 0 and self.turnNumber <= CUTOFF_TURNS:
+                self.run_game_turn()
+        finally:
+            # tracemalloc slows down everything after it, so it is off between games
+            if self.memory_monitor:
+                self.memory_monitor.stop()
+        game_time = time.time() - start_time
+
+        winner = self.gameState.gameOver()
+        points = [agent.victoryPoints for agent in self.gameState.playerAgents]
+        self.finish_record()
+        for i, agent in enumerate(self.gameState.playerAgents):
+            if agent.search_stats is not None:
+                self.search_stats[i].merge(agent.search_stats)
+        if self.memory_monitor:
+            self.memory_monitor.record_agents(self.gameState.playerAgents)
+
+        # Update Q-table after each game if using QLearningAgent
+        for agent in self.gameState.playerAgents:
+            if isinstance(agent, QLearningAgent):
+                agent.end_game_update(self.gameState)
+
+        return winner, points, game_time
+
+    def record_test_result(self, game_num, winner, points, game_time):
+        # Store the victory points for this game
+        for i, victory_points in enumerate(points):
+            self.player_victory_points[i].append(victory_points)
+
+        if winner >= 0:
+            self.test_results[winner] += 1
+            winner_type = type(self.gameState.playerAgents[winner]).__name__
+            loser = 1 - winner
+            print(f"Game {game_num + 1}/{self.num_test_games} completed in {game_time:.2f} seconds. "
+                f"Player {winner} ({winner_type}) won. Score: ({points[winner]}-{points[loser]})")
+        else:
+            print(f"Game {game_num + 1}/{self.num_test_games} completed in {game_time:.2f} seconds. "
+                f"No winner (reached turn limit). Score: ({points[0]}-{points[1]})")
+
     def print_test_results(self, total_time, total_time_all):
-        total_games = sum(self.test_results.values())
+        total_games = len(self.player_victory_points[0])
         print("\nTest Results:")
         print("=" * 40)
         for i, agent in enumerate(self.gameState.playerAgents):
@@ -653,6 +843,18 @@ class Game:
             print(f"  Wins: {wins}")
             print(f"  Win Rate: {win_rate:.2f}%")
             print(f"  Average Victory Points: {avg_vp:.2f}")
+            stats = self.search_stats[i]
+            if stats.decisions:
+                nodes_per_sec = stats.nodes_per_sec()
+                print(f"  Search: {stats.decisions} decisions, {stats.nodes_expanded / stats.decisions:.1f} nodes expanded, "
+                      f"{stats.successors_generated / stats.decisions:.1f} successors and "
+                      f"{stats.evaluations / stats.decisions:.1f} evaluations per decision")
+                print(f"          max depth {stats.max_depth}, {stats.timeouts} timeouts, "
+                      f"{nodes_per_sec if nodes_per_sec is not None else 0:.0f} nodes/sec")
+                if stats.rollout_steps:
+                    print(f"          {stats.rollout_steps / stats.decisions:.1f} rollout steps per decision")
+                if stats.proxy_checks:
+                    print(f"          proxy top-k recall {stats.proxy_recall() * 100:.1f}% over {stats.proxy_checks} decisions")
         print("=" * 40)
         print(f"Total Games: {total_games}")
         print(f"Total Game Time: {total_time:.2f} seconds")
@@ -663,8 +865,13 @@ class Game:
         winner_type = type(self.gameState.playerAgents[overall_winner]).__name__
         print(f"\nOverall Winner: Player {overall_winner} ({winner_type}) with {self.test_results[overall_winner]} wins")
 
+        if self.phase_timer:
+            self.phase_timer.print_summary()
+        if self.memory_monitor:
+            self.memory_monitor.print_summary()
+
     def run_game_turn(self):
-        if GRAPHICS and not hasattr(self, 'draw'):
+        if self.graphics and not hasattr(self, 'draw'):
             self.draw = Draw(self.gameState.board.tiles, self.screen, self.gameState.board)
 
         currentAgent = self.gameState.playerAgents[self.currentAgentIndex]
@@ -680,42 +887,76 @@ class Game:
             for a in self.gameState.playerAgents:
                 print(a)
 
+        timer = self.phase_timer
+        if timer:
+            agentType = type(currentAgent).__name__
+            turn_start = lap = time.perf_counter()
+        tracer = self.tracer
+        if tracer:
+            tracer.begin(f"turn {self.turnNumber}", "turn", {"player": self.currentAgentIndex})
+
         diceRoll = self.gameState.diceAgent.rollDice()
+        self.record.beginTurn(diceRoll)
         if VERBOSE:
             print(f"Rolled a {diceRoll}")
 
         if diceRoll == 7:
+            if tracer:
+                tracer.begin("seven", "engine")
             self.handle_seven_rolled(currentAgent)
+            if tracer:
+                tracer.end()
+            if timer:
+                lap = timer.lap(agentType, "seven", lap)
         else:
             self.gameState.updatePlayerResourcesForDiceRoll(diceRoll)
+            if timer:
+                lap = timer.lap(agentType, "dice_payout", lap)
 
-        actions_taken = []
         currentAgent.dev_card_played_this_turn = False  # Reset at the start of the turn
         while True:
+            if tracer:
+                tracer.begin_decision(f"{type(currentAgent).__name__}.getAction")
+            if self.memory_monitor:
+                self.memory_monitor.begin_decision()
             value, action = currentAgent.getAction(self.gameState)
+            if self.memory_monitor:
+                self.memory_monitor.end_decision(type(currentAgent).__name__)
+            if tracer:
+                tracer.end_decision()
+            if timer:
+                lap = timer.lap(agentType, "get_action", lap)
+            if self.decision_listener:
+                self.decision_listener(self.gameState, currentAgent, action)
             if action[0] == ACTIONS.PASS:
                 if VERBOSE:
                     print(f"{currentAgent.name} chose to pass.")
                 break
 
+            # Recorded before it is applied, so a knight's steal follows it in the record
+            self.recordAction(action)
             if action[0] == ACTIONS.PLAY_DEV_CARD:
                 card_type, card_action = action[1]
                 # Apply the action
                 self.gameState.applyAction(self.currentAgentIndex, action)
             else:
                 self.gameState.applyAction(self.currentAgentIndex, action)
-
-            actions_taken.append(action)
+            if timer:
+                lap = timer.lap(agentType, "apply_action", lap)
 
             if VERBOSE:
                 print(f"{currentAgent.name} took action {action[0]} at {action[1]}")
 
-            if GRAPHICS:
+            if self.graphics:
                 self.drawGame()
+                if timer:
+                    lap = timer.lap(agentType, "render", lap)
         
         self.gameState.checkLargestArmy()
+        if timer:
+            timer.lap(agentType, "check_largest_army", lap)
         currentAgent.endTurn()
-        self.moveHistory.append((currentAgent.name, actions_taken))
+        self.record.endTurn(self.gameState.stateHash())
         
         if isinstance(currentAgent, QLearningAgent):
             new_state = currentAgent.get_state(self.gameState)
@@ -724,6 +965,10 @@ class Game:
 
         self.currentAgentIndex = (self.currentAgentIndex + 1) % self.gameState.getNumPlayerAgents()
         self.turnNumber += 1
+        if timer:
+            timer.lap(agentType, "turn", turn_start)
+        if tracer:
+            tracer.end()
 
         if VERBOSE:
             print("\nUpdated BANK INFO:")
@@ -737,35 +982,20 @@ class Game:
             print("Game reached turn limit without a winner.")
             self.menu_state = "WINNER"
 
-    def distributeInitialResources(self):
-        for agent in self.gameState.playerAgents:
-            # We'll use the last settlement in the list, which should be the second one placed
-            second_settlement = agent.settlements[-1]
-            initial_resources = Counter()
+    def start_record(self):
+        layoutId = getLayoutId(self.gameState.board.layout)
+        self.actionSpace = ActionSpace.forLayout(layoutId)
+        self.record = GameRecord(self.gameState.rng.seed, layoutId, self.playerAgentNums)
+        self.gameState.eventListener = self.recordAction
 
-            # Get the hexes surrounding the second settlement
-            surrounding_hexes = self.gameState.board.getHexes(second_settlement)
-            
-            for hex in surrounding_hexes:
-                if hex.resource != ResourceTypes.NOTHING:
-                    initial_resources[hex.resource] += 1
+    def recordAction(self, action):
+        for actionId in self.actionSpace.encodeAll(action):
+            self.record.addAction(actionId)
 
-            # Distribute the resources
-            if initial_resources:
-                can_fulfill = all(self .gameState.bank[resource] >= amount for resource, amount in initial_resources.items())
-                if can_fulfill:
-                    for resource, amount in initial_resources.items():
-                        self.gameState.bank[resource] -= amount
-                        agent.resources[resource] += amount
-                    if VERBOSE:
-                        print(f"{agent.name} received initial resources: {dict(initial_resources)}")
-                else:
-                    if VERBOSE:
-                        print(f"Bank couldn't fulfill initial resources for {agent.name}")
-            else:
-                if VERBOSE:
-                    print(f"No initial resources collected for {agent.name}")
-        
+    def finish_record(self):
+        self.record.winner = self.gameState.gameOver()
+        if self.record_writer is not None:
+            self.record_writer.write(self.record)
 
 def getStringForPlayer(playerCode):
     playerTypes = {
@@ -797,23 +1027,14 @@ def getPlayerAgentSpecifications():
     
 
 
-def run_simulations(n):
-    # setting suitable params to run simulations 
-    VERBOSE = False
-    GRAPHICS = False
-    DEBUG = False
-
+def run_simulations(n, num_workers=None):
+    # Games are played headless across a process pool (see tournament.py)
+    from tournament import run_tournament
 
-    playerAgentNums = [0, 3]  # This currently simulates random players
+    playerAgentNums = [0, 3]
     agentNames = ["PlayerAgentRandom", "ValueFunctionPlayer"]
-    wins = [0, 0]
-
-    for _ in range(n): 
-        game = Game(playerAgentNums=playerAgentNums)
-        winnerIndex, _, _ = game.run()
-        if winnerIndex == 0 or winnerIndex == 1: 
-            wins[winnerIndex] += 1
-        print("The winner of this round is ", winnerIndex)
+    report = run_tournament(playerAgentNums, num_games=n, num_workers=num_workers)
+    wins = [report.test_results[0], report.test_results[1]]
 
     # Formatting the results nicely
     print("\nSimulation Results:")
@@ -846,6 +1067,11 @@ if __name__ == "__main__":
             type=int,
             help="The number of simulations to run."
         )
+        parser.add_argument(
+            "-w", "--num-workers",
+            type=int,
+            help="The number of worker processes (defaults to all cores)."
+        )
 
         # Parse the command-line arguments
         args = parser.parse_args()
@@ -853,7 +1079,7 @@ if __name__ == "__main__":
         # Conditional execution
         if args.simulation_type and args.num_simulations:
             # Run simulations if both arguments are provided
-            run_simulations(args.num_simulations)
+            run_simulations(args.num_simulations, args.num_workers)
         else:
             # Run a single game otherwise
             print("\nRunning a single game...")
@@ -1,5 +1,6 @@
 from enum import Enum
 from collections import Counter
+from operator import add, ge, sub
 
 GRAPHICS = True
 VERBOSE = False #Set to True for Human Mode
@@ -62,8 +63,40 @@ class ResourceTypes(Enum):
     def __str__(self):
         # Override to return resource name in uppercase
         return self.name.upper()
+
+    def __index__(self):
+        # Slot in the resource arrays below; NOTHING has none
+        return self.value - 1
     
 RESOURCES = [resource for resource in ResourceTypes if resource != ResourceTypes.NOTHING]
+NUM_RESOURCES = len(RESOURCES)
+
+# Hands, the bank and costs are plain 5-slot lists in RESOURCES order, indexed directly by
+# ResourceTypes (hand[ResourceTypes.ORE]); these convert to and from resource -> count mappings
+def resourceArray(counts=None):
+    array = [0] * NUM_RESOURCES
+    if counts:
+        for resource, count in counts.items():
+            array[resource] += count
+    return array
+
+def resourceCounter(array):
+    return Counter({resource: array[resource] for resource in RESOURCES})
+
+def formatResources(array):
+    return ", ".join(f"{resource.name.capitalize()}: {array[resource]}" for resource in RESOURCES if array[resource])
+
+def canAfford(hand, cost):
+    return all(map(ge, hand, cost))
+
+def payResources(hand, bank, cost):
+    # Moves cost from hand to bank in place
+    hand[:] = map(sub, hand, cost)
+    bank[:] = map(add, bank, cost)
+
+def resourceList(array):
+    # One entry per card, e.g. for picking a card uniformly at random
+    return [resource for resource, count in zip(RESOURCES, array) for _ in range(count)]
 
 class AGENT(Enum):
     PLAYER_AGENT = 1
@@ -77,11 +110,11 @@ BANK_RESOURCES = {
     ResourceTypes.LUMBER: 19
 }
 
-# Resource costs of a Road, a Settlement, and a City
-ROAD_COST = Counter({ResourceTypes.BRICK: 1, ResourceTypes.LUMBER: 1})
-SETTLEMENT_COST = Counter({ResourceTypes.LUMBER: 1, ResourceTypes.BRICK: 1, ResourceTypes.WOOL: 1, ResourceTypes.GRAIN: 1})
-CITY_COST = Counter({ResourceTypes.GRAIN: 2, ResourceTypes.ORE: 3})
-DEV_CARD_COST = Counter({ResourceTypes.GRAIN: 1, ResourceTypes.WOOL: 1, ResourceTypes.ORE: 1})
+# Resource costs of a Road, a Settlement, a City and a development card, as resource arrays
+ROAD_COST = resourceArray({ResourceTypes.BRICK: 1, ResourceTypes.LUMBER: 1})
+SETTLEMENT_COST = resourceArray({ResourceTypes.LUMBER: 1, ResourceTypes.BRICK: 1, ResourceTypes.WOOL: 1, ResourceTypes.GRAIN: 1})
+CITY_COST = resourceArray({ResourceTypes.GRAIN: 2, ResourceTypes.ORE: 3})
+DEV_CARD_COST = resourceArray({ResourceTypes.GRAIN: 1, ResourceTypes.WOOL: 1, ResourceTypes.ORE: 1})
 
 class DevCardTypes(Enum):
     KNIGHT = 1
@@ -90,6 +123,13 @@ class DevCardTypes(Enum):
     YEAR_OF_PLENTY = 4
     MONOPOLY = 5
 
+    def __index__(self):
+        # Slot in a player's per-type dev card counts
+        return self.value - 1
+
+DEV_CARD_TYPES = list(DevCardTypes)  # Iterating the enum itself is slow
+NUM_DEV_CARD_TYPES = len(DEV_CARD_TYPES)
+
 DEV_CARD_DECK = [DevCardTypes.KNIGHT] * 14 + [DevCardTypes.VICTORY_POINT] * 5 + \
                 [DevCardTypes.ROAD_BUILDING] * 2 + [DevCardTypes.YEAR_OF_PLENTY] * 2 + \
                 [DevCardTypes.MONOPOLY] * 2
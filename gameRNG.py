@@ -0,0 +1,41 @@
+import random
+
+from gameConstants import NUM_PLAYERS
+
+
+class GameRNG:
+    """
+    The random streams for one game, all derived from a single game seed: one for
+    the dice, one for the dev card deck, one for steals and one per player agent.
+    The streams are independent, so an agent exploring more (or less) never shifts
+    the dice sequence, and constructing a GameRNG with the same seed replays the
+    game bit-for-bit.
+    """
+
+    def __init__(self, seed=None, search=False):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+
+        if search:
+            # Every successor built during search shares one stream, so lookahead
+            # is reproducible but never advances the real game's streams.
+            stream = self.stream("search")
+            self.dice = self.deck = self.steal = stream
+            self.searchRNG = self
+        else:
+            self.dice = self.stream("dice")
+            self.deck = self.stream("deck")
+            self.steal = self.stream("steal")
+            self.searchRNG = None
+        self.agents = [self.stream(f"agent{i}") for i in range(NUM_PLAYERS)]
+
+    def stream(self, name):
+        # String seeds are hashed with SHA-512, so streams are identical across
+        # processes regardless of PYTHONHASHSEED.
+        return random.Random(f"{self.seed}:{name}")
+
+    def forSearch(self):
+        if self.searchRNG is None:
+            self.searchRNG = GameRNG(self.seed, search=True)
+        return self.searchRNG
@@ -0,0 +1,200 @@
+"""
+Compact binary game records.
+
+A record holds everything needed to reconstruct a game: its seed (which fixes the
+dev card deck order, see GameRNG), the layout id, the agent codes, the setup
+placements and, per turn, the dice roll plus the integer ids (see ActionSpace) of
+every action and engine event in the order they were applied, followed by a 16-bit
+hash of the state at the end of the turn (GameState.stateHash) that replays check
+against to detect divergence.
+
+Records are appended to a log file as they finish:
+
+    log     := MAGIC record*
+    record  := u32 little-endian payload length, payload
+    payload := flags u8, seed varint, layout u8, numAgents u8, agent u8 *,
+               winner + 1 u8, numSetup varint, id varint *, numTurns varint, turn *
+    turn    := (diceRoll - 2) << 4 | count u8 (count 15 means a varint count follows),
+               id varint *, [state hash u16 little-endian, if FLAG_STATE_HASHES]
+
+A typical game takes a few hundred bytes, and readGameRecords streams a log one
+record at a time, so logs of millions of games never have to fit in memory.
+"""
+
+import os
+import struct
+
+MAGIC = b"CTNR\x02"  # Version 2: state hashes cover per-type dev card counts
+LENGTH = struct.Struct("<I")
+STATE_HASH = struct.Struct("<H")
+ESCAPE_COUNT = 15
+FLAG_STATE_HASHES = 1
+
+
+class GameRecord:
+    def __init__(self, seed, layoutId=0, agents=(), setup=None, turns=None, winner=-1, hashes=None):
+        self.seed = seed
+        self.layoutId = layoutId
+        self.agents = list(agents)
+        self.setup = setup if setup is not None else []
+        self.turns = turns if turns is not None else []  # [(diceRoll, [action ids])]
+        self.winner = winner
+        self.hashes = hashes if hashes is not None else []  # state hash at the end of each turn
+
+    def __repr__(self):
+        return f"GameRecord(seed={self.seed}, agents={self.agents}, turns={len(self.turns)}, winner={self.winner})"
+
+    def addAction(self, actionId):
+        # Actions before the first dice roll are setup placements
+        if self.turns:
+            self.turns[-1][1].append(actionId)
+        else:
+            self.setup.append(actionId)
+
+    def beginTurn(self, diceRoll):
+        self.turns.append((diceRoll, []))
+
+    def endTurn(self, stateHash):
+        self.hashes.append(stateHash)
+
+    def hasStateHashes(self):
+        return len(self.turns) > 0 and len(self.hashes) == len(self.turns)
+
+    def encode(self):
+        withHashes = self.hasStateHashes()
+        out = bytearray()
+        out.append(FLAG_STATE_HASHES if withHashes else 0)
+        writeVarint(out, self.seed)
+        out.append(self.layoutId)
+        out.append(len(self.agents))
+        out.extend(self.agents)
+        out.append(self.winner + 1)
+
+        writeVarint(out, len(self.setup))
+        for actionId in self.setup:
+            writeVarint(out, actionId)
+
+        writeVarint(out, len(self.turns))
+        for turn, (diceRoll, actionIds) in enumerate(self.turns):
+            count = len(actionIds)
+            if count < ESCAPE_COUNT:
+                out.append((diceRoll - 2) << 4 | count)
+            else:
+                out.append((diceRoll - 2) << 4 | ESCAPE_COUNT)
+                writeVarint(out, count)
+            for actionId in actionIds:
+                writeVarint(out, actionId)
+            if withHashes:
+                out.extend(STATE_HASH.pack(self.hashes[turn]))
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        flags = data[0]
+        seed, pos = readVarint(data, 1)
+        layoutId = data[pos]
+        numAgents = data[pos + 1]
+        agents = list(data[pos + 2:pos + 2 + numAgents])
+        pos += 2 + numAgents
+        winner = data[pos] - 1
+        pos += 1
+
+        numSetup, pos = readVarint(data, pos)
+        setup = []
+        for _ in range(numSetup):
+            actionId, pos = readVarint(data, pos)
+            setup.append(actionId)
+
+        numTurns, pos = readVarint(data, pos)
+        turns = []
+        hashes = []
+        for _ in range(numTurns):
+            header = data[pos]
+            pos += 1
+            count = header & 0x0F
+            if count == ESCAPE_COUNT:
+                count, pos = readVarint(data, pos)
+            actionIds = []
+            for _ in range(count):
+                actionId, pos = readVarint(data, pos)
+                actionIds.append(actionId)
+            turns.append(((header >> 4) + 2, actionIds))
+            if flags & FLAG_STATE_HASHES:
+                hashes.append(STATE_HASH.unpack_from(data, pos)[0])
+                pos += STATE_HASH.size
+
+        return cls(seed, layoutId, agents, setup, turns, winner, hashes)
+
+
+class GameRecordWriter:
+    def __init__(self, path):
+        isNew = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not isNew:
+            checkMagic(path)
+        self.file = open(path, "ab")
+        if isNew:
+            self.file.write(MAGIC)
+
+    def write(self, record):
+        self.writeEncoded(record.encode())
+
+    def writeEncoded(self, payload):
+        self.file.write(LENGTH.pack(len(payload)))
+        self.file.write(payload)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def readGameRecords(path):
+    # Generator over the records of a log, one at a time
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game record log")
+        while True:
+            header = f.read(LENGTH.size)
+            if not header:
+                return
+            if len(header) < LENGTH.size:
+                raise ValueError(f"Truncated record length in {path}")
+            (length,) = LENGTH.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                raise ValueError(f"Truncated record in {path}")
+            yield GameRecord.decode(payload)
+
+
+def checkMagic(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game record log")
+
+
+def writeVarint(out, value):
+    if value < 0:
+        raise ValueError("Varints must be non-negative")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def readVarint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,400 @@
+"""
+Runtime instrumentation for games and agents.
+
+PhaseTimer records how long each phase of a turn takes (dice payout, seven
+handling, getAction, applyAction, ...), grouped by the type of the agent whose turn
+it is. It is off unless a Game is given one, and when on it costs one
+perf_counter call and one list append per phase.
+
+SearchStats counts the work search agents do per decision, MemoryMonitor tracks
+peak allocation per decision and GC pauses, and Tracer records a
+nested timeline of one game (turn -> decision -> search depth -> successor
+generation / evaluation) as a Chrome trace, viewable in chrome://tracing or
+Perfetto:
+
+    python profiling.py --agents 5 0 --seed 3 --sample-every 10 --output trace.json
+"""
+
+import argparse
+import functools
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import defaultdict
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sortedValues, p):
+    # Nearest-rank percentile of an already sorted sequence
+    if not sortedValues:
+        return None
+    rank = max(1, -(-len(sortedValues) * p // 100))
+    return sortedValues[rank - 1]
+
+
+class PhaseTimer:
+    # Phases nest where the engine nests them: longest_road is part of apply_action, and
+    # discard and move_robber are part of seven.
+    PHASES = ("dice_payout", "seven", "discard", "move_robber", "get_action", "apply_action",
+              "longest_road", "check_largest_army", "render", "turn")
+
+    def __init__(self):
+        self.samples = defaultdict(lambda: array('d'))  # (agent type, phase) -> seconds
+
+    def add(self, agentType, phase, seconds):
+        self.samples[(agentType, phase)].append(seconds)
+
+    def lap(self, agentType, phase, start):
+        # Records the time since start and returns now, so consecutive phases chain
+        now = time.perf_counter()
+        self.samples[(agentType, phase)].append(now - start)
+        return now
+
+    def merge(self, other):
+        for key, values in other.samples.items():
+            self.samples[key].extend(values)
+
+    def __getstate__(self):
+        # Sent back from tournament workers; the defaultdict's lambda can't be pickled
+        return {key: values.tobytes() for key, values in self.samples.items()}
+
+    def __setstate__(self, state):
+        self.__init__()
+        for key, data in state.items():
+            self.samples[key].frombytes(data)
+
+    def summary(self):
+        # {agent type: {phase: {count, total, mean, p50, p95, p99}}}, times in seconds
+        result = {}
+        for (agentType, phase), values in self.samples.items():
+            ordered = sorted(values)
+            stats = {"count": len(ordered), "total": sum(ordered), "mean": sum(ordered) / len(ordered)}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = percentile(ordered, p)
+            result.setdefault(agentType, {})[phase] = stats
+        for agentType, phases in result.items():
+            result[agentType] = {phase: phases[phase] for phase in self.PHASES if phase in phases}
+        return result
+
+    def print_summary(self):
+        print("\nPhase Timings (ms):")
+        print("=" * 78)
+        for agentType, phases in self.summary().items():
+            print(f"{agentType}:")
+            print(f"  {'phase':<20}{'count':>8}{'total':>12}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+            for phase, stats in phases.items():
+                print(f"  {phase:<20}{stats['count']:>8}{stats['total'] * 1000:>12.1f}{stats['mean'] * 1000:>9.3f}"
+                      f"{stats['p50'] * 1000:>9.3f}{stats['p95'] * 1000:>9.3f}{stats['p99'] * 1000:>9.3f}")
+        print("=" * 78)
+
+
+class SearchStats:
+    """
+    Counters a search agent keeps for its decisions. The totals accumulate over every
+    decision the agent makes (and over games, when a tournament merges them), while
+    `last` holds the numbers for the most recent decision.
+    """
+
+    COUNTERS = ("nodes_expanded", "successors_generated", "evaluations", "timeouts", "rollout_steps", "proxy_checks",
+                "proxy_hits")
+
+    def __init__(self):
+        self.decisions = 0
+        self.seconds = 0.0
+        self.max_depth = 0
+        self.nodes_expanded = 0
+        self.successors_generated = 0
+        self.evaluations = 0
+        self.timeouts = 0
+        self.rollout_steps = 0  # Random playout moves, kept apart from the search nodes they lead away from
+        self.proxy_checks = 0  # Decisions where a proxy's top-k shortlist was checked against a full ranking
+        self.proxy_hits = 0  # ... and the shortlist held the full ranking's winner
+        self.last = None
+        self.decision_depth = 0
+        self._start = None
+
+    def begin_decision(self):
+        self.decision_depth = 0
+        self._start = (time.perf_counter(), [getattr(self, name) for name in self.COUNTERS])
+
+    def reached(self, depth):
+        if depth > self.decision_depth:
+            self.decision_depth = depth
+
+    def end_decision(self):
+        startTime, startCounts = self._start
+        seconds = time.perf_counter() - startTime
+        self.decisions += 1
+        self.seconds += seconds
+        self.max_depth = max(self.max_depth, self.decision_depth)
+
+        self.last = {name: getattr(self, name) - count for name, count in zip(self.COUNTERS, startCounts)}
+        self.last["max_depth"] = self.decision_depth
+        self.last["seconds"] = seconds
+        self.last["nodes_per_sec"] = self.last["nodes_expanded"] / seconds if seconds > 0 else None
+
+    def nodes_per_sec(self):
+        return self.nodes_expanded / self.seconds if self.seconds > 0 else None
+
+    def proxy_recall(self):
+        return self.proxy_hits / self.proxy_checks if self.proxy_checks else None
+
+    def merge(self, other):
+        self.decisions += other.decisions
+        self.seconds += other.seconds
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def summary(self):
+        result = {"decisions": self.decisions, "seconds": self.seconds, "max_depth": self.max_depth}
+        for name in self.COUNTERS:
+            result[name] = getattr(self, name)
+        result["nodes_per_sec"] = self.nodes_per_sec()
+        result["proxy_recall"] = self.proxy_recall()
+        return result
+
+    def __getstate__(self):
+        # Only the totals travel back from tournament workers
+        state = self.summary()
+        del state["nodes_per_sec"]
+        del state["proxy_recall"]
+        return state
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+
+def approx_size(obj, seen=None):
+    # Deep sys.getsizeof over containers and plain objects, counting shared objects once
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approx_size(key, seen) + approx_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item, seen)
+    elif not isinstance(obj, type):
+        if hasattr(obj, "__dict__"):
+            size += approx_size(vars(obj), seen)
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(obj, name):
+                    size += approx_size(getattr(obj, name), seen)
+    return size
+
+
+def agent_memory(agent):
+    # Approximate bytes held by each of the agent's growing structures
+    sizes = {name: approx_size(structure) for name, structure in agent.memory_structures().items()}
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+class MemoryMonitor:
+    """
+    Peak bytes allocated during each decision (via tracemalloc), grouped by agent
+    type, and the time spent in garbage collection pauses. tracemalloc slows
+    allocation-heavy code down noticeably, so this is strictly opt-in.
+    """
+
+    def __init__(self):
+        self.peaks = defaultdict(lambda: array('q'))  # agent type -> peak bytes per decision
+        self.gc_pauses = array('d')
+        self.agent_bytes = {}  # agent type -> largest agent_memory total seen
+        self._base = 0
+        self._gc_start = None
+        self._tracing = False  # Whether start() turned tracemalloc on, and so stop() turns it off
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.on_gc not in gc.callbacks:
+            gc.callbacks.append(self.on_gc)
+
+    def stop(self):
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self.gc_pauses.append(time.perf_counter() - self._gc_start)
+            self._gc_start = None
+
+    def begin_decision(self):
+        tracemalloc.reset_peak()
+        self._base = tracemalloc.get_traced_memory()[0]
+
+    def end_decision(self, agentType):
+        self.peaks[agentType].append(tracemalloc.get_traced_memory()[1] - self._base)
+
+    def record_agents(self, agents):
+        for agent in agents:
+            agentType = type(agent).__name__
+            self.agent_bytes[agentType] = max(self.agent_bytes.get(agentType, 0), agent_memory(agent)["total"])
+
+    def merge(self, other):
+        for agentType, values in other.peaks.items():
+            self.peaks[agentType].extend(values)
+        self.gc_pauses.extend(other.gc_pauses)
+        for agentType, size in other.agent_bytes.items():
+            self.agent_bytes[agentType] = max(self.agent_bytes.get(agentType, 0), size)
+
+    def __getstate__(self):
+        return {"peaks": {agentType: values.tobytes() for agentType, values in self.peaks.items()},
+                "gc_pauses": self.gc_pauses.tobytes(), "agent_bytes": self.agent_bytes}
+
+    def __setstate__(self, state):
+        self.__init__()
+        for agentType, data in state["peaks"].items():
+            self.peaks[agentType].frombytes(data)
+        self.gc_pauses.frombytes(state["gc_pauses"])
+        self.agent_bytes = state["agent_bytes"]
+
+    def summary(self):
+        result = {"decision_peak_bytes": {}, "agent_bytes": dict(self.agent_bytes)}
+        for agentType, values in self.peaks.items():
+            ordered = sorted(values)
+            stats = {"count": len(ordered), "max": ordered[-1] if ordered else None}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = percentile(ordered, p)
+            result["decision_peak_bytes"][agentType] = stats
+        result["gc"] = {"pauses": len(self.gc_pauses), "total": sum(self.gc_pauses),
+                        "max": max(self.gc_pauses, default=0.0)}
+        return result
+
+    def print_summary(self):
+        summary = self.summary()
+        print("\nMemory:")
+        print("=" * 60)
+        for agentType, stats in summary["decision_peak_bytes"].items():
+            print(f"{agentType}: peak KiB per decision p50 {stats['p50'] / 1024:.1f}, p95 {stats['p95'] / 1024:.1f}, "
+                  f"p99 {stats['p99'] / 1024:.1f}, max {stats['max'] / 1024:.1f}")
+        for agentType, size in summary["agent_bytes"].items():
+            print(f"{agentType}: agent structures {size / 1024:.1f} KiB")
+        gcStats = summary["gc"]
+        print(f"GC: {gcStats['pauses']} pauses, {gcStats['total'] * 1000:.1f} ms total, {gcStats['max'] * 1000:.2f} ms max")
+        print("=" * 60)
+
+
+class Tracer:
+    """
+    Records nested spans as Chrome trace events. Turn and decision spans are always
+    kept; the spans inside a decision (search depths, successors, evaluations) are
+    only kept for every sample_every-th decision, and nothing deeper than max_depth
+    or beyond max_events is recorded, so a long search can't blow up the trace.
+    """
+
+    def __init__(self, sample_every=1, max_events=1000000, max_depth=64):
+        self.sample_every = sample_every
+        self.max_events = max_events
+        self.max_depth = max_depth
+        self.events = []  # (phase, name, category, microseconds, args)
+        self.open = []  # whether each open span was recorded
+        self.decisions = 0
+        self.detail = False  # True while inside a sampled decision
+        self.dropped = 0
+
+    def begin(self, name, cat, args=None):
+        recorded = len(self.open) < self.max_depth and len(self.events) < self.max_events
+        self.open.append(recorded)
+        if recorded:
+            self.events.append(("B", name, cat, time.perf_counter_ns() // 1000, args))
+        else:
+            self.dropped += 1
+
+    def end(self):
+        if self.open.pop():
+            self.events.append(("E", None, None, time.perf_counter_ns() // 1000, None))
+
+    def begin_decision(self, name, args=None):
+        self.decisions += 1
+        self.detail = (self.decisions - 1) % self.sample_every == 0
+        self.begin(name, "decision", args)
+
+    def end_decision(self):
+        self.end()
+        self.detail = False
+
+    def wrap(self, fn, name, cat):
+        # Wraps fn in a detail span; outside sampled decisions it costs one flag check. The wrapper
+        # keeps fn's attributes (a value function's features, delta, weights, ...), so agents take
+        # the same paths as untraced, and a batch evaluator gets a span of its own
+        @functools.wraps(fn)
+        def traced(*args, **kwargs):
+            if not self.detail:
+                return fn(*args, **kwargs)
+            self.begin(name, cat)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.end()
+        if hasattr(fn, "evaluate_batch"):
+            traced.evaluate_batch = self.wrap(fn.evaluate_batch, f"{name}_batch", cat)
+        return traced
+
+    def instrument_agent(self, agent):
+        agent.tracer = self
+        for attr, name in (("evaluationFunction", "evaluate"), ("value_fn", "evaluate"), ("rollout", "rollout")):
+            fn = getattr(agent, attr, None)
+            if fn is not None:
+                setattr(agent, attr, self.wrap(fn, name, "search"))
+
+    def write(self, path):
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "catan"}}]
+        for phase, name, cat, ts, args in self.events:
+            event = {"ph": phase, "ts": ts, "pid": pid, "tid": 0}
+            if phase == "B":
+                event["name"] = name
+                event["cat"] = cat
+                if args:
+                    event["args"] = args
+            events.append(event)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"decisions": self.decisions, "sample_every": self.sample_every,
+                                     "dropped_spans": self.dropped}}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play one headless game and write a Chrome trace of it.")
+    parser.add_argument("-a", "--agents", type=int, nargs=2, default=[5, 0], help="Agent codes for the two players.")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Game seed.")
+    parser.add_argument("-e", "--sample-every", type=int, default=1,
+                        help="Only trace inside every n-th decision (turns and decisions are always traced).")
+    parser.add_argument("-m", "--max-events", type=int, default=1000000, help="Stop recording spans past this many events.")
+    parser.add_argument("-o", "--output", default="trace.json", help="Where to write the trace.")
+    args = parser.parse_args()
+    if args.seed < 0:
+        parser.error("Seeds must be non-negative.")
+
+    from game import Game
+
+    tracer = Tracer(args.sample_every, args.max_events)
+    game = Game(playerAgentNums=args.agents, graphics=False, save_learning=False, tracer=tracer)
+    winner, points, game_time = game.play_test_game(args.seed)
+    tracer.write(args.output)
+    print(f"Winner: {winner}, score {points}, {game_time:.2f} s, {len(tracer.events)} events "
+          f"({tracer.dropped} spans dropped) written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Random-access replay of game records.
+
+A Replayer rebuilds the GameState of a recorded game at any turn. As it replays
+turns it keeps a checkpoint every SNAPSHOT_INTERVAL turns, and a seek starts from
+the latest checkpoint before its turn. The first seek to turn 400 of a long game
+replays every turn up to it; after that (or after verifyAll, which replays the
+whole game) seeking anywhere replays at most SNAPSHOT_INTERVAL turns. After every replayed turn the state hash is checked against the
+one stored in the record, and a mismatch raises ReplayDivergence.
+
+Usage:
+    python replay.py games.ctnr --game 3 --turn 400
+"""
+
+import argparse
+import copy
+
+from actionSpace import ActionSpace
+from agents import PlayerAgent
+from board import LAYOUTS
+from game import GameState
+from gameConstants import *
+from gameRecord import readGameRecords
+
+SNAPSHOT_INTERVAL = 50
+
+
+class ReplayDivergence(Exception):
+    def __init__(self, turn, expected, actual):
+        super().__init__(f"Replay diverged at turn {turn}: expected state hash {expected:#06x}, got {actual:#06x}")
+        self.turn = turn
+        self.expected = expected
+        self.actual = actual
+
+
+class RecordedSteals:
+    """
+    Stands in for the steal stream while a turn is replayed, so steals come from the
+    record rather than from the random stream (which the Q-learning agent's extra
+    steal advances in ways a replay can't reproduce).
+    """
+
+    def __init__(self):
+        self.pending = None
+
+    def choice(self, options):
+        if self.pending is not None and self.pending in options:
+            resource, self.pending = self.pending, None
+            return resource
+        # Choosing the victim; with two players there is only ever one
+        return options[0]
+
+
+class Replayer:
+    def __init__(self, record, snapshotInterval=SNAPSHOT_INTERVAL, createAgent=None, verify=True):
+        """
+        createAgent(agentCode, index) builds the player objects; by default they are
+        plain PlayerAgents, which is all a replay needs since no agent overrides how
+        actions are applied. Pass Game.createPlayer to get the recorded agent types,
+        e.g. to ask an agent what it would do at some turn.
+        """
+        self.record = record
+        self.snapshotInterval = snapshotInterval
+        self.createAgent = createAgent
+        self.verify = verify and record.hasStateHashes()
+        self.actionSpace = ActionSpace.forLayout(record.layoutId)
+        self.snapshots = {0: self.setupState()}
+
+    def __len__(self):
+        return len(self.record.turns)
+
+    def stateAt(self, turn):
+        # The state after `turn` turns have been played (0 is the state right after setup).
+        # The returned state is a copy the caller is free to modify.
+        if not 0 <= turn <= len(self):
+            raise IndexError(f"Turn {turn} is outside the recorded game (0-{len(self)})")
+        start = max(snapshotTurn for snapshotTurn in self.snapshots if snapshotTurn <= turn)
+        state = copy.deepcopy(self.snapshots[start])
+        for replayedTurn in range(start, turn):
+            self.applyTurn(state, replayedTurn)
+            if (replayedTurn + 1) % self.snapshotInterval == 0 and replayedTurn + 1 not in self.snapshots:
+                self.snapshots[replayedTurn + 1] = copy.deepcopy(state)
+        return state
+
+    def states(self):
+        # Yields (turn, state) for every turn in order, from 0 to the end of the game. It is one
+        # state updated in place, so copy it to keep it past the next step
+        state = copy.deepcopy(self.snapshots[0])
+        yield 0, state
+        for turn in range(len(self)):
+            self.applyTurn(state, turn)
+            yield turn + 1, state
+
+    def verifyAll(self):
+        # Replays the whole game, checkpointing along the way; raises ReplayDivergence on a mismatch
+        return self.stateAt(len(self))
+
+    def setupState(self):
+        state = GameState(LAYOUTS[self.record.layoutId], seed=self.record.seed)
+        for i in range(NUM_PLAYERS):
+            if self.createAgent is not None:
+                agent = self.createAgent(self.record.agents[i], i)
+            else:
+                agent = PlayerAgent(f"Player {i}", i, getColorForPlayer(i))
+            agent.rng = state.rng.agents[i]
+            state.seatPlayer(agent)
+
+        # Setup placements alternate settlement, road in the order Game.initializeBasedOnPlayerAgent uses
+        for placement, actionId in enumerate(self.record.setup):
+            agent = state.playerAgents[[0, 1, 1, 0][placement // 2]]
+            action = self.actionSpace.decode(actionId, state.board)
+            state.board.applyAction(agent.agentIndex, action)
+            if action[0] == ACTIONS.SETTLE:
+                agent.settlements.append(action[1])
+            else:
+                agent.roads.append(action[1])
+        state.distributeInitialResources()
+        return state
+
+    def applyTurn(self, state, turn):
+        # Mirrors Game.run_game_turn and Game.handle_seven_rolled
+        diceRoll, actionIds = self.record.turns[turn]
+        player = state.playerAgents[turn % NUM_PLAYERS]
+        actions = self.actionSpace.decodeAll(actionIds, state.board)
+
+        stealRNG = state.rng.steal
+        steals = state.rng.steal = RecordedSteals()
+        try:
+            if diceRoll != 7:
+                state.updatePlayerResourcesForDiceRoll(diceRoll)
+            player.dev_card_played_this_turn = False
+
+            index = 0
+            while index < len(actions):
+                kind, arg = actions[index]
+                index += 1
+                if kind == ACTIONS.DISCARD:
+                    playerIndex, resource = arg
+                    state.playerAgents[playerIndex].resources[resource] -= 1
+                    state.bank[resource] += 1
+                elif kind == ACTIONS.STEAL:
+                    # The Q-learning agent's second steal after a seven
+                    victim = state.playerAgents[1 - player.agentIndex]
+                    victim.resources[arg] -= 1
+                    player.resources[arg] += 1
+                else:
+                    movesRobber = kind == ACTIONS.MOVE_ROBBER or (kind == ACTIONS.PLAY_DEV_CARD and arg[0] == DevCardTypes.KNIGHT)
+                    if movesRobber and index < len(actions) and actions[index][0] == ACTIONS.STEAL:
+                        # The steal recorded right after a robber move is the one that move makes
+                        steals.pending = actions[index][1]
+                        index += 1
+                    if kind == ACTIONS.MOVE_ROBBER:
+                        state.move_robber_and_steal(player, arg)
+                    else:
+                        state.applyAction(player.agentIndex, (kind, arg))
+
+            state.checkLargestArmy()
+            player.endTurn()
+        finally:
+            state.rng.steal = stealRNG
+
+        if self.verify:
+            actual = state.stateHash()
+            if actual != self.record.hashes[turn]:
+                raise ReplayDivergence(turn, self.record.hashes[turn], actual)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the state of a recorded game at any turn.")
+    parser.add_argument("log", help="A game record log written by tournament.py --record.")
+    parser.add_argument("-g", "--game", type=int, default=0, help="Index of the game in the log.")
+    parser.add_argument("-t", "--turn", type=int, default=None, help="Turn to show (defaults to the end of the game).")
+    args = parser.parse_args()
+
+    record = next((record for i, record in enumerate(readGameRecords(args.log)) if i == args.game), None)
+    if record is None:
+        parser.error(f"{args.log} has no game {args.game}")
+
+    replayer = Replayer(record)
+    turn = len(replayer) if args.turn is None else args.turn
+    state = replayer.stateAt(turn)
+    print(f"{record} at turn {turn}")
+    print(f"Robber: {state.board.robber.hex}")
+    print(state.format_bank_resources())
+    for agent in state.playerAgents:
+        print(agent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Self-play training data in fixed-size, memory-mapped .npy shards.
+
+generate plays headless games across a process pool, the way tournament.py does, and
+records every decision the agents make on their own turns: the acting player's
+feature vector (see valueFeatures.py), the ActionSpace id of the action it chose, the
+legal action mask, the turn number and, once the game is over, the outcome from that
+player's side (1 for a win, 0 for a loss, 0.5 if the game hit the turn limit).
+Workers send each finished game's rows back, so only the parent process writes.
+
+A dataset is a directory of shards plus index.json. A shard is one .npy file per
+field (see shardFields) of shard_size rows each, created with np.lib.format.open_memmap
+and filled in place. The index lists the shards with the number of rows written to
+each, so a reader never sees a half-written row and generating into an existing
+dataset appends to it, topping up its last shard first. Legal masks are stored with
+np.packbits, eight actions to a byte.
+
+ShardDataset maps every shard read-only and gathers minibatches of rows picked at
+random across all of them, so only the rows drawn are ever read from disk.
+
+Usage:
+    python selfPlayData.py selfplay/ --agents 3 3 --num-games 10000 --num-workers 8
+
+    dataset = ShardDataset("selfplay/")
+    batch = dataset.sample(256, np.random.default_rng(0))
+    batch["features"], batch["legal"], batch["outcome"]
+"""
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from actionSpace import ActionSpace
+from board import BeginnerLayout, getLayoutId
+from game import Game, getStringForPlayer
+from gameConstants import *
+from valueFeatures import NUM_FEATURES, extractFeatures
+
+INDEX_NAME = "index.json"
+DEFAULT_SHARD_SIZE = 1 << 20
+NO_ACTION_ID = -1  # Actions outside the action space, such as a two-road Road Building
+DRAW_OUTCOME = 0.5
+
+
+def shardFields(numFeatures, numActions):
+    # Field name -> (dtype, shape of one row)
+    return {
+        "features": (np.float32, (numFeatures,)),
+        "action": (np.int32, ()),
+        "legal": (np.uint8, ((numActions + 7) // 8,)),
+        "outcome": (np.float32, ()),
+        "turn": (np.int32, ()),
+        "player": (np.int8, ()),
+        "seed": (np.int64, ()),
+    }
+
+
+class DecisionRecorder:
+    """
+    A Game.decision_listener that keeps one row per decision of a game. rows(winner, seed)
+    returns them as arrays once the winner is known.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.features, self.actions, self.legal, self.turns, self.players = [], [], [], [], []
+        self.mask = None
+
+    def __call__(self, gameState, agent, action):
+        actionSpace = self.game.actionSpace
+        if self.mask is None:
+            self.mask = np.zeros(len(actionSpace), dtype=bool)
+        mask = self.mask
+        mask[:] = False
+        mask[actionSpace.encode((ACTIONS.PASS, None))] = True  # A player may always end the turn
+        for legalAction in gameState.getLegalActions(agent.agentIndex):
+            try:
+                mask[actionSpace.encode(legalAction)] = True
+            except ValueError:
+                pass
+        try:
+            actionId = actionSpace.encode(action)
+        except ValueError:
+            actionId = NO_ACTION_ID
+
+        self.features.append(extractFeatures(gameState, agent.agentIndex))
+        self.actions.append(actionId)
+        self.legal.append(np.packbits(mask))
+        self.turns.append(self.game.turnNumber)
+        self.players.append(agent.agentIndex)
+
+    def rows(self, winner, seed):
+        players = np.array(self.players, dtype=np.int8)
+        if winner < 0:
+            outcome = np.full(len(players), DRAW_OUTCOME, dtype=np.float32)
+        else:
+            outcome = (players == winner).astype(np.float32)
+        return {
+            "features": np.array(self.features, dtype=np.float32).reshape(-1, NUM_FEATURES),
+            "action": np.array(self.actions, dtype=np.int32),
+            "legal": np.array(self.legal, dtype=np.uint8).reshape(len(players), -1),
+            "outcome": outcome,
+            "turn": np.array(self.turns, dtype=np.int32),
+            "player": players,
+            "seed": np.full(len(players), seed, dtype=np.int64),
+        }
+
+
+def play_game(task):
+    game_num, playerAgentNums, seed = task
+    game = Game(playerAgentNums=playerAgentNums, graphics=False, save_learning=False)
+    recorder = DecisionRecorder(game)
+    game.decision_listener = recorder
+    winner, points, game_time = game.play_test_game(seed)
+    return game_num, winner, game_time, recorder.rows(winner, seed)
+
+
+class ShardWriter:
+    def __init__(self, directory, numActions, shardSize=DEFAULT_SHARD_SIZE, numFeatures=NUM_FEATURES, layoutId=0):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        indexPath = os.path.join(directory, INDEX_NAME)
+        if os.path.exists(indexPath):
+            with open(indexPath) as f:
+                self.index = json.load(f)
+            expected = (numFeatures, numActions, layoutId)
+            found = (self.index["num_features"], self.index["num_actions"], self.index["layout"])
+            if found != expected:
+                raise ValueError(f"{directory} holds (features, actions, layout) {found}, not {expected}")
+        else:
+            self.index = {"shard_size": shardSize, "num_features": numFeatures, "num_actions": numActions,
+                          "layout": layoutId, "shards": []}
+        self.shardSize = self.index["shard_size"]
+        self.fields = shardFields(numFeatures, numActions)
+        self.arrays = None
+        shards = self.index["shards"]
+        if shards and shards[-1]["rows"] < self.shardSize:
+            self.arrays = {field: np.lib.format.open_memmap(self.path(shards[-1]["name"], field), mode="r+")
+                           for field in self.fields}
+
+    def path(self, name, field):
+        return os.path.join(self.directory, f"{name}.{field}.npy")
+
+    def __len__(self):
+        return sum(shard["rows"] for shard in self.index["shards"])
+
+    def openShard(self):
+        self.flush()
+        name = f"shard_{len(self.index['shards']):05d}"
+        self.arrays = {field: np.lib.format.open_memmap(self.path(name, field), mode="w+", dtype=dtype,
+                                                        shape=(self.shardSize, *shape))
+                       for field, (dtype, shape) in self.fields.items()}
+        self.index["shards"].append({"name": name, "rows": 0})
+
+    def append(self, rows):
+        # rows maps every field to an array with one entry per row
+        count = len(rows["action"])
+        start = 0
+        while start < count:
+            if self.arrays is None or self.index["shards"][-1]["rows"] == self.shardSize:
+                self.openShard()
+            shard = self.index["shards"][-1]
+            take = min(count - start, self.shardSize - shard["rows"])
+            for field, array in self.arrays.items():
+                array[shard["rows"]:shard["rows"] + take] = rows[field][start:start + take]
+            shard["rows"] += take
+            start += take
+
+    def flush(self):
+        # Data first, then the index that makes it visible
+        if self.arrays is not None:
+            for array in self.arrays.values():
+                array.flush()
+        indexPath = os.path.join(self.directory, INDEX_NAME)
+        with open(indexPath + ".tmp", "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(indexPath + ".tmp", indexPath)
+
+    def close(self):
+        self.flush()
+        self.arrays = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardDataset:
+    def __init__(self, directory):
+        with open(os.path.join(directory, INDEX_NAME)) as f:
+            self.index = json.load(f)
+        self.numActions = self.index["num_actions"]
+        self.fields = shardFields(self.index["num_features"], self.numActions)
+        shards = [shard for shard in self.index["shards"] if shard["rows"]]
+        self.shards = [{field: np.load(os.path.join(directory, f"{shard['name']}.{field}.npy"), mmap_mode="r")
+                        for field in self.fields} for shard in shards]
+        self.offsets = np.cumsum([0] + [shard["rows"] for shard in shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def rows(self, indices):
+        # The rows at the given dataset-wide indices, with legal masks unpacked to bools
+        indices = np.asarray(indices)
+        batch = {field: np.empty((len(indices), *shape), dtype=dtype) for field, (dtype, shape) in self.fields.items()}
+        shardIds = np.searchsorted(self.offsets, indices, side="right") - 1
+        for shardId in np.unique(shardIds):
+            selected = np.nonzero(shardIds == shardId)[0]
+            local = indices[selected] - self.offsets[shardId]
+            order = np.argsort(local)  # Read each shard front to back
+            for field, array in self.shards[shardId].items():
+                batch[field][selected[order]] = array[local[order]]
+        batch["legal"] = np.unpackbits(batch["legal"], axis=1, count=self.numActions).astype(bool)
+        return batch
+
+    def sample(self, batchSize, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.rows(rng.integers(len(self), size=batchSize))
+
+
+def generate(directory, playerAgentNums, num_games, num_workers=None, seed=0, shard_size=DEFAULT_SHARD_SIZE):
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, num_games))
+    # Headless games are all played on the default layout
+    layoutId = getLayoutId(BeginnerLayout)
+    tasks = [(game_num, playerAgentNums, seed + game_num) for game_num in range(num_games)]
+    wins = [0] * NUM_PLAYERS
+    start = time.time()
+    with ShardWriter(directory, len(ActionSpace.forLayout(layoutId)), shard_size, layoutId=layoutId) as writer:
+        initial = len(writer)
+
+        def merge(result):
+            game_num, winner, game_time, rows = result
+            writer.append(rows)
+            if winner >= 0:
+                wins[winner] += 1
+
+        if num_workers == 1:
+            for result in map(play_game, tasks):
+                merge(result)
+        else:
+            with Pool(num_workers) as pool:
+                # One game per task keeps the workers balanced, since game lengths vary a lot
+                for result in pool.imap_unordered(play_game, tasks, chunksize=1):
+                    merge(result)
+        written = len(writer) - initial
+    elapsed = time.time() - start
+    print(f"Wrote {written} decisions from {num_games} games in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f}/s) "
+          f"to {directory}; wins {wins}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate self-play training data into memory-mapped shards.")
+    parser.add_argument("directory", help="Dataset directory; generating into an existing one appends to it.")
+    parser.add_argument(
+        "-a", "--agents",
+        type=int,
+        nargs=2,
+        default=[3, 3],
+        help="Agent codes for the two players (" +
+             ", ".join(f"{code}: {getStringForPlayer(code)}" for code in range(6) if code != 1) + ")."
+    )
+    parser.add_argument("-n", "--num-games", type=int, default=NUM_TEST_GAMES, help="The number of games to play.")
+    parser.add_argument("-w", "--num-workers", type=int, default=None, help="Worker processes (defaults to all cores).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Base seed; game i is played with seed + i.")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Rows per shard (new datasets only).")
+    args = parser.parse_args()
+
+    if 1 in args.agents:
+        parser.error("The human player can't take part in self-play.")
+    if args.seed < 0:
+        parser.error("Seeds must be non-negative.")
+
+    generate(args.directory, args.agents, args.num_games, args.num_workers, args.seed, args.shard_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Non-interactive tournament runner.
+
+Plays games between two agent types (the codes used by Game.createPlayer) across a
+process pool and merges the results into the same report Game.run_test_mode prints.
+Every game gets its own seed (base seed + game number), so a game can be re-run on
+its own and workers never share a random stream. With --record, every finished game
+is appended to a binary game record log (see gameRecord.py). With --phase-timing,
+per-phase turn latencies from every worker are merged and printed with the results,
+and --memory does the same for per-decision peak allocations and GC pauses.
+
+Usage:
+    python tournament.py --agents 3 0 --num-games 200 --num-workers 8 --seed 0 --record games.ctnr
+"""
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+
+from game import Game, getStringForPlayer
+from gameRecord import GameRecordWriter
+from profiling import MemoryMonitor
+from gameConstants import *
+
+
+def play_game(task):
+    game_num, playerAgentNums, seed, phase_timing, memory_profiling = task
+    # Workers run headless and never write the Q-table pickle, since every
+    # process would be racing on the same file.
+    game = Game(playerAgentNums=playerAgentNums, graphics=False, save_learning=False, phase_timing=phase_timing,
+                memory_profiling=memory_profiling)
+    winner, points, game_time = game.play_test_game(seed)
+    return (game_num, winner, points, game_time, game.record.encode(), game.phase_timer, game.search_stats,
+            game.memory_monitor)
+
+
+def run_tournament(playerAgentNums, num_games=NUM_TEST_GAMES, num_workers=None, seed=0, record_path=None,
+                   phase_timing=False, memory_profiling=False):
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, num_games))
+
+    # The report game never plays; it only holds the agents (for their type names)
+    # and the merged results, so print_test_results works unchanged.
+    report = Game(playerAgentNums=playerAgentNums, num_test_games=num_games, graphics=False, save_learning=False,
+                  phase_timing=phase_timing)
+    report.initializePlayers()
+    if memory_profiling:
+        # Only gathers the workers' measurements; tracing this process's allocations would be wasted
+        report.memory_monitor = MemoryMonitor()
+
+    tasks = [(game_num, playerAgentNums, seed + game_num, phase_timing, memory_profiling) for game_num in range(num_games)]
+    total_time = 0
+    start_time_all = time.time()
+    # Workers send back encoded records, so only this process ever writes the log
+    writer = GameRecordWriter(record_path) if record_path else None
+
+    try:
+        if num_workers == 1:
+            for result in map(play_game, tasks):
+                total_time += merge_result(report, result, writer)
+        else:
+            with Pool(num_workers) as pool:
+                # One game per task keeps the workers balanced, since game lengths vary a lot. Results
+                # come back in game order, so game i of the run is record i of the log
+                for result in pool.imap(play_game, tasks, chunksize=1):
+                    total_time += merge_result(report, result, writer)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    total_time_all = time.time() - start_time_all
+    report.print_test_results(total_time, total_time_all)
+    return report
+
+
+def merge_result(report, result, writer=None):
+    game_num, winner, points, game_time, record, phase_timer, search_stats, memory_monitor = result
+    report.record_test_result(game_num, winner, points, game_time)
+    for total, stats in zip(report.search_stats, search_stats):
+        total.merge(stats)
+    if phase_timer is not None:
+        report.phase_timer.merge(phase_timer)
+    if memory_monitor is not None:
+        report.memory_monitor.merge(memory_monitor)
+    if writer is not None:
+        writer.writeEncoded(record)
+    return game_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parallel tournament between two agents.")
+    parser.add_argument(
+        "-a", "--agents",
+        type=int,
+        nargs=2,
+        default=DEFAULT_PLAYER_ARRAY,
+        help="Agent codes for the two players (" +
+             ", ".join(f"{code}: {getStringForPlayer(code)}" for code in range(6) if code != 1) + ")."
+    )
+    parser.add_argument("-n", "--num-games", type=int, default=NUM_TEST_GAMES, help="The number of games to play.")
+    parser.add_argument("-w", "--num-workers", type=int, default=None, help="Worker processes (defaults to all cores).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Base seed; game i is played with seed + i.")
+    parser.add_argument("-r", "--record", default=None, help="Append a binary record of every game to this log file.")
+    parser.add_argument("-p", "--phase-timing", action="store_true", help="Time each phase of every turn and report percentiles.")
+    parser.add_argument("-m", "--memory", action="store_true",
+                        help="Track peak allocation per decision, agent structure sizes and GC pauses.")
+    args = parser.parse_args()
+
+    if 1 in args.agents:
+        parser.error("The human player can't take part in a tournament.")
+    if args.seed < 0:
+        parser.error("Seeds must be non-negative.")
+
+    run_tournament(args.agents, args.num_games, args.num_workers, args.seed, args.record, args.phase_timing, args.memory)
+
+
+if __name__ == "__main__":
+    main()
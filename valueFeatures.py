@@ -0,0 +1,496 @@
+"""
+Fixed-schema feature vectors for the linear value functions (base_fn, contender_fn).
+
+FEATURES declares every term base_fn weighs, in order, and each name's position in
+it is its index in a feature vector. Extractors write their group of terms straight
+into a preallocated float array. weightVector turns a params dict such as
+DEFAULT_WEIGHTS into a vector aligned with FEATURES, so a state's value is one dot
+product and the values of many states are one matrix-vector product.
+
+Two terms are not plain weight * feature in the params dicts. The longest road
+length only counts at params["longest_road"] when the player has no buildable
+nodes left, and at a flat 0.1 otherwise, so it is split into LONGEST_ROAD and
+LONGEST_ROAD_OPEN, with the raw length kept in LONGEST_ROAD_LENGTH at weight 0.
+The discard penalty is an indicator, so params["discard_penalty"] is its weight.
+
+Usage:
+    weights = weightVector(DEFAULT_WEIGHTS)
+    features = extractFeatures(gameState, playerIndex)
+    value = float(features @ weights)
+
+    # Successors of one state: recompute only what each action touches
+    rows = np.stack([featureDelta(features, successor, playerIndex, action) for ...])
+    values = rows @ weights
+
+Extraction is driven by FEATURE_GROUPS, a small dependency graph of extractors, the
+features each one affects and the groups it needs first. featurePlan(weights) keeps
+only the groups that affect a nonzero weight, so DEFAULT_WEIGHTS never pays for the
+level-0 reachability count. rankLexicographic goes through the plan one group at a
+time, from the largest weight down, and drops candidates that can no longer win.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from gameConstants import *
+
+REACHABILITY_DEPTH = 2
+LONGEST_ROAD_OPEN_WEIGHT = 0.1
+
+FEATURES = [
+    "public_vps",
+    "production",
+    "enemy_production",
+    "num_tiles",
+    "reachable_production_0",
+    "reachable_production_1",
+    "buildable_nodes",
+    "longest_road",
+    "longest_road_open",
+    "longest_road_length",
+    "hand_synergy",
+    "hand_resources",
+    "discard_penalty",
+    "hand_devs",
+    "army_size",
+]
+NUM_FEATURES = len(FEATURES)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+
+PUBLIC_VPS = FEATURE_INDEX["public_vps"]
+PRODUCTION = FEATURE_INDEX["production"]
+ENEMY_PRODUCTION = FEATURE_INDEX["enemy_production"]
+NUM_TILES = FEATURE_INDEX["num_tiles"]
+REACHABLE_PRODUCTION_0 = FEATURE_INDEX["reachable_production_0"]
+REACHABLE_PRODUCTION_1 = FEATURE_INDEX["reachable_production_1"]
+BUILDABLE_NODES = FEATURE_INDEX["buildable_nodes"]
+LONGEST_ROAD = FEATURE_INDEX["longest_road"]
+LONGEST_ROAD_OPEN = FEATURE_INDEX["longest_road_open"]
+LONGEST_ROAD_LENGTH = FEATURE_INDEX["longest_road_length"]
+HAND_SYNERGY = FEATURE_INDEX["hand_synergy"]
+HAND_RESOURCES = FEATURE_INDEX["hand_resources"]
+DISCARD_PENALTY = FEATURE_INDEX["discard_penalty"]
+HAND_DEVS = FEATURE_INDEX["hand_devs"]
+ARMY_SIZE = FEATURE_INDEX["army_size"]
+
+# Terms whose weight is fixed rather than read from the params dict
+FIXED_WEIGHTS = {"longest_road_open": LONGEST_ROAD_OPEN_WEIGHT, "longest_road_length": 0.0}
+
+
+def weightVector(params):
+    return np.array([FIXED_WEIGHTS[name] if name in FIXED_WEIGHTS else params[name] for name in FEATURES],
+                    dtype=np.float64)
+
+
+def vpsFeatures(gameState, playerIndex, out):
+    out[PUBLIC_VPS] = gameState.playerAgents[playerIndex].victoryPoints
+
+
+def productionFeatures(gameState, playerIndex, out):
+    out[PRODUCTION] = sum(gameState.board.productionArray(playerIndex))
+    out[ENEMY_PRODUCTION] = sum(gameState.board.productionArray(1 - playerIndex))
+
+
+def tileFeatures(gameState, playerIndex, out):
+    # blockability
+    out[NUM_TILES] = gameState.board.getNumTiles(playerIndex)
+    out[BUILDABLE_NODES] = gameState.board.getNumBuildableTiles(playerIndex)
+
+
+def roadFeatures(gameState, playerIndex, out):
+    out[LONGEST_ROAD_LENGTH] = gameState.board.calculateLongestRoad(playerIndex)
+
+
+def reachabilityZeroFeatures(gameState, playerIndex, out):
+    levels = gameState.board.reachabilityArrays(1, (playerIndex,))[0]
+    out[REACHABLE_PRODUCTION_0] = sum(levels[0])
+
+
+def reachabilityFeatures(gameState, playerIndex, out):
+    levels = gameState.board.reachabilityArrays(REACHABILITY_DEPTH, (playerIndex,))[0]
+    out[REACHABLE_PRODUCTION_1] = sum(levels[1])
+
+
+def handSynergy(hand):
+    distance_to_city = (
+        max(2 - hand[ResourceTypes.GRAIN], 0)
+        + max(3 - hand[ResourceTypes.ORE], 0)
+    ) / 5.0  # 0 means good. 1 means bad.
+    distance_to_settlement = (
+        max(1 - hand[ResourceTypes.GRAIN], 0)
+        + max(1 - hand[ResourceTypes.WOOL], 0)
+        + max(1 - hand[ResourceTypes.BRICK], 0)
+        + max(1 - hand[ResourceTypes.LUMBER], 0)
+    ) / 4.0  # 0 means good. 1 means bad.
+    return (2 - distance_to_city - distance_to_settlement) / 2
+
+
+def handFeatures(gameState, playerIndex, out):
+    player = gameState.playerAgents[playerIndex]
+    hand = player.resources
+    out[HAND_SYNERGY] = handSynergy(hand)
+    num_in_hand = sum(hand)
+    out[HAND_RESOURCES] = num_in_hand
+    out[DISCARD_PENALTY] = 1 if num_in_hand > 7 else 0
+    out[HAND_DEVS] = player.num_dev_cards()
+    out[ARMY_SIZE] = player.played_dev_cards[DevCardTypes.KNIGHT]
+
+
+def splitLongestRoad(out):
+    # The longest road only earns its full weight once there is nowhere left to build
+    blocked = out[BUILDABLE_NODES] == 0
+    out[LONGEST_ROAD] = out[LONGEST_ROAD_LENGTH] if blocked else 0
+    out[LONGEST_ROAD_OPEN] = 0 if blocked else out[LONGEST_ROAD_LENGTH]
+
+
+FeatureGroup = namedtuple("FeatureGroup", ["extract", "affects", "requires"])
+
+# The dependency graph: which features each extractor can change and which groups must run
+# before it. tiles affects the longest road terms too, through splitLongestRoad
+FEATURE_GROUPS = {
+    "vps": FeatureGroup(vpsFeatures, ("public_vps",), ()),
+    "production": FeatureGroup(productionFeatures, ("production", "enemy_production"), ()),
+    "tiles": FeatureGroup(tileFeatures, ("num_tiles", "buildable_nodes", "longest_road", "longest_road_open"), ()),
+    "roads": FeatureGroup(roadFeatures, ("longest_road", "longest_road_open", "longest_road_length"), ("tiles",)),
+    "reachability0": FeatureGroup(reachabilityZeroFeatures, ("reachable_production_0",), ()),
+    "reachability": FeatureGroup(reachabilityFeatures, ("reachable_production_1",), ()),
+    "hand": FeatureGroup(handFeatures, ("hand_synergy", "hand_resources", "discard_penalty", "hand_devs", "army_size"), ()),
+}
+
+# The feature groups each one-ply action can change; anything not listed is recomputed in full
+ACTION_FEATURE_GROUPS = {
+    ACTIONS.TRADE: ("hand",),
+    ACTIONS.ROAD: ("hand", "roads", "reachability"),
+    ACTIONS.SETTLE: ("hand", "vps", "production", "tiles", "reachability0", "reachability"),
+    ACTIONS.CITY: ("hand", "vps", "production", "reachability0", "reachability"),
+}
+
+# Generous bounds on each feature's value over a two-player game. Every feature lies in
+# [0, bound], so they also bound how far a feature not yet computed can move a value
+FEATURE_BOUNDS = {
+    "public_vps": 20,
+    "production": 60,
+    "enemy_production": 60,
+    "num_tiles": 60,
+    "reachable_production_0": 200,
+    "reachable_production_1": 200,
+    "buildable_nodes": 60,
+    "longest_road": 20,
+    "longest_road_open": 20,
+    "longest_road_length": 20,
+    "hand_synergy": 1,
+    "hand_resources": 95,
+    "discard_penalty": 1,
+    "hand_devs": 25,
+    "army_size": 14,
+}
+
+
+def featurePlan(weights):
+    """
+    The groups worth extracting under weights, in an order that respects requires: every group
+    that affects a feature with a nonzero weight, plus what those groups require.
+    Groups are ordered by the largest weight they affect, so the plan is also the order in
+    which lexicographic ranking computes them.
+    """
+    def magnitude(group):
+        return max(abs(weights[FEATURE_INDEX[name]]) for name in FEATURE_GROUPS[group].affects)
+
+    plan = []
+    def visit(group):
+        if group not in plan:
+            for required in FEATURE_GROUPS[group].requires:
+                visit(required)
+            plan.append(group)
+
+    for group in sorted(FEATURE_GROUPS, key=magnitude, reverse=True):
+        if magnitude(group) != 0:
+            visit(group)
+    return tuple(plan)
+
+
+def groupBound(group, weights):
+    return sum(abs(weights[FEATURE_INDEX[name]]) * FEATURE_BOUNDS[name] for name in FEATURE_GROUPS[group].affects)
+
+
+def extractFeatures(gameState, playerIndex, out=None, plan=None):
+    # With a plan, the features of the groups it leaves out are 0, whatever out held before
+    if out is None:
+        out = np.zeros(NUM_FEATURES)
+    elif plan is not None:
+        out[:] = 0
+    return extractGroups(gameState, playerIndex, out, plan if plan is not None else FEATURE_GROUPS)
+
+
+def extractGroups(gameState, playerIndex, out, groups):
+    # Recomputes only groups in out, keeping the rest of its features
+    for group in groups:
+        FEATURE_GROUPS[group].extract(gameState, playerIndex, out)
+    splitLongestRoad(out)
+    return out
+
+
+def actionGroups(action, plan=None):
+    # The plan's groups that action can change, or None if the successor needs a full extraction
+    groups = ACTION_FEATURE_GROUPS.get(action[0])
+    if groups is None or plan is None:
+        return groups
+    return tuple(group for group in plan if group in groups)
+
+
+def featureDelta(rootFeatures, successor, playerIndex, action, out=None, plan=None):
+    """
+    Features of successor, the state reached from a root by action, given the root's features.
+    Only the groups ACTION_FEATURE_GROUPS lists for the action are recomputed.
+    """
+    groups = actionGroups(action, plan)
+    if groups is None:
+        return extractFeatures(successor, playerIndex, out, plan)
+    if out is None:
+        out = rootFeatures.copy()
+    else:
+        out[:] = rootFeatures
+    return extractGroups(successor, playerIndex, out, groups)
+
+
+def rankLexicographic(rootFeatures, successors, playerIndex, actions, weights, plan):
+    """
+    Index and value of the best successor, computing feature groups in plan order and dropping a
+    candidate as soon as its largest possible value (its partial value plus the bounds of the
+    groups it still has to compute) falls below some other candidate's smallest possible value.
+    With weights that differ by orders of magnitude most candidates drop out after the first
+    group or two. The result is the same as ranking the full feature vectors.
+    """
+    rows = np.empty((len(actions), NUM_FEATURES))
+    pending = []
+    for row, action in zip(rows, actions):
+        groups = actionGroups(action, plan)
+        if groups is None:
+            row[:] = 0
+            pending.append(list(plan))
+        else:
+            row[:] = rootFeatures
+            pending.append(list(groups))
+    bounds = {group: groupBound(group, weights) for group in plan}
+
+    alive = list(range(len(actions)))
+    for group in plan:
+        for i in alive:
+            if pending[i] and pending[i][0] == group:
+                FEATURE_GROUPS[group].extract(successors[i], playerIndex, rows[i])
+                splitLongestRoad(rows[i])
+                pending[i].pop(0)
+        if len(alive) == 1:
+            continue
+        partial = rows[alive] @ weights
+        slack = np.array([sum(bounds[g] for g in pending[i]) for i in alive])
+        floor = np.max(partial - slack)
+        alive = [i for i, keep in zip(alive, partial + slack >= floor) if keep]
+
+    # Same product shape as ranking every row at once, so the winner's value comes out bit for bit the same
+    values = rows @ weights
+    best = max(alive, key=lambda i: (values[i], -i))
+    return best, float(values[best])
+
+
+# Ways to roll each total with two dice; a hex's share of production is its pips out of 36
+DICE_PIPS = {2: 1, 3: 2, 4: 3, 5: 4, 6: 5, 8: 5, 9: 4, 10: 3, 11: 2, 12: 1}
+MAX_PIPS = 5
+
+
+def proxyScore(gameState, playerIndex, action, weights):
+    """
+    O(1) stand-in for an action's value, for picking which successors get a full evaluation:
+    the VP change, the production change as pip-weighted hexes (a 6 or 8 counts 1, a 2 or 12
+    counts 0.2), the producing hexes next to open spots a road reaches, and the change in
+    cards in hand and in hand synergy, each at its weight in weights.
+    """
+    board = gameState.board
+    kind = action[0]
+    vps = production = reach = hand = synergy = devs = army = 0
+    if kind == ACTIONS.SETTLE or kind == ACTIONS.CITY:
+        vps = 1
+        vertex = board.getVertex(action[1].X, action[1].Y)
+        production = sum(DICE_PIPS.get(hexagon.diceValue, 0) for hexagon in board.getHexes(vertex)
+                         if hexagon.resource != ResourceTypes.NOTHING) / MAX_PIPS
+        hand = -sum(SETTLEMENT_COST if kind == ACTIONS.SETTLE else CITY_COST)
+    elif kind == ACTIONS.ROAD:
+        for vertex in board.getVertexEnds(board.getEdge(action[1].X, action[1].Y)):
+            if vertex.canSettle:
+                reach += sum(1 for hexagon in board.getHexes(vertex) if hexagon.resource != ResourceTypes.NOTHING)
+        hand = -sum(ROAD_COST)
+    elif kind == ACTIONS.TRADE:
+        give_resource, get_resource = action[1]
+        before = gameState.players[playerIndex].resources
+        after = before[:]
+        after[give_resource] -= 4
+        after[get_resource] += 1
+        synergy = handSynergy(after) - handSynergy(before)
+        hand = -3
+    elif kind == ACTIONS.BUY_DEV_CARD:
+        hand = -sum(DEV_CARD_COST)
+        devs = 1
+    elif kind == ACTIONS.PLAY_DEV_CARD:
+        card_type, card_action = action[1]
+        devs = -1
+        if card_type == DevCardTypes.KNIGHT:
+            army = 1
+            # The steal: a card, if an opponent with cards has a building on the robber's new hex
+            hand = int(any(vertex.player is not None and vertex.player != playerIndex
+                           and sum(gameState.players[vertex.player].resources) > 0
+                           for vertex in board.getVertices(card_action)))
+        elif card_type == DevCardTypes.YEAR_OF_PLENTY:
+            hand = len(card_action)
+        elif card_type == DevCardTypes.MONOPOLY:
+            hand = sum(player.resources[card_action] for player in gameState.players if player.agentIndex != playerIndex)
+    return (vps * weights[PUBLIC_VPS] + production * weights[PRODUCTION] + reach * weights[REACHABLE_PRODUCTION_1]
+            + hand * weights[HAND_RESOURCES] + synergy * weights[HAND_SYNERGY]
+            + devs * weights[HAND_DEVS] + army * weights[ARMY_SIZE])
+
+
+
+# What each group writes itself; the split longest road terms are derived afterwards
+SPLIT_FEATURES = ("longest_road", "longest_road_open")
+GROUP_WRITES = {group: [FEATURE_INDEX[name] for name in spec.affects if name not in SPLIT_FEATURES]
+                for group, spec in FEATURE_GROUPS.items()}
+# Groups that read only the board, so their results hold for as long as the board does
+BOARD_GROUPS = ("production", "tiles", "roads", "reachability0", "reachability")
+# and the groups that read only the players
+PLAYER_GROUPS = tuple(group for group in FEATURE_GROUPS if group not in BOARD_GROUPS)
+# Board groups whose change from the root depends only on the board within this many vertex hops
+# of the vertices the action builds on (a settlement or city's vertex, a road's two ends).
+# Level-1 reachability only expands the player's last building in board order, so it is local
+# only for roads, and only while the player's own buildings stay the same
+LOCAL_GROUPS = {"production": 0, "tiles": 1, "reachability0": 0, "reachability": 0}
+BOARD_ACTIONS = (ACTIONS.SETTLE, ACTIONS.ROAD, ACTIONS.CITY)
+
+
+def boardSignature(board):
+    return (frozenset((v.X, v.Y, v.player) for v in board.allSettlements),
+            frozenset((v.X, v.Y, v.player) for v in board.allCities),
+            frozenset((e.X, e.Y, e.player) for e in board.allRoads))
+
+
+class FeatureCache:
+    """
+    Per-action feature deltas carried from one decision to the next, so an agent that acts
+    several times in a turn only re-extracts what its last action invalidated.
+
+    For each build action it keeps how far each board group moved the features away from the
+    root's. While the board is unchanged (after a trade, a dev card or an opponent's turn
+    without builds) every one of those still holds. After a build, a LOCAL_GROUPS delta is
+    kept if no vertex the build touched lies within the group's radius of the action; the
+    longest road is not local and is always re-extracted. Hand and VP terms are always
+    recomputed; they are cheap and change with every action.
+    """
+
+    def __init__(self):
+        self.playerIndex = None
+        self.signature = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def actionVertices(board, key):
+        kind, X, Y = key
+        if kind == ACTIONS.ROAD:
+            return board.getVertexEnds(board.getEdge(X, Y))
+        return (board.getVertex(X, Y),)
+
+    @staticmethod
+    def within(board, vertices, radius):
+        # Locations of vertices and of everything up to radius hops from them
+        ring = list(vertices)
+        seen = {(v.X, v.Y) for v in ring}
+        for _ in range(radius):
+            ring = [n for v in ring for n in board.getNeighborVertices(v) if (n.X, n.Y) not in seen]
+            seen.update((n.X, n.Y) for n in ring)
+        return seen
+
+    def invalidate(self, board, signature):
+        # A vertex is touched if its building or canSettle changed, or a road to it was built
+        touched = set()
+        ownBuildingsChanged = False
+        for X, Y, player in (signature[0] ^ self.signature[0]) | (signature[1] ^ self.signature[1]):
+            touched |= self.within(board, (board.getVertex(X, Y),), 1)
+            ownBuildingsChanged |= player == self.playerIndex
+        for X, Y, _ in signature[2] ^ self.signature[2]:
+            touched |= self.within(board, board.getVertexEnds(board.getEdge(X, Y)), 0)
+
+        entries = {}
+        for key, deltas in self.entries.items():
+            vertices = self.actionVertices(board, key)
+            kept = {group: delta for group, delta in deltas.items()
+                    if group in LOCAL_GROUPS and not touched & self.within(board, vertices, LOCAL_GROUPS[group])
+                    and (group != "reachability" or (key[0] == ACTIONS.ROAD and not ownBuildingsChanged))}
+            if kept:
+                entries[key] = kept
+        self.entries = entries
+
+    def fill(self, state, playerIndex, actions, rootFeatures, plan, rows):
+        # rows[i] = features of actions[i]'s successor, as featureDelta would compute them
+        signature = boardSignature(state.board)
+        if playerIndex != self.playerIndex:
+            self.playerIndex = playerIndex
+            self.entries = {}
+        elif signature != self.signature and self.entries:
+            self.invalidate(state.board, signature)
+        self.signature = signature
+
+        # Entries outlive the decisions where their action isn't affordable; there is at most one per board spot
+        entries = self.entries
+        for row, action in zip(rows, actions):
+            successor = state.successorView(playerIndex, action)
+            groups = actionGroups(action, plan)
+            if groups is None:
+                extractFeatures(successor, playerIndex, row, plan)
+                continue
+            row[:] = rootFeatures
+            key = (action[0], action[1].X, action[1].Y) if action[0] in BOARD_ACTIONS else None
+            deltas = self.entries.get(key, {}) if key else {}
+            for group in groups:
+                writes = GROUP_WRITES[group]
+                if group in deltas:
+                    row[writes] += deltas[group]
+                    self.hits += 1
+                    continue
+                FEATURE_GROUPS[group].extract(successor, playerIndex, row)
+                if key and group in BOARD_GROUPS:
+                    deltas[group] = row[writes] - rootFeatures[writes]
+                    self.misses += 1
+            splitLongestRoad(row)
+            if key:
+                entries[key] = deltas
+        return rows
+
+
+
+class LeafBatch:
+    """
+    Leaf states from a search frontier, valued together. add() extracts a leaf's features into
+    the next row of a growing matrix and hands back its slot; evaluate() values every row with
+    one call to the value function's evaluate_batch (a matmul for base_fn-style weights, a
+    forward pass for a network) and returns the values indexed by slot.
+    """
+
+    def __init__(self, value_fn, playerIndex, capacity=256):
+        self.value_fn = value_fn
+        self.playerIndex = playerIndex
+        self.rows = np.zeros((capacity, NUM_FEATURES))
+        self.size = 0
+
+    def add(self, state):
+        if self.size == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.zeros_like(self.rows)])
+        self.value_fn.features(state, self.playerIndex, self.rows[self.size])
+        self.size += 1
+        return self.size - 1
+
+    def evaluate(self):
+        return self.value_fn.evaluate_batch(self.rows[:self.size])
+
+
+def supportsBatching(value_fn):
+    return hasattr(value_fn, "evaluate_batch") and hasattr(value_fn, "features")
@@ -0,0 +1,280 @@
+"""
+A small multilayer-perceptron value function in plain NumPy.
+
+MLPValueNet maps a feature vector (see valueFeatures.py) to the probability that the
+player it was extracted for goes on to win the game. Hidden layers are ReLUs and the
+output is a sigmoid. Inputs are standardized with the mean and spread of the training
+set, which are saved with the weights. fit trains on (features, outcome) pairs by
+minibatch SGD with momentum or Adam on the cross-entropy loss, and save/load keep the
+whole net in one .npz file.
+
+mlp_fn wraps a net as a value function with the attributes base_fn has (features, delta,
+evaluate_batch), so ValueFunctionPlayer values all the candidate successors of a state
+with one forward pass and the expectimax agents batch their leaves through it. Select it
+with get_value_fn("mlp_fn", "value_net.npz").
+
+outcomeDataset replays a game record log (see replay.py) and, after every turn, extracts
+both players' feature vectors, labelled 1 for the player who won the game and 0 for the other.
+
+Usage:
+    python tournament.py --agents 3 0 --num-games 500 --record games.ctnr
+    python valueNet.py games.ctnr --out value_net.npz --hidden 32 32 --epochs 20
+"""
+
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from gameConstants import *
+from gameRecord import readGameRecords
+from valueFeatures import NUM_FEATURES, PLAYER_GROUPS, boardSignature, extractFeatures, extractGroups, featureDelta
+
+DEFAULT_HIDDEN = (32, 32)
+OPTIMIZERS = ("adam", "sgd")
+ADAM_BETAS = (0.9, 0.999)
+ADAM_EPSILON = 1e-8
+SGD_MOMENTUM = 0.9
+
+
+def sigmoid(x):
+    # Written with tanh so large logits don't overflow exp
+    return 0.5 * (1 + np.tanh(0.5 * x))
+
+
+class MLPValueNet:
+    def __init__(self, sizes, seed=0):
+        # sizes runs from the input width to the single output, e.g. (NUM_FEATURES, 32, 32, 1)
+        self.sizes = tuple(int(size) for size in sizes)
+        if self.sizes[-1] != 1:
+            raise ValueError(f"An MLPValueNet has one output, not {self.sizes[-1]}")
+        rng = np.random.default_rng(seed)
+        self.weights = [rng.normal(0, np.sqrt(2 / fanIn), (fanIn, fanOut))
+                        for fanIn, fanOut in zip(self.sizes, self.sizes[1:])]
+        self.biases = [np.zeros(fanOut) for fanOut in self.sizes[1:]]
+        self.mean = np.zeros(self.sizes[0])
+        self.scale = np.ones(self.sizes[0])
+
+    def __repr__(self):
+        return f"MLPValueNet({'-'.join(map(str, self.sizes))})"
+
+    def parameters(self):
+        return self.weights + self.biases
+
+    def normalizeFor(self, X):
+        # Constant features are only centred
+        self.mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        self.scale = 1 / np.where(std > 0, std, 1)
+
+    def forward(self, X, inputs=None):
+        # Output logits for the rows of X (or for a single vector). If inputs is a list, the input
+        # to every layer is appended to it for backpropagation
+        h = (X - self.mean) * self.scale
+        last = len(self.weights) - 1
+        for layer, (W, b) in enumerate(zip(self.weights, self.biases)):
+            if inputs is not None:
+                inputs.append(h)
+            h = h @ W + b
+            if layer < last:
+                h = np.maximum(h, 0)
+        return h[..., 0]
+
+    def predict(self, X):
+        return sigmoid(self.forward(X))
+
+    def loss(self, X, y):
+        # Mean cross-entropy of the predicted win probabilities against outcomes y
+        logits = self.forward(X)
+        return float(np.mean(np.logaddexp(0, logits) - y * logits))
+
+    def gradients(self, X, y):
+        inputs = []
+        logits = self.forward(X, inputs)
+        delta = ((sigmoid(logits) - y) / len(X))[:, None]
+        gradW = [None] * len(self.weights)
+        gradb = [None] * len(self.biases)
+        for layer in reversed(range(len(self.weights))):
+            gradW[layer] = inputs[layer].T @ delta
+            gradb[layer] = delta.sum(axis=0)
+            if layer > 0:
+                delta = (delta @ self.weights[layer].T) * (inputs[layer] > 0)
+        return gradW + gradb, float(np.mean(np.logaddexp(0, logits) - y * logits))
+
+    def fit(self, X, y, epochs=10, batchSize=256, learningRate=1e-3, optimizer="adam", weightDecay=0.0, seed=0,
+            normalize=True, onEpoch=None):
+        """
+        Trains on feature rows X and outcomes y in [0, 1] and returns the mean training loss of
+        every epoch. onEpoch(epoch, loss) is called after each one.
+        """
+        if optimizer not in OPTIMIZERS:
+            raise ValueError(f"Unknown optimizer {optimizer!r}, expected one of {OPTIMIZERS}")
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if normalize:
+            self.normalizeFor(X)
+        rng = np.random.default_rng(seed)
+        params = self.parameters()
+        first = [np.zeros_like(p) for p in params]  # Adam's first moment, or the SGD velocity
+        second = [np.zeros_like(p) for p in params]
+        beta1, beta2 = ADAM_BETAS
+        step = 0
+        history = []
+        for epoch in range(epochs):
+            order = rng.permutation(len(X))
+            total = 0.0
+            for start in range(0, len(X), batchSize):
+                batch = order[start:start + batchSize]
+                grads, batchLoss = self.gradients(X[batch], y[batch])
+                total += batchLoss * len(batch)
+                step += 1
+                for p, g, m, v in zip(params, grads, first, second):
+                    if weightDecay and p.ndim == 2:
+                        g = g + weightDecay * p
+                    if optimizer == "adam":
+                        m *= beta1
+                        m += (1 - beta1) * g
+                        v *= beta2
+                        v += (1 - beta2) * g * g
+                        p -= learningRate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + ADAM_EPSILON)
+                    else:
+                        m *= SGD_MOMENTUM
+                        m -= learningRate * g
+                        p += m
+            history.append(total / max(len(X), 1))
+            if onEpoch is not None:
+                onEpoch(epoch, history[-1])
+        return history
+
+    def save(self, path):
+        arrays = {f"W{layer}": W for layer, W in enumerate(self.weights)}
+        arrays.update({f"b{layer}": b for layer, b in enumerate(self.biases)})
+        np.savez(path, sizes=np.array(self.sizes), mean=self.mean, scale=self.scale, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            net = cls(data["sizes"])
+            net.weights = [data[f"W{layer}"] for layer in range(len(net.weights))]
+            net.biases = [data[f"b{layer}"] for layer in range(len(net.biases))]
+            net.mean = data["mean"]
+            net.scale = data["scale"]
+        return net
+
+
+def mlp_fn(net):
+    # net is an MLPValueNet or the path of one saved with MLPValueNet.save
+    if not isinstance(net, MLPValueNet):
+        net = MLPValueNet.load(net)
+
+    def fn(currentGameState, currentPlayerIndex):
+        return float(net.predict(extractFeatures(currentGameState, currentPlayerIndex)))
+
+    # A net reads every feature, so there is no plan to narrow extraction to and no weights to rank by
+    fn.net = net
+    fn.plan = None
+    fn.features = lambda gameState, playerIndex, out=None: extractFeatures(gameState, playerIndex, out)
+    fn.delta = lambda root, successor, playerIndex, action, out=None: featureDelta(root, successor, playerIndex, action, out)
+    fn.evaluate_batch = net.predict
+    return fn
+
+
+def recordPositions(record):
+    """
+    Feature rows of every position of a recorded game, shaped (turns + 1, NUM_PLAYERS, NUM_FEATURES):
+    the state after setup and after each turn, from each player's side.
+    """
+    from replay import Replayer
+
+    replayer = Replayer(record)
+    positions = np.empty((len(replayer) + 1, NUM_PLAYERS, NUM_FEATURES))
+    signature = None
+    for turn, state in replayer.states():
+        # Most turns build nothing, and then the board terms are the previous turn's
+        previous, signature = signature, boardSignature(state.board)
+        for playerIndex in range(NUM_PLAYERS):
+            if signature == previous:
+                positions[turn, playerIndex] = positions[turn - 1, playerIndex]
+                extractGroups(state, playerIndex, positions[turn, playerIndex], PLAYER_GROUPS)
+            else:
+                extractFeatures(state, playerIndex, positions[turn, playerIndex])
+    return positions
+
+
+def replayGame(task):
+    gameNum, record = task
+    return gameNum, record.winner, recordPositions(record)
+
+
+def replayPositions(path, maxGames=None, numWorkers=1):
+    """
+    Yields (index in the log, winner, recordPositions) for every finished game among the first
+    maxGames of the log at path, in log order. With numWorkers > 1 the replays run in a process pool.
+    """
+    def finished():
+        for gameNum, record in enumerate(readGameRecords(path)):
+            if maxGames is not None and gameNum >= maxGames:
+                break
+            if record.winner >= 0:
+                yield gameNum, record
+
+    if numWorkers <= 1:
+        yield from map(replayGame, finished())
+    else:
+        with Pool(numWorkers) as pool:
+            yield from pool.imap(replayGame, finished(), chunksize=4)
+
+
+def outcomeDataset(path, maxGames=None, numWorkers=1):
+    """
+    (X, y, games) from the game record log at path: the feature rows of both players after every
+    turn of every finished game, whether that player won, and the index of the game in the log
+    (so a validation split can hold out whole games).
+    """
+    rows, outcomes, games = [], [], []
+    for gameNum, winner, positions in replayPositions(path, maxGames, numWorkers):
+        rows.append(positions.reshape(-1, NUM_FEATURES))
+        outcomes.append(np.tile(np.arange(NUM_PLAYERS) == winner, len(positions)).astype(float))
+        games.append(np.full(len(rows[-1]), gameNum))
+    if not rows:
+        return np.empty((0, NUM_FEATURES)), np.empty(0), np.empty(0, dtype=int)
+    return np.concatenate(rows), np.concatenate(outcomes), np.concatenate(games)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train an MLP value function on the outcomes of recorded games.")
+    parser.add_argument("log", help="A game record log written by tournament.py --record.")
+    parser.add_argument("-o", "--out", default="value_net.npz", help="Where to save the trained net.")
+    parser.add_argument("--hidden", type=int, nargs="+", default=list(DEFAULT_HIDDEN), help="Hidden layer widths.")
+    parser.add_argument("-e", "--epochs", type=int, default=20)
+    parser.add_argument("-b", "--batch-size", type=int, default=256)
+    parser.add_argument("-l", "--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--optimizer", choices=OPTIMIZERS, default="adam")
+    parser.add_argument("--weight-decay", type=float, default=0.0)
+    parser.add_argument("--validation", type=float, default=0.1, help="Fraction of games held out to report loss on.")
+    parser.add_argument("-g", "--max-games", type=int, default=None, help="Only read this many games from the log.")
+    parser.add_argument("-w", "--num-workers", type=int, default=1, help="Processes replaying the log.")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    X, y, games = outcomeDataset(args.log, args.max_games, args.num_workers)
+    if not len(X):
+        parser.error(f"{args.log} has no finished games")
+    gameIds = np.unique(games)
+    heldOut = np.random.default_rng(args.seed).permutation(gameIds)[:int(len(gameIds) * args.validation)]
+    validation = np.isin(games, heldOut)
+    print(f"{len(X)} positions from {len(gameIds)} games, {validation.sum()} held out")
+
+    net = MLPValueNet((NUM_FEATURES, *args.hidden, 1), seed=args.seed)
+    net.fit(X[~validation], y[~validation], epochs=args.epochs, batchSize=args.batch_size, learningRate=args.learning_rate,
+            optimizer=args.optimizer, weightDecay=args.weight_decay, seed=args.seed,
+            onEpoch=lambda epoch, loss: print(f"Epoch {epoch + 1}: training loss {loss:.4f}"))
+    if validation.any():
+        accuracy = np.mean((net.predict(X[validation]) > 0.5) == (y[validation] > 0.5))
+        print(f"Validation loss {net.loss(X[validation], y[validation]):.4f}, accuracy {accuracy:.3f}")
+    net.save(args.out)
+    print(f"Saved {net} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()